@@ -0,0 +1,163 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import multiprocessing
+
+from fake_es import FakeElasticsearch
+from ingest import BULK_THREADS, CHUNK_ROWS
+from sources import SOURCES
+from synthetic import PATHOLOGICAL, write_dataset
+
+# End-to-end ingestion benchmark.
+#
+# Writes a synthetic PatentsView dataset (synthetic.py), loads every source
+# with the ingestion engine into a real node (--es-host) or into the
+# in-process stand-in (fake_es.py), and reports documents per second, MB of
+# CSV per second, where the time went and the peak resident memory of each
+# load. Every source is loaded in a fresh process, so its peak memory is its
+# own. Results can be saved as JSON and compared with a baseline: a drop in
+# throughput or a rise in memory beyond --tolerance exits with status 1,
+# which makes the benchmark usable as a regression check on a laptop or CI.
+
+
+def _load(source, path, es_host, options, log_path, verbose, results):
+    """Child process: load one source and report its timings and peak memory."""
+    if not verbose:
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, 1)
+        sys.stdout = open(1, 'w', closefd=False)
+    from ingest import ingest
+
+    start = time.perf_counter()
+    records = ingest(SOURCES[source], path, es_host=es_host, metrics_log=log_path, **options)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in KiB on Linux; worker processes count as children
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    results.put({'records': records, 'seconds': elapsed, 'peak_rss_mb': round(peak / 1024, 1)})
+
+
+def bench_source(source, path, es_host, options, verbose=False):
+    """
+    Load one source in a fresh process.
+
+    Returns:
+        dict: records, seconds, docs_per_sec, mb_per_sec, peak_rss_mb, rejections
+            and stage_seconds of the load
+    """
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    log_path = f'{path}.metrics.jsonl'
+    if os.path.exists(log_path):
+        os.remove(log_path)
+    process = context.Process(target=_load, args=(source, path, es_host, options, log_path, verbose, results))
+    process.start()
+    result = results.get()
+    process.join()
+
+    with open(log_path) as f:
+        end = [json.loads(line) for line in f if '"event": "end"' in line][-1]
+    size = os.path.getsize(path)
+    return dict(result,
+                bytes=size,
+                docs_per_sec=round(result['records'] / result['seconds'], 1),
+                mb_per_sec=round(size / result['seconds'] / 2 ** 20, 3),
+                rejections=end['counters']['rejections'],
+                stage_seconds=end['stage_seconds'])
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of results against a baseline, as human-readable lines."""
+    regressions = []
+    for source, result in results.items():
+        before = baseline.get(source)
+        if not before:
+            continue
+        if result['docs_per_sec'] < before['docs_per_sec'] * (1 - tolerance):
+            regressions.append(f"{source}: {result['docs_per_sec']:.0f} docs/s, "
+                               f"baseline {before['docs_per_sec']:.0f} docs/s")
+        if result['peak_rss_mb'] > before['peak_rss_mb'] * (1 + tolerance):
+            regressions.append(f"{source}: peak memory {result['peak_rss_mb']:.0f} MB, "
+                               f"baseline {before['peak_rss_mb']:.0f} MB")
+    return regressions
+
+
+def run(args):
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='patents_bench_')
+    sources = args.sources or list(SOURCES)
+    existing = [source for source in sources if os.path.exists(os.path.join(data_dir, f'{source}.csv'))]
+    if args.data_dir and existing == sources:
+        print(f"📂 Reusing the dataset in '{data_dir}'")
+    else:
+        print(f"📝 Writing {args.patents} synthetic patents to '{data_dir}'...")
+        for source, (path, rows) in write_dataset(data_dir, args.patents, sources, args.seed,
+                                                  args.pathological).items():
+            print(f"   {source}: {rows} rows, {os.path.getsize(path) / 2 ** 20:.1f} MB")
+
+    fake = None
+    es_host = args.es_host
+    if not es_host:
+        fake = FakeElasticsearch(latency=args.fake_latency / 1000, reject_rate=args.fake_reject_rate,
+                                 store=False).start()
+        es_host = fake.url
+        print(f"🧪 Fake Elasticsearch at {es_host}")
+
+    options = dict(chunk_rows=args.chunk_rows, bulk_threads=args.bulk_threads, workers=args.workers)
+    results = {}
+    try:
+        for source in sources:
+            result = bench_source(source, os.path.join(data_dir, f'{source}.csv'), es_host, options, args.verbose)
+            results[source] = result
+            slowest = max(result['stage_seconds'], key=result['stage_seconds'].get)
+            print(f"⏱️ {source:<14} {result['records']:>9} docs {result['seconds']:>8.2f}s "
+                  f"{result['docs_per_sec']:>10.0f} docs/s {result['mb_per_sec']:>7.2f} MB/s "
+                  f"{result['peak_rss_mb']:>7.0f} MB peak, {result['rejections']} rejections, "
+                  f"mostly {slowest}")
+    finally:
+        if fake is not None:
+            fake.stop()
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results saved to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"❌ Regression: {line}")
+        if regressions:
+            return 1
+        print(f"✅ No regression beyond {args.tolerance:.0%} of {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the ingestion of synthetic PatentsView data')
+    parser.add_argument('--patents', type=int, default=20000,
+                        help='Synthetic patents; child sources get several rows per patent')
+    parser.add_argument('--sources', nargs='+', choices=sorted(SOURCES), help='Sources to load (default: all)')
+    parser.add_argument('--data-dir', help='Keep (and reuse) the synthetic CSVs in this directory')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the dataset')
+    parser.add_argument('--pathological', type=float, default=PATHOLOGICAL, help='Fraction of damaged rows')
+    parser.add_argument('--es-host', help='Load into this Elasticsearch instead of the in-process fake')
+    parser.add_argument('--fake-latency', type=float, default=0, help='Milliseconds every fake bulk request takes')
+    parser.add_argument('--fake-reject-rate', type=float, default=0,
+                        help='Fraction of bulk items the fake rejects with 429')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='Records per chunk')
+    parser.add_argument('--bulk-threads', type=int, default=BULK_THREADS, help='Concurrent bulk requests')
+    parser.add_argument('--workers', type=int, default=1, help='Processes per source')
+    parser.add_argument('--save', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', help='Compare with results saved by an earlier --save')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed relative drop in docs/s or rise in peak memory')
+    parser.add_argument('--verbose', action='store_true', help='Show the output of the loads')
+    sys.exit(run(parser.parse_args()))
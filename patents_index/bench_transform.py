@@ -0,0 +1,196 @@
+import argparse
+import random
+import time
+
+import json
+
+import numpy as np
+import pandas as pd
+from elastic_transport import JsonSerializer
+from elasticsearch.helpers import expand_action
+
+from ingest import document_actions, document_ids, source_columns
+from sources import SOURCES
+
+# Parse/transform stage benchmark: the former iterrows() loops of the claim
+# and patent indexers against the ingestion engine's own path (the spec's
+# coercions in source_columns(), then document_actions()), on synthetic
+# chunks read with dtype=str exactly like iter_csv_chunks() returns them.
+# A second table compares building and serializing action dicts the way the
+# client does with encoding the columns straight to NDJSON (bulk_encoder.py).
+# No Elasticsearch is involved.
+
+
+def synthetic_claims(rows, seed=0):
+    rng = random.Random(seed)
+    return pd.DataFrame({
+        'patent_id': [str(10000000 + i // 20) for i in range(rows)],
+        'claim_sequence': [str(i % 20) for i in range(rows)],
+        'claim_text': [f' {i % 20 + 1}. A method according to claim {rng.randint(1, 20)}, wherein ... ' for i in range(rows)],
+        'dependent': [rng.choice(['claim 1', '', 'True', 'false', np.nan]) for _ in range(rows)],
+        'claim_number': [rng.choice([str(i % 20 + 1), '', np.nan, '99999999999999999999']) for i in range(rows)],
+        'exemplary': [rng.choice(['1', '0', np.nan]) for _ in range(rows)],
+    }, dtype=object)
+
+
+def synthetic_patents(rows, seed=0):
+    rng = random.Random(seed)
+    return pd.DataFrame({
+        'patent_id': [str(10000000 + i) for i in range(rows)],
+        'patent_title': [f'Apparatus {i} ' for i in range(rows)],
+        'patent_date': [f'20{rng.randint(0, 23):02d}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}' for _ in range(rows)],
+        'num_claims': [rng.choice([str(rng.randint(1, 40)), np.nan, '9223372036854775808']) for _ in range(rows)],
+        'patent_type': [rng.choice(['utility', 'design', 'reissue']) for _ in range(rows)],
+        'patent_abstract': [f' An apparatus comprising {i} parts. ' for i in range(rows)],
+    }, dtype=object)
+
+
+def _int(value):
+    # int() of a cell as the indexers did it; numbers beyond int64 were never indexable and count as unparsable
+    number = int(value)
+    if not -2 ** 63 <= number < 2 ** 63:
+        raise ValueError(f"{value} overflows int64")
+    return number
+
+
+def claims_iterrows(chunk, index_name='claim_tmp'):
+    """The per-row claim transformation the indexer used before transform.py."""
+    records = []
+    for _, row in chunk.iterrows():
+        patent_id = str(row['patent_id']).strip() if pd.notna(row['patent_id']) else ''
+        try:
+            claim_sequence = _int(row['claim_sequence']) if pd.notna(row['claim_sequence']) else 0
+        except ValueError:
+            claim_sequence = 0
+        try:
+            claim_number = _int(row['claim_number']) if pd.notna(row['claim_number']) else 0
+        except ValueError:
+            claim_number = 0
+        dependent = str(row['dependent']).lower() in ('true', 't', 'yes', 'y', '1') if pd.notna(row['dependent']) else False
+        exemplary = str(row['exemplary']).lower() in ('true', 't', 'yes', 'y', '1') if pd.notna(row['exemplary']) else False
+        records.append({
+            "_op_type": "index",
+            "_index": index_name,
+            "_id": f"{patent_id}:{claim_sequence}",
+            "_source": {
+                "patent_id": patent_id,
+                "claim_sequence": claim_sequence,
+                "claim_text": str(row['claim_text']) if pd.notna(row['claim_text']) else '',
+                "dependent": dependent,
+                "claim_number": claim_number,
+                "exemplary": exemplary
+            }
+        })
+    return records
+
+
+def claims_vectorized(chunk, index_name='claim_tmp'):
+    return document_actions(SOURCES['claim'], source_columns(SOURCES['claim'], chunk), index_name)
+
+
+def patents_iterrows(chunk, index_name='patent_tmp'):
+    """The per-row patent transformation the indexer used before transform.py."""
+    records = []
+    for _, patent in chunk.iterrows():
+        try:
+            num_claims = _int(patent['num_claims']) if pd.notna(patent['num_claims']) else 0
+        except ValueError:
+            num_claims = 0
+        patent_date = pd.to_datetime(patent['patent_date'], errors='coerce')
+        records.append({
+            "_op_type": "index",
+            "_index": index_name,
+            "_id": str(patent['patent_id']).strip(),
+            "_source": {
+                "patent_id": str(patent['patent_id']).strip(),
+                "patent_title": str(patent['patent_title']).strip(),
+                "patent_date": patent_date.strftime('%Y-%m-%d') if pd.notna(patent_date) else None,
+                "num_claims": num_claims,
+                "patent_type": str(patent['patent_type']).strip(),
+                "patent_abstract": str(patent['patent_abstract']).strip()
+            }
+        })
+    return records
+
+
+def patents_vectorized(chunk, index_name='patent_tmp'):
+    return document_actions(SOURCES['patent'], source_columns(SOURCES['patent'], chunk), index_name)
+
+
+def decoded(lines):
+    """Action dicts of encoded NDJSON lines, to compare them with the baselines."""
+    actions = []
+    for line in lines:
+        meta, source = line.split(b'\n', 1)
+        meta = json.loads(meta)['index']
+        actions.append({"_op_type": "index", "_index": meta['_index'], "_id": meta['_id'],
+                        "_source": json.loads(source)})
+    return actions
+
+
+def build_actions(index_name, columns, ids):
+    """Action dicts zipped from converted columns, as the indexers built them before bulk_encoder.py."""
+    names = list(columns)
+    rows = zip(*(values.tolist() for values in columns.values()))
+    return [{"_op_type": "index", "_index": index_name, "_id": doc_id, "_source": dict(zip(names, row))}
+            for doc_id, row in zip(ids, rows)]
+
+
+def best_of(func, chunk, repeat):
+    """Best wall time of `repeat` runs, and the actions of the last one."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        actions = func(chunk)
+        best = min(best, time.perf_counter() - start)
+    return best, actions
+
+
+def run(name, chunk, baseline, vectorized, repeat):
+    old_time, old_actions = best_of(baseline, chunk, repeat)
+    new_time, new_actions = best_of(vectorized, chunk, repeat)
+    if old_actions != decoded(new_actions):
+        raise AssertionError(f"{name}: vectorized actions differ from the iterrows baseline")
+    rows = len(chunk)
+    print(f"{name:8s} {rows:>9,d} rows | iterrows {old_time:7.3f}s ({rows / old_time:>10,.0f} rows/s) | "
+          f"vectorized {new_time:7.3f}s ({rows / new_time:>10,.0f} rows/s) | speedup {old_time / new_time:5.1f}x")
+
+
+def serialize_actions(actions, serializer=JsonSerializer()):
+    """Bulk body of action dicts, as helpers.bulk() has the client serialize it."""
+    lines = []
+    for action, source in map(expand_action, actions):
+        lines.append(serializer.dumps(action) + b'\n')
+        lines.append(serializer.dumps(source) + b'\n')
+    return b''.join(lines)
+
+
+def run_encoding(name, spec, chunk, repeat):
+    def dicts(c):
+        columns = source_columns(spec, c)
+        return serialize_actions(build_actions(spec['index'], columns, document_ids(spec, columns)))
+
+    old_time, old_body = best_of(dicts, chunk, repeat)
+    new_time, new_body = best_of(lambda c: b''.join(document_actions(spec, source_columns(spec, c), spec['index'])),
+                                 chunk, repeat)
+    if [json.loads(line) for line in old_body.splitlines()] != [json.loads(line) for line in new_body.splitlines()]:
+        raise AssertionError(f"{name}: encoded bulk body differs from the serialized actions")
+    rows = len(chunk)
+    print(f"{name:8s} {rows:>9,d} rows | dicts+serialize {old_time:7.3f}s ({rows / old_time:>10,.0f} rows/s) | "
+          f"encoded {new_time:7.3f}s ({rows / new_time:>10,.0f} rows/s) | speedup {old_time / new_time:5.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the vectorized CSV transform against iterrows')
+    parser.add_argument('--rows', type=int, default=50000, help='Rows per synthetic chunk (the indexers use 50000)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per variant; the best time is reported')
+    args = parser.parse_args()
+
+    run('claims', synthetic_claims(args.rows), claims_iterrows, claims_vectorized, args.repeat)
+    run('patents', synthetic_patents(args.rows), patents_iterrows, patents_vectorized, args.repeat)
+    run_encoding('claims', SOURCES['claim'], synthetic_claims(args.rows), args.repeat)
+    run_encoding('patents', SOURCES['patent'], synthetic_patents(args.rows), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+import json
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the standard library encoder is used instead
+    orjson = None
+
+# Pre-encoded bulk bodies.
+#
+# Instead of building a {"_index": ..., "_source": {...}} dict per document
+# and letting the client serialize the whole list again, every column of a
+# chunk is JSON-encoded once, value by value, and each document's action and
+# source lines are joined straight from those byte strings. The resulting
+# lines are sent as the raw NDJSON body of a bulk request (bulk_writer.py),
+# so documents are serialized exactly once on the ingest path.
+
+if orjson is not None:
+    dumps = orjson.dumps
+else:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+    def dumps(value):
+        return _encoder.encode(value).encode('utf-8')
+
+
+def _values(col):
+    return col.tolist() if hasattr(col, 'tolist') else list(col)
+
+
+def _encoded(col):
+    if isinstance(getattr(col, 'dtype', None), pd.CategoricalDtype):
+        # Every category is encoded once; null cells (code -1) take the trailing null
+        labels = np.array([dumps(value) for value in col.cat.categories.tolist()] + [b'null'], dtype=object)
+        return labels.take(col.cat.codes.to_numpy()).tolist()
+    return map(dumps, _values(col))
+
+
+def encode_lines(index_name, columns, ids=None):
+    """
+    Encode converted column arrays into bulk NDJSON, one byte string per document.
+
+    Args:
+        index_name (str): Target index
+        columns (dict): Field name -> converted column (Series, array or list)
+        ids (sequence, optional): Document IDs aligned with the columns
+
+    Returns:
+        list: b'{"index":{...}}\\n{...source...}\\n' per document, in column order
+    """
+    names = list(columns)
+    keys = [(b'{' if i == 0 else b',') + dumps(name) + b':' for i, name in enumerate(names)]
+    encoded = [_encoded(col) for col in columns.values()]
+    sources = (b''.join(chain.from_iterable(zip(keys, row))) + b'}\n' for row in zip(*encoded))
+
+    head = b'{"index":{"_index":' + dumps(index_name)
+    if ids is None:
+        action = head + b'}}\n'
+        return [action + source for source in sources]
+    return [head + b',"_id":' + dumps(doc_id) + b'}}\n' + source
+            for doc_id, source in zip(_values(ids), sources)]
+
+
+def source_line(line):
+    """The source half of an encoded document, with its newline."""
+    return line[line.index(b'\n') + 1:]
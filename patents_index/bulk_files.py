@@ -0,0 +1,227 @@
+import io
+import os
+import json
+import gzip
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    import zstandard
+except ImportError:  # zstd shards are optional; gzip or plain shards work without it
+    zstandard = None
+
+import es
+from ingest import CHUNK_ROWS, snapshot_columns, document_actions, iter_source_columns
+from snapshot import iter_snapshot_chunks
+from sources import SOURCES
+
+# Offline bulk files: generate on one machine, upload from another.
+#
+# `generate` turns a source (its CSV, its Parquet stage or a snapshot) into
+# NDJSON bulk shards of about --shard-mb uncompressed each, optionally gzip
+# or zstd compressed, plus a manifest.json written last. `upload` pushes the
+# shards of a directory with N concurrent keep-alive connections (es.py),
+# retrying 429/5xx rejections, and records every shard indexed without a
+# single failed document in _uploaded.json, so running it again only sends
+# what is missing, including the shards some documents of failed.
+
+MANIFEST = 'manifest.json'
+UPLOADED = '_uploaded.json'
+SHARD_BYTES = es.BULK_SLICE_BYTES
+
+
+def _open_shard(path, mode='rb'):
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise ImportError(f"'{path}' needs zstandard (pip install zstandard)")
+        if mode == 'wb':
+            return zstandard.ZstdCompressor(level=3).stream_writer(open(path, 'wb'))
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'),
+                                                                            read_across_frames=True))
+    if path.endswith('.gz'):
+        return gzip.open(path, mode, compresslevel=6) if mode == 'wb' else gzip.open(path, mode)
+    return open(path, mode)
+
+
+def _source_chunks(spec, ipath, index_name, chunk_rows, snapshot=None, stage_dir=None):
+    """Encoded bulk lines of a source, chunk by chunk, from a snapshot, its stage or its CSV."""
+    if snapshot:
+        for docs in iter_snapshot_chunks(snapshot, chunk_rows):
+            yield document_actions(spec, snapshot_columns(spec, docs), index_name)
+        return
+    for columns in iter_source_columns(spec, ipath, chunk_rows, stage_dir):
+        yield document_actions(spec, columns, index_name)
+
+
+def generate_shards(spec, ipath, out_dir, index_name=None, shard_bytes=SHARD_BYTES, compress=None,
+                    chunk_rows=CHUNK_ROWS, snapshot=None, stage_dir=None):
+    """
+    Write a source as NDJSON bulk shards of about shard_bytes each.
+
+    Args:
+        spec (dict): Source spec from sources.SOURCES
+        ipath (str): Source CSV (ignored with snapshot)
+        out_dir (str): Directory for the shards and the manifest
+        index_name (str, optional): Index the actions target; defaults to the spec's index
+        shard_bytes (int): Uncompressed bytes per shard, which is also one bulk request
+        compress (str, optional): 'gz' or 'zst'
+        chunk_rows (int): Records read per chunk
+        snapshot (str, optional): Snapshot (snapshot.py) to read instead of the CSV
+        stage_dir (str, optional): Root of the Parquet stages
+
+    Returns:
+        dict: The manifest
+    """
+    index_name = index_name or spec['index']
+    os.makedirs(out_dir, exist_ok=True)
+    extension = '.ndjson' + (f'.{compress}' if compress else '')
+    shards = []
+    writer, size, docs = None, 0, 0
+
+    def close_shard():
+        writer.close()
+        name = f'shard-{len(shards):05d}{extension}'
+        # Shards are written as hidden files and only appear once complete
+        os.replace(os.path.join(out_dir, '.' + name), os.path.join(out_dir, name))
+        shards.append({'path': name, 'docs': docs, 'bytes': size})
+        print(f"📝 {name}: {docs} documents, {size} bytes")
+
+    start_time = time.time()
+    for lines in _source_chunks(spec, ipath, index_name, chunk_rows, snapshot, stage_dir):
+        for line in lines:
+            if writer is not None and size + len(line) > shard_bytes:
+                close_shard()
+                writer = None
+            if writer is None:
+                writer = _open_shard(os.path.join(out_dir, f'.shard-{len(shards):05d}{extension}'), 'wb')
+                size, docs = 0, 0
+            writer.write(line)
+            size += len(line)
+            docs += 1
+    if writer is not None:
+        close_shard()
+
+    manifest = {'index': index_name, 'source': snapshot or os.path.abspath(ipath),
+                'docs': sum(shard['docs'] for shard in shards), 'shards': shards}
+    with open(os.path.join(out_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"📦 {manifest['docs']} documents in {len(shards)} shards under '{out_dir}', "
+          f"{time.time() - start_time:.2f} seconds")
+    return manifest
+
+
+def _upload_shard(path, index_name, host, slice_bytes, max_retries):
+    success, errors = 0, []
+    with _open_shard(path) as f:
+        for actions in es.bulk_slices(f, slice_bytes):
+            indexed, failed = es.bulk(actions, index_name, host=host, max_retries=max_retries)
+            success += indexed
+            errors.extend(failed)
+    return success, errors
+
+
+def upload_shards(shard_dir, host=None, index_name=None, connections=4, slice_bytes=es.BULK_SLICE_BYTES,
+                  max_retries=5):
+    """
+    Upload the bulk shards of a directory over concurrent keep-alive connections.
+
+    Shards already recorded in _uploaded.json are skipped. A shard is only
+    recorded once all its documents were indexed; one with failed documents
+    counts as not uploaded and is sent again by the next call. A directory
+    without a manifest is uploaded file by file, like load_data.sh did.
+
+    Args:
+        shard_dir (str): Directory written by generate_shards() (or of plain bulk files)
+        host (str, optional): Elasticsearch URL; defaults to es.ES_HOST
+        index_name (str, optional): Default index of actions without '_index'
+        connections (int): Shards uploaded concurrently
+        slice_bytes (int): Maximum size of one bulk request body
+        max_retries (int): Retries of items rejected under pressure (429/5xx)
+
+    Returns:
+        tuple: (documents indexed, documents failed, shards that could not be fully uploaded)
+    """
+    manifest_path = os.path.join(shard_dir, MANIFEST)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            names = [shard['path'] for shard in json.load(f)['shards']]
+    else:
+        names = sorted(name for name in os.listdir(shard_dir)
+                       if not name.startswith(('.', '_')))
+
+    uploaded_path = os.path.join(shard_dir, UPLOADED)
+    uploaded = {}
+    if os.path.exists(uploaded_path):
+        with open(uploaded_path) as f:
+            uploaded = json.load(f)
+    pending = [name for name in names if name not in uploaded]
+    print(f"🚚 Uploading {len(pending)} of {len(names)} shards from '{shard_dir}' "
+          f"with {connections} connections")
+
+    indexed, failed, broken = 0, 0, []
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, connections)) as pool:
+        futures = {pool.submit(_upload_shard, os.path.join(shard_dir, name), index_name, host, slice_bytes,
+                               max_retries): name for name in pending}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                success, errors = future.result()
+            except Exception as e:
+                print(f"❌ {name}: {e}")
+                broken.append(name)
+                continue
+            indexed += success
+            failed += len(errors)
+            if errors:
+                print(f"⚠️ {name}: {len(errors)} documents failed, first: {errors[:1]}")
+                broken.append(name)
+                continue
+
+            # Record the fully indexed shard before moving on
+            uploaded[name] = {'indexed': success}
+            with open(uploaded_path + '.tmp', 'w') as f:
+                json.dump(uploaded, f)
+            os.replace(uploaded_path + '.tmp', uploaded_path)
+            print(f"✅ {name}: {success} documents [{len(uploaded)}/{len(names)}]")
+
+    print(f"📈 {indexed} documents indexed, {failed} failed, {len(broken)} shards not uploaded, "
+          f"{time.time() - start_time:.2f} seconds")
+    return indexed, failed, broken
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate and upload NDJSON bulk shards')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    gparser = commands.add_parser('generate', help='Write a source as bulk shards')
+    gparser.add_argument('--source', required=True, choices=sorted(SOURCES),
+                         help='Source spec the input is read with (an index_global.py argument name)')
+    gparser.add_argument('--input', help='Source CSV')
+    gparser.add_argument('--snapshot', help='Read this snapshot (e.g. patent_index_<timestamp>.ndjson.zst) instead')
+    gparser.add_argument('--out', required=True, help='Directory for the shards')
+    gparser.add_argument('--index', help="Target index (defaults to the source's index)")
+    gparser.add_argument('--shard-mb', type=float, default=SHARD_BYTES / 2 ** 20,
+                         help='Uncompressed size of one shard in MiB')
+    gparser.add_argument('--compress', choices=['gz', 'zst'], help='Compress the shards')
+    gparser.add_argument('--stage-dir', help='Root of the Parquet stages')
+
+    uparser = commands.add_parser('upload', help='Upload the shards of a directory')
+    uparser.add_argument('shard_dir', help='Directory of shards')
+    uparser.add_argument('--host', default=es.ES_HOST, help='Elasticsearch URL')
+    uparser.add_argument('--index', help="Default index of actions without '_index'")
+    uparser.add_argument('--connections', type=int, default=4, help='Concurrent uploads')
+    uparser.add_argument('--max-retries', type=int, default=5, help="Retries of documents rejected with 429/5xx")
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        if not args.input and not args.snapshot:
+            parser.error('generate needs --input or --snapshot')
+        generate_shards(SOURCES[args.source], args.input, args.out, index_name=args.index,
+                        shard_bytes=int(args.shard_mb * 2 ** 20), compress=args.compress,
+                        snapshot=args.snapshot, stage_dir=args.stage_dir)
+    else:
+        _, _, broken = upload_shards(args.shard_dir, host=args.host, index_name=args.index,
+                                     connections=args.connections, max_retries=args.max_retries)
+        raise SystemExit(1 if broken else 0)
@@ -0,0 +1,77 @@
+from contextlib import contextmanager
+
+# Index settings for the duration of a bulk load.
+#
+# While an index is being (re)built nobody searches it, so there is no point
+# in refreshing it every second, replicating every segment or fsyncing the
+# translog on every request. bulk_load_mode() switches these off for the load
+# and always puts the previous values back, refreshing once (and optionally
+# force-merging) at the end, even when the load fails. The previous values are
+# saved in the index mapping's _meta first, so a load that was killed before
+# it could restore them is followed by one that restores them instead of the
+# bulk values it finds.
+
+BULK_SETTINGS = {
+    'index.refresh_interval': '-1',
+    'index.number_of_replicas': '0',
+    'index.translog.durability': 'async'
+}
+
+# Mapping _meta key holding the settings an index had before bulk-load mode
+SAVED_SETTINGS = 'settings_before_bulk_load'
+
+
+def _current_settings(es, index_name):
+    response = es.indices.get_settings(index=index_name, flat_settings=True)
+    # An alias may resolve to a single concrete index under another name
+    settings = next(iter(response.values()))['settings'] if response else {}
+    return {key: settings.get(key) for key in BULK_SETTINGS}
+
+
+def _mapping_meta(es, index_name):
+    response = es.indices.get_mapping(index=index_name)
+    mappings = next(iter(response.values()))['mappings'] if response else {}
+    return mappings.get('_meta', {})
+
+
+@contextmanager
+def bulk_load_mode(es, index_name, force_merge=False, max_num_segments=1):
+    """
+    Tune an index for bulk loading and restore its settings afterwards.
+
+    The settings are restored from the index's _meta marker when a previous
+    load left one behind, so values deliberately equal to a bulk setting
+    (e.g. 0 replicas) survive, and bulk values left by a crash do not.
+
+    Args:
+        es (Elasticsearch): Client
+        index_name (str): Index (or alias of one index) being loaded
+        force_merge (bool): Force-merge the index once the load finished successfully
+        max_num_segments (int): Segments per shard to merge down to
+
+    Yields:
+        dict: The settings that will be restored
+    """
+    meta = _mapping_meta(es, index_name)
+    restore = meta.get(SAVED_SETTINGS)
+    if restore is None:
+        restore = _current_settings(es, index_name)
+        es.indices.put_mapping(index=index_name, meta=dict(meta, **{SAVED_SETTINGS: restore}))
+    else:
+        print(f"⚠️ '{index_name}' was left in bulk-load mode, keeping the settings saved before it")
+    print(f"⚙️ Bulk-load mode for '{index_name}': {BULK_SETTINGS}")
+    es.indices.put_settings(index=index_name, settings=BULK_SETTINGS)
+    succeeded = False
+    try:
+        yield restore
+        succeeded = True
+    finally:
+        print(f"⚙️ Restoring settings of '{index_name}': {restore}")
+        es.indices.put_settings(index=index_name, settings=restore)
+        es.indices.put_mapping(index=index_name, meta={key: value for key, value in meta.items()
+                                                       if key != SAVED_SETTINGS})
+        es.indices.refresh(index=index_name)
+        if force_merge and succeeded:
+            print(f"🧱 Force-merging '{index_name}' to {max_num_segments} segment(s) per shard...")
+            es.options(request_timeout=3600).indices.forcemerge(index=index_name,
+                                                                 max_num_segments=max_num_segments)
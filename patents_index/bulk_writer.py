@@ -0,0 +1,280 @@
+import json
+import time
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import elasticsearch
+import elasticsearch.helpers
+
+# Pipelined bulk writer.
+#
+# Bulk requests are sent by a pool of threads while the caller keeps parsing
+# and transforming the next CSV chunk. At most `thread_count + queue_size`
+# requests are in flight or waiting; once that many are pending the producer
+# blocks on the oldest one, so a slow cluster throttles parsing instead of
+# letting actions pile up in memory. Every request is sent as a raw NDJSON
+# body: pre-encoded lines (bulk_encoder.py) as they are, action dicts once
+# encoded with the client's serializer. 429/5xx rejections and connection
+# failures are retried here, with jittered exponential backoff, and
+# documents that still fail are returned with their '_id' for the
+# dead-letter file (deadletter.py).
+#
+# Requests are cut by payload size, not by document count: 50000 claims
+# are hundreds of MB while 50000 CPC rows are a few. A BatchSizer tunes the
+# target size while loading, growing it while requests come back quickly and
+# shrinking it when they are slow or rejected, within fixed limits. An
+# optional IngestGovernor (governor.py) further limits how many requests are
+# in flight while the cluster is under pressure.
+
+BULK_THREADS = 4
+BULK_QUEUE = 4
+
+# Most actions per bulk request, however small they are
+BULK_CHUNK = 10000
+
+# Bulk request payload: the starting target and the limits it is tuned within
+BULK_BYTES = 5 * 2 ** 20
+BULK_MIN_BYTES = 2 ** 20
+BULK_MAX_BYTES = 50 * 2 ** 20
+
+# Round trips (seconds) below which the payload grows and above which it shrinks
+BULK_LATENCY = (0.5, 2.0)
+
+# Statuses of a cluster under pressure, retried with backoff instead of failing the documents
+RETRY_STATUSES = (429, 502, 503, 504)
+
+# Retries per bulk request; with the default backoff a request keeps trying for up to about eight minutes
+MAX_RETRIES = 8
+
+
+class BatchSizer:
+    """
+    Bulk payload target in bytes, tuned from the round trips of the requests.
+
+    A request answered faster than BULK_LATENCY[0] grows the target by a
+    quarter (if it was full-sized), one slower than BULK_LATENCY[1] shrinks
+    it by a fifth, and rejections under pressure halve it. Shared by the
+    sender threads of a load.
+
+    Args:
+        target_bytes (int): Starting target
+        min_bytes (int): Smallest target
+        max_bytes (int): Largest target, below the cluster's http.max_content_length
+        latency (tuple): (fast, slow) round trips in seconds
+        metrics (IngestMetrics, optional): Receives the target as the 'bulk_target_bytes' gauge
+    """
+
+    def __init__(self, target_bytes=BULK_BYTES, min_bytes=BULK_MIN_BYTES, max_bytes=BULK_MAX_BYTES,
+                 latency=BULK_LATENCY, metrics=None):
+        self.min_bytes = min_bytes
+        self.max_bytes = max(min_bytes, max_bytes)
+        self.target = min(self.max_bytes, max(min_bytes, target_bytes))
+        self.latency = latency
+        self.metrics = metrics
+        self.lock = threading.Lock()
+        if metrics is not None:
+            metrics.gauge(bulk_target_bytes=self.target)
+
+    def observe(self, size, seconds, rejected=0):
+        """Adjust the target after a bulk round trip of `size` bytes with `rejected` items rejected."""
+        with self.lock:
+            if rejected:
+                factor = 0.5
+            elif seconds > self.latency[1]:
+                factor = 0.8
+            elif seconds < self.latency[0] and size >= 0.9 * self.target:
+                factor = 1.25
+            else:
+                return
+            self.target = int(min(self.max_bytes, max(self.min_bytes, self.target * factor)))
+            target = self.target
+        if self.metrics is not None:
+            self.metrics.gauge(bulk_target_bytes=target)
+
+
+def _encoded(es, actions):
+    """Action dicts as NDJSON lines, serialized like helpers.bulk() would; encoded lines pass through."""
+    serializer = None
+    for action in actions:
+        if isinstance(action, bytes):
+            yield action
+            continue
+        if serializer is None:
+            serializer = es.transport.serializers.get_serializer('application/json')
+        op, data = elasticsearch.helpers.expand_action(action)
+        line = serializer.dumps(op) + b'\n'
+        yield line if data is None else line + serializer.dumps(data) + b'\n'
+
+
+def _batches(lines, size, sizer):
+    """Cut encoded lines into requests of at most `size` actions and about sizer.target bytes."""
+    batch, batch_bytes = [], 0
+    for line in lines:
+        batch.append(line)
+        batch_bytes += len(line)
+        if len(batch) >= size or batch_bytes >= sizer.target:
+            yield batch
+            batch, batch_bytes = [], 0
+    if batch:
+        yield batch
+
+
+def backoff_delay(attempt, initial_backoff=2, max_backoff=600):
+    """Seconds before retry `attempt` (1-based): exponential, capped, with jitter so senders spread out."""
+    return min(max_backoff, initial_backoff * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+
+def _line_id(line):
+    return next(iter(json.loads(line[:line.index(b'\n')]).values())).get('_id')
+
+
+def _send_lines(es, lines, max_retries, initial_backoff=2, max_backoff=600, metrics=None, sizer=None,
+                governor=None, **bulk_kwargs):
+    """
+    Send encoded documents as one raw bulk body.
+
+    Items rejected under pressure (RETRY_STATUSES), whole requests rejected
+    that way and connection failures are retried with backoff; only the
+    items that failed are sent again. Error items always carry the '_id',
+    so callers can dead-letter the documents. Every round trip is reported
+    to the sizer, and takes a slot of the governor while on the wire.
+    """
+    success, errors = 0, []
+    for attempt in range(max_retries + 1):
+        if attempt:
+            if metrics is not None:
+                metrics.count(retries=1)
+            time.sleep(backoff_delay(attempt, initial_backoff, max_backoff))
+        body = b''.join(lines)
+        if governor is not None:
+            governor.acquire()
+        start = time.perf_counter()
+        try:
+            response = es.bulk(operations=body, filter_path='items.*.status,items.*.error,items.*._id',
+                               **bulk_kwargs)
+        except (elasticsearch.ApiError, elasticsearch.TransportError) as e:
+            status = getattr(e, 'status_code', 'N/A')
+            pressure = status in RETRY_STATUSES or isinstance(e, elasticsearch.TransportError)
+            if metrics is not None:
+                metrics.count(bulk_requests=1, rejections=len(lines) if status in RETRY_STATUSES else 0)
+            if sizer is not None and pressure:
+                sizer.observe(len(body), time.perf_counter() - start, rejected=len(lines))
+            if pressure and attempt < max_retries:
+                continue
+            errors.extend({'index': {'_id': _line_id(line), 'status': status, 'error': str(e)}} for line in lines)
+            return success, errors
+        finally:
+            if governor is not None:
+                governor.release()
+
+        seconds = time.perf_counter() - start
+        if metrics is not None:
+            metrics.observe('bulk', seconds)
+        retry = []
+        for line, item in zip(lines, response['items']):
+            status = next(iter(item.values())).get('status', 500)
+            if 200 <= status < 300:
+                success += 1
+            elif status in RETRY_STATUSES and attempt < max_retries:
+                retry.append(line)
+            else:
+                errors.append(item)
+        if metrics is not None:
+            metrics.count(bulk_requests=1, rejections=len(retry))
+        if sizer is not None:
+            sizer.observe(len(body), seconds, rejected=len(retry))
+        if not retry:
+            break
+        lines = retry
+    return success, errors
+
+
+def pipelined_bulk(es, items, thread_count=BULK_THREADS, queue_size=BULK_QUEUE, chunk_size=BULK_CHUNK,
+                   max_retries=MAX_RETRIES, metrics=None, sizer=None, governor=None, **bulk_kwargs):
+    """
+    Bulk index groups of actions with overlapping parsing and network I/O.
+
+    Args:
+        es (Elasticsearch): Client, shared by the sender threads
+        items (iterable): (actions, tag) pairs, e.g. one per CSV chunk with its byte offset;
+            consumed lazily, so producing the next group overlaps sending the previous one.
+            Actions are dicts or encoded NDJSON lines from bulk_encoder.encode_lines()
+        thread_count (int): Concurrent bulk requests
+        queue_size (int): Bulk requests allowed to wait behind the running ones
+        chunk_size (int): Most actions per bulk request
+        max_retries (int): Retries of requests (or items) rejected under pressure
+        metrics (IngestMetrics, optional): Receives bulk round-trip times, request and rejection counts
+        sizer (BatchSizer, optional): Payload target of the requests; a default one
+            tuned by this call is used if none is given
+        governor (IngestGovernor, optional): Limits the requests in flight under cluster pressure
+        **bulk_kwargs: initial_backoff, max_backoff and es.bulk() parameters (refresh, pipeline, ...)
+
+    Yields:
+        tuple: (tag, indexed count, error items) per group, in input order and only
+        once every action of the group was acknowledged
+    """
+    pending = deque()  # (future, tag, last batch of its group)
+    limit = max(1, thread_count) + max(0, queue_size)
+    sizer = sizer or BatchSizer(metrics=metrics)
+    indexed, errors = 0, []
+
+    def settle_oldest():
+        nonlocal indexed, errors
+        future, tag, last = pending.popleft()
+        success, failed = future.result() if future is not None else (0, [])
+        indexed += success
+        errors.extend(failed)
+        if last:
+            done = (tag, indexed, errors)
+            indexed, errors = 0, []
+            return done
+        return None
+
+    def settle_all():
+        while pending:
+            done = settle_oldest()
+            if done:
+                yield done
+
+    with ThreadPoolExecutor(max_workers=max(1, thread_count)) as pool:
+        try:
+            for actions, tag in items:
+                # Batches are cut as they are sent, so each one follows the latest target
+                batches = _batches(_encoded(es, actions), chunk_size, sizer)
+                batch = next(batches, None)
+                if batch is None:
+                    pending.append((None, tag, True))
+                while batch is not None:
+                    following = next(batches, None)
+                    # Backpressure: wait for the oldest request before queueing another
+                    while len(pending) >= limit:
+                        done = settle_oldest()
+                        if done:
+                            yield done
+                    future = pool.submit(_send_lines, es, batch, max_retries, metrics=metrics, sizer=sizer,
+                                         governor=governor, **bulk_kwargs)
+                    pending.append((future, tag, following is None))
+                    batch = following
+        except Exception:
+            # Even when producing fails, groups already sent are reported (and checkpointed)
+            yield from settle_all()
+            raise
+        yield from settle_all()
+
+
+def write_actions(es, actions, thread_count=BULK_THREADS, queue_size=BULK_QUEUE, chunk_size=BULK_CHUNK,
+                  max_retries=MAX_RETRIES, sizer=None, **bulk_kwargs):
+    """
+    Bulk index a flat stream of actions through the pipelined writer.
+
+    Returns:
+        tuple: (indexed count, list of error items), like helpers.bulk(raise_on_error=False)
+    """
+    indexed, errors = 0, []
+    for _, success, failed in pipelined_bulk(es, [(actions, None)], thread_count, queue_size, chunk_size,
+                                             max_retries, sizer=sizer, **bulk_kwargs):
+        indexed += success
+        errors.extend(failed)
+    return indexed, errors
@@ -0,0 +1,299 @@
+import io
+import os
+import json
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Column past the header's last one, which only records with too many fields fill
+_EXTRA = '\0extra'
+
+
+def iter_records(f, end_offset=None):
+    """
+    Yield complete CSV records as raw bytes from a binary file positioned at a record start.
+
+    A record ends at a newline once the double quotes seen so far are
+    balanced, so quoted fields with embedded newlines (claim and summary text)
+    stay in one record. Doubled quotes ("") keep the balance unchanged.
+
+    Args:
+        f (file): File opened in binary mode
+        end_offset (int, optional): Stop before the record that starts at or after this offset
+
+    Yields:
+        bytes: One record including its line terminator
+    """
+    record = []
+    quotes = 0
+    position = f.tell()
+    for line in f:
+        if not record and end_offset is not None and position >= end_offset:
+            return
+        position += len(line)
+        record.append(line)
+        quotes += line.count(b'"')
+        if quotes % 2 == 0:
+            yield b''.join(record)
+            record = []
+            quotes = 0
+    if record:
+        yield b''.join(record)
+
+
+def read_header(ipath):
+    """Return (header record bytes, offset of the first data record)."""
+    with open(ipath, 'rb') as f:
+        header = next(iter_records(f), b'')
+        return header, len(header)
+
+
+def _joined(block, probe=b''):
+    data = b''.join(block)
+    if probe and not data.endswith(b'\n'):
+        data += b'\n'
+    return data + probe
+
+
+def iter_csv_chunks(ipath, chunk_rows=50000, start_offset=None, end_offset=None, metrics=None, quarantine=None,
+                    budget=None, **read_kwargs):
+    """
+    Read a CSV in chunks while tracking the exact byte offset after each chunk.
+
+    Unlike ``pd.read_csv(chunksize=...)``, whose position in the file is
+    hidden behind its read-ahead buffer, every chunk here ends on a record
+    boundary whose offset can be persisted and later seeked to directly.
+
+    Args:
+        ipath (str): Path to the CSV file
+        chunk_rows (int): Records per chunk
+        start_offset (int, optional): Offset of the first record to read; defaults to just after the header
+        end_offset (int, optional): Stop at the first record starting at or after this offset
+        metrics (IngestMetrics, optional): Receives the 'read' and 'parse' time of every chunk
+        quarantine (DeadLetterWriter, optional): Receives the records that on_bad_lines='skip'
+            or 'warn' would drop, with their offsets
+        budget (ChunkBudget, optional): Sizes every chunk to a memory budget instead of chunk_rows
+        **read_kwargs: Passed to ``pd.read_csv`` for every chunk (sep, quoting, on_bad_lines, usecols,
+            dtype, ...). Records with too many fields are handled by on_bad_lines even with usecols
+
+    Yields:
+        tuple: (DataFrame chunk, offset just past its last record)
+    """
+    header, data_offset = read_header(ipath)
+    read_kwargs.setdefault('dtype', str)
+    quarantined = quarantine is not None and read_kwargs.get('on_bad_lines') in ('skip', 'warn')
+    on_bad_lines = read_kwargs.get('on_bad_lines', 'error')
+    if quarantined:
+        read_kwargs['on_bad_lines'] = 'warn'
+
+    width, probe = None, b''
+    if read_kwargs.get('usecols') is not None and header.strip():
+        # pandas stops counting the fields of a record once columns are selected, so the records
+        # with too many (a trailing empty field aside) are caught by one more column instead.
+        # pandas refuses a column no record reaches, hence an empty record that reaches it last
+        dialect = {key: value for key, value in read_kwargs.items() if key not in ('usecols', 'dtype')}
+        names = list(pd.read_csv(io.BytesIO(header), nrows=0, **dialect).columns)
+        width = len(names)
+        probe = read_kwargs.get('sep', ',').encode('utf-8') * width + b'\n'
+        read_kwargs.update(names=names + [_EXTRA], header=0, usecols=list(read_kwargs['usecols']) + [_EXTRA])
+        if isinstance(read_kwargs['dtype'], dict):
+            read_kwargs['dtype'] = dict(read_kwargs['dtype'], **{_EXTRA: str})
+
+    def drop_extra_fields(chunk, block, block_offset):
+        chunk = chunk.iloc[:-1]
+        extra = chunk.pop(_EXTRA).notna().to_numpy()
+        if not extra.any():
+            return chunk
+        # Line numbers in the block, as pandas gives them, of the rows (blank records make none)
+        lines = [number for number, record in enumerate(block[1:], 2) if record.strip()]
+        lines = [lines[row] for row in np.flatnonzero(extra)]
+        if on_bad_lines == 'error':
+            raise pd.errors.ParserError(f"Expected {width} fields in line {lines[0]} of the chunk, saw more")
+        messages = [f"Skipping line {number}: expected {width} fields, saw more" for number in lines]
+        if quarantined:
+            quarantine.records(messages, block, ipath, block_offset)
+        elif on_bad_lines == 'warn':
+            for message in messages:
+                warnings.warn(message, pd.errors.ParserWarning)
+        return chunk[~extra].reset_index(drop=True)
+
+    def parse(block, block_offset):
+        start = time.perf_counter()
+        if quarantined:
+            # Skipped records are reported as warnings, which name them by their number in the block
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always', pd.errors.ParserWarning)
+                chunk = pd.read_csv(io.BytesIO(_joined(block, probe)), **read_kwargs)
+            messages = [w.message for w in caught if issubclass(w.category, pd.errors.ParserWarning)]
+            if messages:
+                quarantine.records(messages, block, ipath, block_offset)
+        else:
+            chunk = pd.read_csv(io.BytesIO(_joined(block, probe)), **read_kwargs)
+        if width is not None:
+            chunk = drop_extra_fields(chunk, block, block_offset)
+        if metrics is not None:
+            metrics.observe('parse', time.perf_counter() - start)
+        return chunk
+
+    with open(ipath, 'rb') as f:
+        f.seek(data_offset if start_offset is None else start_offset)
+        block = [header]
+        offset = block_offset = f.tell()
+        rows = budget.rows() if budget is not None else chunk_rows
+        start = time.perf_counter()
+        for record in iter_records(f, end_offset):
+            block.append(record)
+            offset += len(record)
+            if len(block) > rows:
+                if metrics is not None:
+                    metrics.observe('read', time.perf_counter() - start)
+                chunk = parse(block, block_offset)
+                if budget is not None:
+                    rows = budget.observe(len(block) - 1, offset - block_offset)
+                # The raw records are dropped before the chunk is handed out, not after it was processed
+                block = [header]
+                block_offset = offset
+                yield chunk, offset
+                del chunk
+                start = time.perf_counter()
+        if len(block) > 1:
+            if metrics is not None:
+                metrics.observe('read', time.perf_counter() - start)
+            chunk = parse(block, block_offset)
+            del block
+            yield chunk, offset
+
+
+
+def split_ranges(ipath, parts, start_offset=None, block_size=1 << 24):
+    """
+    Split a CSV into byte ranges that each start and end on a record boundary.
+
+    A newline ends a record when the number of double quotes since the first
+    data record is even, the same rule as iter_records(), so quoted fields
+    with embedded newlines never straddle two ranges. Quotes are counted per
+    block in C, so the scan runs at disk speed.
+
+    Args:
+        ipath (str): Path to the CSV file
+        parts (int): Desired number of ranges
+        start_offset (int, optional): Record offset to split from; defaults to just after the header
+        block_size (int): Bytes read at a time
+
+    Returns:
+        list: (start, end) offsets, at most `parts` non-empty ranges covering the data
+    """
+    size = os.path.getsize(ipath)
+    start = read_header(ipath)[1] if start_offset is None else start_offset
+    targets = [start + (size - start) * k // parts for k in range(1, parts)]
+    bounds = [start]
+    with open(ipath, 'rb') as f:
+        f.seek(start)
+        position, quotes, target = start, 0, 0
+        while target < len(targets):
+            block = f.read(block_size)
+            if not block:
+                break
+            i = 0
+            while target < len(targets):
+                if targets[target] >= position + len(block):
+                    break
+                # Advance to the target, then to the first newline that closes a record
+                j = max(targets[target] - position, i)
+                quotes += block.count(b'"', i, j)
+                i = j
+                newline = block.find(b'\n', i)
+                while newline >= 0:
+                    quotes += block.count(b'"', i, newline)
+                    i = newline + 1
+                    if quotes % 2 == 0:
+                        break
+                    newline = block.find(b'\n', i)
+                if newline < 0:
+                    # The record continues in the next block; keep looking from there
+                    targets[target] = position + len(block)
+                    break
+                if position + i > bounds[-1]:
+                    bounds.append(position + i)
+                target += 1
+            quotes += block.count(b'"', i)
+            position += len(block)
+    bounds.append(size)
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+class Checkpoint:
+    """
+    Persisted ingestion progress of one source file into one index.
+
+    The state is a small JSON file next to the input file, rewritten
+    atomically after every acknowledged bulk batch. It is only trusted while
+    the input file keeps the size and modification time it was recorded with.
+    """
+
+    def __init__(self, index_name, ipath):
+        self.index_name = index_name
+        self.ipath = ipath
+        self.path = os.path.join(os.path.dirname(os.path.abspath(ipath)), f'{index_name}.checkpoint.json')
+
+    def _fingerprint(self):
+        stat = os.stat(self.ipath)
+        return {'source': os.path.abspath(self.ipath), 'size': stat.st_size, 'mtime': int(stat.st_mtime)}
+
+    def load(self):
+        """Return the saved state, or None if there is none or the input file changed."""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'r') as f:
+            state = json.load(f)
+        fingerprint = self._fingerprint()
+        if any(state.get(key) != value for key, value in fingerprint.items()):
+            print(f"WARNING: '{self.ipath}' changed since checkpoint {self.path}, starting over")
+            return None
+        return state
+
+    def save(self, **state):
+        """Atomically persist progress, e.g. offset, chunk_idx, total_records, total_errors."""
+        state.update(self._fingerprint())
+        state['index'] = state.get('index', self.index_name)
+        state['updated'] = time.strftime('%Y-%m-%d %H:%M:%S')
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def finish(self, **state):
+        """Mark the source as fully indexed so a later --resume skips it."""
+        self.save(offset=os.path.getsize(self.ipath), complete=True, **state)
+
+    def clear(self):
+        """Forget any previous progress before a fresh load."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def resume_state(index_name, ipath, resume):
+    """
+    Resolve where an indexer should start.
+
+    Args:
+        index_name (str): Logical index name the checkpoint is keyed by
+        ipath (str): Input file
+        resume (bool): Whether --resume was requested
+
+    Returns:
+        tuple: (Checkpoint, saved state dict or None for a fresh load)
+    """
+    checkpoint = Checkpoint(index_name, ipath)
+    state = checkpoint.load() if resume else None
+    if state is None:
+        checkpoint.clear()
+    elif state.get('complete'):
+        print(f"Checkpoint: '{index_name}' already completed from {ipath}, nothing to resume")
+    else:
+        print(f"Checkpoint: resuming '{index_name}' at {'row' if state.get('staged') else 'byte'} {state['offset']} "
+              f"after chunk {state['chunk_idx']} ({state['total_records']} records indexed)")
+    return checkpoint, state
@@ -0,0 +1,235 @@
+import os
+import re
+import json
+import argparse
+
+import elasticsearch
+
+from bulk_encoder import dumps
+from bulk_writer import pipelined_bulk
+from checkpoint import read_header
+
+# Dead letters and quarantined CSV records.
+#
+# Documents Elasticsearch refused for good (a mapping conflict, a bad date,
+# or a rejection that outlived every retry) are not just counted: each is
+# appended to '<index>.deadletter.ndjson' next to the source file, as one
+# compact JSON line with the index, '_id', status, error, the source file
+# and the offsets of the chunk it came from, and the document itself.
+# `deadletter.py replay` sends them again and keeps only those that still
+# fail. CSV records the parser cannot split into the header's columns go to
+# '<index>.quarantine.ndjson' with their byte offset instead of being
+# skipped silently; `deadletter.py records` turns them back into a CSV to be
+# fixed and loaded again. A load holds quarantined records back until the
+# chunk they were read in is checkpointed, and a resumed load, which parses
+# the uncommitted chunks again, skips the records already in the file, so no
+# record is quarantined twice. Both files are only created once something
+# fails, and every entry is appended with a single write, so the worker
+# processes of one load can share them.
+
+_BAD_LINE = re.compile(r'Skipping line (\d+): (.*)')
+
+
+def dead_letter_path(ipath, index_name):
+    """'<input dir>/<index>.deadletter.ndjson'"""
+    return os.path.join(os.path.dirname(os.path.abspath(ipath)), f'{index_name}.deadletter.ndjson')
+
+
+def quarantine_path(ipath, index_name):
+    """'<input dir>/<index>.quarantine.ndjson'"""
+    return os.path.join(os.path.dirname(os.path.abspath(ipath)), f'{index_name}.quarantine.ndjson')
+
+
+def clear(ipath, index_name):
+    """Forget the dead letters and quarantined records of a previous load before a fresh one."""
+    for path in (dead_letter_path(ipath, index_name), quarantine_path(ipath, index_name)):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def report(ipath, index_name):
+    """Print where the dead letters and quarantined records of a load are, if it has any."""
+    for path, what in ((dead_letter_path(ipath, index_name), 'refused documents (deadletter.py replay)'),
+                       (quarantine_path(ipath, index_name), 'unparsable CSV records (deadletter.py records)')):
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                print(f"☠️ {sum(1 for _ in f)} {what} kept in '{path}'")
+
+
+def bad_lines(messages):
+    """(line number, reason) of every record pandas skipped, from its 'Skipping line N: ...' warnings."""
+    return [(int(number), reason) for message in messages for number, reason in _BAD_LINE.findall(str(message))]
+
+
+def _error(item):
+    error = item.get('error')
+    if isinstance(error, dict):
+        error = f"{error.get('type')}: {error.get('reason')}"
+    return str(error)[:500]
+
+
+class DeadLetterWriter:
+    """
+    Appends dead letters or quarantined records to one NDJSON file.
+
+    Args:
+        path (str): File, created on the first entry
+        index (str, optional): Index the dead letters are replayed into instead of
+            the one they were sent to, e.g. the alias of a generation that may be
+            gone by the time they are replayed
+        deferred (bool): Hold quarantined records until commit() reaches their offset
+    """
+
+    def __init__(self, path, index=None, deferred=False):
+        self.path = path
+        self.index = index
+        self.written = 0
+        self.pending = [] if deferred else None
+        self.committed = set()
+
+    def _append(self, lines):
+        if not lines:
+            return
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, b''.join(lines))
+        finally:
+            os.close(fd)
+        self.written += len(lines)
+
+    def documents(self, errors, lines, source, start_offset=None, end_offset=None):
+        """
+        Dead-letter the failed items of a bulk group.
+
+        Args:
+            errors (list): Failed bulk items ({op: {'_id', 'status', 'error'}})
+            lines (list): The group's encoded documents (bulk_encoder.encode_lines())
+            source (str): File the documents were read from
+            start_offset (int, optional): Offset (byte, or row of a stage) the chunk starts at
+            end_offset (int, optional): Offset just past the chunk
+        """
+        by_id = {}
+        for line in lines:
+            action = json.loads(line[:line.index(b'\n')])
+            by_id[next(iter(action.values())).get('_id')] = (action, line)
+        entries = []
+        for item in errors:
+            op, result = next(iter(item.items()))
+            action, line = by_id.get(result.get('_id'), (None, None))
+            if line is None:
+                continue
+            meta = next(iter(action.values()))
+            entry = dumps({'index': self.index or meta.get('_index'), '_id': meta.get('_id'), 'status': result.get('status'),
+                           'error': _error(result), 'source': source, 'offset': [start_offset, end_offset]})
+            entries.append(entry[:-1] + b',"doc":' + line[line.index(b'\n') + 1:].rstrip(b'\n') + b'}\n')
+        self._append(entries)
+
+    def records(self, messages, block, source, start_offset):
+        """
+        Quarantine the CSV records pandas skipped in a parsed block.
+
+        Args:
+            messages (list): pandas' 'Skipping line N: ...' warnings for the block,
+                where line N is the block's Nth record, the header being line 1
+            block (list): The block's raw records, the header first
+            source (str): CSV file
+            start_offset (int): Offset of the block's first data record
+        """
+        offsets = [start_offset]
+        for record in block[1:]:
+            offsets.append(offsets[-1] + len(record))
+        entries = [(offsets[number - 2], dumps({'source': source, 'offset': offsets[number - 2], 'reason': reason,
+                                                'record': block[number - 1].decode('utf-8', 'replace')}) + b'\n')
+                   for number, reason in bad_lines(messages)
+                   if 1 < number <= len(block) and offsets[number - 2] not in self.committed]
+        if self.pending is not None:
+            self.pending.extend(entries)
+        else:
+            self._append([entry for _, entry in entries])
+
+    def resume(self, source, offset):
+        """Skip the records of source at or past offset that an interrupted load already quarantined."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            # Other workers may be appending; an unterminated last line is not theirs to finish here
+            entries = [json.loads(line) for line in f if line.endswith(b'\n') and line.strip()]
+        self.committed = {entry['offset'] for entry in entries
+                          if entry.get('source') == source and entry.get('offset', -1) >= offset}
+
+    def commit(self, offset):
+        """Append the held records that start before offset, once the chunks up to it are checkpointed."""
+        if not self.pending:
+            return
+        self._append([entry for start, entry in self.pending if start < offset])
+        self.pending = [(start, entry) for start, entry in self.pending if start >= offset]
+
+
+def iter_dead_letters(path):
+    """Stream the entries of a dead-letter or quarantine file."""
+    with open(path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def replay(path, es_host='http://localhost:9200', chunk_size=500, thread_count=2):
+    """
+    Send the documents of a dead-letter file again.
+
+    Entries that are indexed now are removed from the file; those that still
+    fail are kept, with their new error.
+
+    Returns:
+        tuple: (documents indexed, documents still failing)
+    """
+    es = elasticsearch.Elasticsearch(hosts=[es_host])
+    entries = list(iter_dead_letters(path))
+    lines = [dumps({'index': {'_index': entry['index'], '_id': entry['_id']}}) + b'\n' + dumps(entry['doc']) + b'\n'
+             for entry in entries]
+    failed = {}
+    indexed = 0
+    groups = ((lines[i:i + chunk_size], i) for i in range(0, len(lines), chunk_size))
+    for _, success, errors in pipelined_bulk(es, groups, thread_count=thread_count, queue_size=thread_count,
+                                             chunk_size=chunk_size):
+        indexed += success
+        failed.update((result.get('_id'), result) for result in (next(iter(item.values())) for item in errors))
+
+    remaining = [dict(entry, status=failed[entry['_id']].get('status'), error=_error(failed[entry['_id']]))
+                 for entry in entries if entry['_id'] in failed]
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.writelines(dumps(entry) + b'\n' for entry in remaining)
+    os.replace(tmp_path, path)
+    print(f"📬 {indexed} dead letters indexed, {len(remaining)} still failing in '{path}'")
+    return indexed, len(remaining)
+
+
+def export_records(path, out_csv):
+    """Write quarantined records back as a CSV under their source's header, to be fixed and loaded again."""
+    entries = list(iter_dead_letters(path))
+    with open(out_csv, 'wb') as f:
+        if entries:
+            f.write(read_header(entries[0]['source'])[0])
+        for entry in entries:
+            record = entry['record'].encode('utf-8')
+            f.write(record if record.endswith(b'\n') else record + b'\n')
+    print(f"📝 {len(entries)} quarantined records written to '{out_csv}'")
+    return len(entries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Replay dead letters and export quarantined CSV records')
+    commands = parser.add_subparsers(dest='command', required=True)
+    rparser = commands.add_parser('replay', help='Index the documents of a dead-letter file again')
+    rparser.add_argument('path', help="'<index>.deadletter.ndjson' file")
+    rparser.add_argument('--host', default='http://localhost:9200', help='Elasticsearch URL')
+    eparser = commands.add_parser('records', help='Write quarantined records back as a CSV')
+    eparser.add_argument('path', help="'<index>.quarantine.ndjson' file")
+    eparser.add_argument('out', help='CSV to write')
+    args = parser.parse_args()
+
+    if args.command == 'replay':
+        _, remaining = replay(args.path, es_host=args.host)
+        raise SystemExit(1 if remaining else 0)
+    export_records(args.path, args.out)
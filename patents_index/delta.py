@@ -0,0 +1,254 @@
+import os
+import gzip
+import time
+import hashlib
+from contextlib import nullcontext
+
+import numpy as np
+import elasticsearch
+
+from bulk_writer import BULK_MAX_BYTES, BULK_MIN_BYTES, BULK_QUEUE, BULK_THREADS, BatchSizer, pipelined_bulk
+from deadletter import DeadLetterWriter, dead_letter_path
+from governor import IngestGovernor
+from bulk_encoder import encode_lines
+from ingest import CHUNK_ROWS, ES_HOST, document_actions, document_ids, ingest, iter_source_columns
+from patent_keys import UNKEYED, contains, patent_keys, patent_ids
+
+# Incremental loads of new PatentsView releases.
+#
+# After every load of a source, a manifest of one content hash per patent is
+# kept: the sum (mod 2**64) of the hashes of the encoded documents the
+# source produced for that patent, one per document ID as a load of the
+# whole file in one chunk would leave them, so the hash depends neither on
+# the order of rows in the file nor on how it was chunked. Manifests are two sorted arrays, the patents' integer
+# keys (patent_keys.py) and their hashes, saved as compressed NumPy files. A
+# delta load hashes the new file the same way and diffs it against the
+# manifest by binary search. Only patents whose hash changed are touched:
+# their old documents (and those of patents gone from the release) are
+# deleted, their new rows are indexed, and the set of touched patents is
+# returned so that only their 'patentsview' documents are enriched again
+# (enrich.reenrich_patents()). The manifest is replaced only after a delta
+# without errors, so a failed or interrupted delta is simply run again. A
+# full load (ingest(), replay()) deletes it, since it no longer describes the
+# index; the next delta then loads in full and writes a new one.
+
+MANIFEST_DIR = os.environ.get('PATENTS_MANIFEST_DIR', os.path.expanduser('~/.patents_index/manifests'))
+
+# Patents per delete_by_query request
+DELETE_BATCH = 1000
+
+
+
+def manifest_path(spec, manifest_dir=None):
+    """Manifest of a source's last load: '<manifest_dir>/<index>.manifest.npz'."""
+    return os.path.join(manifest_dir or MANIFEST_DIR, f"{spec['index']}.manifest.npz")
+
+
+def forget_manifest(spec, manifest_dir=None):
+    """Delete a source's manifest (and a text one of earlier versions) once a full load replaced its index."""
+    path = manifest_path(spec, manifest_dir)
+    for stale in (path, path[:-len('.npz')] + '.tsv.gz'):
+        if os.path.exists(stale):
+            os.remove(stale)
+            print(f"🗑️ Manifest {stale} no longer matches '{spec['index']}' and was deleted")
+
+
+def _sum_by_key(keys, digests):
+    # Sorted unique keys and the sum (mod 2**64, uint64 wraps) of the digests of each
+    if not len(keys):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint64)
+    order = np.argsort(keys, kind='stable')
+    keys, digests = keys[order], digests[order]
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    return keys[starts], np.add.reduceat(digests, starts)
+
+
+def _blake2b64(items):
+    # 64-bit BLAKE2b digest of each bytes item
+    return np.frombuffer(b''.join(hashlib.blake2b(item, digest_size=8).digest() for item in items),
+                         dtype='<u8').astype(np.uint64)
+
+
+def _one_per_id(id_hashes, first):
+    # Positions, in file order, of the first (or last) row of every document ID
+    if first:
+        _, positions = np.unique(id_hashes, return_index=True)
+    else:
+        _, positions = np.unique(id_hashes[::-1], return_index=True)
+        positions = len(id_hashes) - 1 - positions
+    return np.sort(positions)
+
+
+def load_manifest(path):
+    """
+    Return the (sorted keys, hashes) arrays of a manifest, or None if there is none.
+
+    A text manifest of earlier versions ('<index>.manifest.tsv.gz' next to it) is read instead
+    if that is all there is.
+    """
+    if os.path.exists(path):
+        with np.load(path) as manifest:
+            return manifest['keys'], manifest['hashes']
+    legacy_path = path[:-len('.npz')] + '.tsv.gz'
+    if not os.path.exists(legacy_path):
+        return None
+    with gzip.open(legacy_path, 'rt', encoding='utf-8') as f:
+        rows = [line.rstrip('\n').split('\t') for line in f]
+    keys = patent_keys([pid for pid, _ in rows])
+    digests = np.array([int(digest, 16) for _, digest in rows], dtype=np.uint64)
+    keyed = keys != UNKEYED
+    return _sum_by_key(keys[keyed], digests[keyed])
+
+
+def save_manifest(path, hashes):
+    """Atomically replace a manifest with (sorted keys, hashes) arrays."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    keys, digests = hashes
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(f, keys=keys, hashes=digests)
+    os.replace(tmp_path, path)
+
+
+def patent_hashes(spec, ipath, chunk_rows=CHUNK_ROWS, stage_dir=None, max_rss=None):
+    """
+    Hash the documents a source file produces, per patent.
+
+    Rows sharing a document ID count once, whichever chunks they fall in:
+    the first one for a spec that dedupes its rows (later ones are dropped
+    when in the same chunk), the last one otherwise (it overwrites the
+    others). One ID hash, content hash and key per document is held until
+    the end, 24 bytes each.
+
+    Args:
+        spec (dict): Source spec from sources.SOURCES
+        ipath (str): Source CSV (its Parquet stage is read if it has one)
+        chunk_rows (int): Records per chunk
+        stage_dir (str, optional): Root of the Parquet stages
+        max_rss (int, optional): Memory budget that CSV chunks are sized to
+
+    Returns:
+        tuple: (sorted int64 patent keys, uint64 order-independent content hash of each)
+    """
+    first = bool(spec.get('dedupe'))
+    keys, id_hashes, digests, unkeyed = [], [], [], 0
+    for columns in iter_source_columns(spec, ipath, chunk_rows, stage_dir, max_rss):
+        ids = document_ids(spec, columns)
+        lines = encode_lines(spec['index'], columns, ids=ids)
+        chunk_keys = patent_keys(columns['patent_id'])
+        keyed = chunk_keys != UNKEYED
+        unkeyed += len(keyed) - int(keyed.sum())
+        chunk_ids = _blake2b64(doc_id.encode('utf-8') for doc_id in ids)[keyed]
+        keep = _one_per_id(chunk_ids, first)
+        keys.append(chunk_keys[keyed][keep])
+        id_hashes.append(chunk_ids[keep])
+        digests.append(_blake2b64(lines)[keyed][keep])
+    if unkeyed:
+        print(f"⚠️ {unkeyed} rows of '{ipath}' have a patent_id of no known form and are left out of the delta")
+    if not keys:
+        return _sum_by_key(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint64))
+    keep = _one_per_id(np.concatenate(id_hashes), first)
+    return _sum_by_key(np.concatenate(keys)[keep], np.concatenate(digests)[keep])
+
+
+def _delete_patents(es, index_name, pids):
+    """Delete every document of the given patents from an index; returns the number deleted."""
+    deleted = 0
+    for i in range(0, len(pids), DELETE_BATCH):
+        response = es.delete_by_query(index=index_name, query={"terms": {"patent_id": pids[i:i + DELETE_BATCH]}},
+                                      conflicts='proceed', refresh=True)
+        deleted += response.get('deleted', 0)
+    return deleted
+
+
+def ingest_delta(spec, ipath, es_host=ES_HOST, manifest_dir=None, chunk_rows=CHUNK_ROWS,
+                 bulk_threads=BULK_THREADS, bulk_queue=BULK_QUEUE, stage_dir=None,
+                 bulk_bytes=(BULK_MIN_BYTES, BULK_MAX_BYTES), throttle=False, max_rss=None, **options):
+    """
+    Bring a source's index up to date with a new release of its file.
+
+    Without a manifest (or without the index) the source is loaded in full
+    with ingest() and its manifest is written afterwards.
+
+    Args:
+        spec (dict): Source spec from sources.SOURCES
+        ipath (str): The new release's CSV
+        es_host (str): Elasticsearch host URL
+        manifest_dir (str, optional): Directory of the manifests; defaults to MANIFEST_DIR
+        chunk_rows (int): Records per chunk
+        bulk_threads (int): Concurrent bulk requests
+        bulk_queue (int): Bulk requests allowed to wait for a sender
+        stage_dir (str, optional): Root of the Parquet stages
+        bulk_bytes (tuple): (smallest, largest) bulk request payload, tuned in between
+        throttle (bool): Send fewer bulk requests at once while the cluster is under pressure
+        max_rss (int, optional): Resident memory budget that CSV chunks are sized to
+        **options: Further ingest() options for a full load (resume, workers, ...)
+
+    Returns:
+        set or None: IDs of the patents whose documents changed, or None after a full load
+    """
+    index_name = spec['index']
+    path = manifest_path(spec, manifest_dir)
+    previous = load_manifest(path)
+    es = elasticsearch.Elasticsearch(hosts=[es_host])
+
+    if previous is None or not es.indices.exists(index=index_name):
+        print(f"🆕 No manifest of '{index_name}' at {path}, loading '{ipath}' in full")
+        ingest(spec, ipath, es_host=es_host, chunk_rows=chunk_rows, bulk_threads=bulk_threads,
+               bulk_queue=bulk_queue, stage_dir=stage_dir, bulk_bytes=bulk_bytes, throttle=throttle, max_rss=max_rss,
+               manifest_dir=manifest_dir, **options)
+        save_manifest(path, patent_hashes(spec, ipath, chunk_rows, stage_dir, max_rss))
+        print(f"💾 Manifest of '{index_name}' saved to {path}")
+        return None
+
+    start_time = time.time()
+    print(f"🔍 Diffing '{ipath}' against the manifest of '{index_name}'...")
+    hashes = keys, digests = patent_hashes(spec, ipath, chunk_rows, stage_dir, max_rss)
+    old_keys, old_digests = previous
+    known = contains(old_keys, keys)
+    positions = np.searchsorted(old_keys, keys[known])
+    updated = keys[known][old_digests[positions] != digests[known]]
+    added = keys[~known]
+    changed = np.union1d(updated, added)
+    removed = old_keys[~contains(keys, old_keys)]
+    print(f"📊 '{index_name}': {len(updated)} patents changed, {len(added)} added, {len(removed)} removed, "
+          f"of {len(keys)} ({(len(changed) + len(removed)) / max(len(keys), 1):.2%})")
+
+    # Documents keyed by the patent ID are overwritten in place; child rows are not,
+    # so all documents of a changed patent go before its new rows are indexed
+    stale = removed if tuple(spec['id']) == ('patent_id',) else np.union1d(updated, removed)
+    if len(stale):
+        deleted = _delete_patents(es, index_name, patent_ids(stale))
+        print(f"🗑️ '{index_name}': {deleted} documents of {len(stale)} patents deleted")
+
+    def chunk_actions():
+        for columns in iter_source_columns(spec, ipath, chunk_rows, stage_dir, max_rss):
+            keep = contains(changed, patent_keys(columns['patent_id']))
+            if keep.any():
+                actions = document_actions(spec, {field: values[keep] for field, values in columns.items()},
+                                           index_name)
+                yield actions, actions
+
+    total_records, total_errors = 0, 0
+    dead_letters = DeadLetterWriter(dead_letter_path(ipath, index_name))
+    sizer = BatchSizer(min_bytes=bulk_bytes[0], max_bytes=bulk_bytes[1])
+    throttling = IngestGovernor(es, bulk_threads) if throttle else nullcontext()
+    with throttling as governor:
+        for actions, success, errors in pipelined_bulk(es, chunk_actions(), thread_count=bulk_threads,
+                                                       queue_size=bulk_queue, sizer=sizer, governor=governor):
+            total_records += success
+            total_errors += len(errors)
+            if errors:
+                print(f"⚠️ {len(errors)} documents failed, first: {errors[:1]}")
+                dead_letters.documents(errors, actions, ipath)
+    es.indices.refresh(index=index_name)
+
+    if total_errors:
+        print(f"⚠️ '{index_name}': {total_errors} documents failed, the manifest is kept so the delta can be run again")
+    else:
+        save_manifest(path, hashes)
+    if spec.get('snapshot'):
+        print(f"⚠️ The '{spec['snapshot']}' snapshot of the last full load does not include this delta")
+    print(f"📈 '{index_name}': {total_records} documents indexed for {len(changed)} patents, "
+          f"{total_errors} errors, {time.time() - start_time:.2f} seconds")
+    return set(patent_ids(np.union1d(changed, removed)))
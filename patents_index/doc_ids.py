@@ -0,0 +1,40 @@
+import json
+import hashlib
+
+# Stable Elasticsearch document IDs.
+#
+# Every indexer derives its '_id' from the source row instead of letting
+# Elasticsearch assign a random one, so re-running a chunk overwrites the
+# same documents rather than duplicating them, and single-document lookups
+# can use GET/mget instead of a search.
+
+
+def patent_doc_id(patent_id):
+    """ID of a document that exists once per patent (patents, summaries, patentsview)."""
+    return str(patent_id).strip()
+
+
+def child_doc_id(patent_id, *parts):
+    """ID of a child row identified by a natural key, e.g. 'patent_id:claim_sequence'."""
+    return ':'.join([patent_doc_id(patent_id)] + [str(part).strip() for part in parts])
+
+
+def content_doc_id(patent_id, source):
+    """
+    ID of a child row without a natural key, derived from its content.
+
+    Used for people and CPC rows, where a patent has several rows and no
+    column identifies one. Identical rows collapse into one document.
+
+    Args:
+        patent_id (str): Owning patent
+        source (dict): Document source
+
+    Returns:
+        str: 'patent_id:<sha1 prefix of the canonical JSON source>', or just
+        the digest when patent_id is empty
+    """
+    digest = hashlib.sha1(
+        json.dumps(source, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+    ).hexdigest()[:20]
+    return child_doc_id(patent_id, digest) if patent_doc_id(patent_id) else digest
@@ -0,0 +1,255 @@
+import multiprocessing
+from collections import defaultdict
+
+import elasticsearch
+import elasticsearch.helpers
+
+from bulk_writer import BatchSizer, write_actions
+from doc_ids import patent_doc_id
+from patentsview import PATENTSVIEW_INDEX, attach_children
+
+# Children indexed once per patent with the patent ID as '_id', fetched by mget
+MGET_CHILDREN = ('summary',)
+
+# Child indices written by the index_global.py source indexers, keyed by the
+# attach_children() keyword they feed
+CHILD_INDICES = {
+    'us_citations': 'us_citations',
+    'us_app_citations': 'us_app_citation_tmp',
+    'summary': 'patent_summary_tmp',
+    'claims': 'claim_tmp',
+    'people': 'patent_people_tmp',
+    'cpc_classes': 'cpc_classes_tmp'
+}
+
+
+def existing_children(es, child_indices=CHILD_INDICES):
+    """
+    Resolve which child indices exist, once per run.
+
+    Args:
+        es (Elasticsearch): Client
+        child_indices (dict): attach_children() keyword -> index name
+
+    Returns:
+        dict: The subset of ``child_indices`` that exists in the cluster
+    """
+    present = {}
+    for child, index in child_indices.items():
+        if es.indices.exists(index=index):
+            present[child] = index
+        else:
+            print(f"Child index '{index}' not found, '{child}' will not be enriched")
+    return present
+
+
+def fetch_by_id(es, index, pids):
+    """
+    Retrieve children stored once per patent under the patent ID with a single mget.
+
+    Returns:
+        dict: patent_id -> [child ``_source``] for the patents that have one
+    """
+    response = es.mget(index=index, ids=[patent_doc_id(pid) for pid in pids])
+    return {doc['_id']: [doc['_source']] for doc in response['docs'] if doc.get('found')}
+
+
+def fetch_children(es, index, pids, page_size=5000):
+    """
+    Retrieve every document of a child index belonging to a batch of patents.
+
+    A single ``terms`` filter covers the whole batch and the scroll pages
+    through all matches, so patents with thousands of claims or citations are
+    never truncated.
+
+    Args:
+        es (Elasticsearch): Client
+        index (str): Child index name
+        pids (list): Patent IDs of the batch
+        page_size (int): Scroll page size
+
+    Returns:
+        dict: patent_id -> list of child ``_source`` dicts
+    """
+    grouped = defaultdict(list)
+    query = {"query": {"bool": {"filter": {"terms": {"patent_id": pids}}}}}
+    for hit in elasticsearch.helpers.scan(es, index=index, query=query, size=page_size):
+        source = hit['_source']
+        grouped[source.get('patent_id')].append(source)
+    return grouped
+
+
+def enrich_batch(es, patents, child_indices):
+    """
+    Enrich a batch of patent documents with one query per child index.
+
+    Args:
+        es (Elasticsearch): Client
+        patents (list): Patent ``_source`` dicts from 'patent_tmp'
+        child_indices (dict): Existing child indices, see existing_children()
+
+    Returns:
+        list: The enriched patent documents, in input order
+    """
+    pids = [patent['patent_id'] for patent in patents]
+    children = {
+        child: (fetch_by_id if child in MGET_CHILDREN else fetch_children)(es, index, pids)
+        for child, index in child_indices.items()
+    }
+
+    enriched = []
+    for patent in patents:
+        pid = patent['patent_id']
+        found = {child: grouped.get(pid) for child, grouped in children.items()}
+        if found.get('summary'):
+            found['summary'] = found['summary'][0].get('summary')
+        enriched.append(attach_children(patent, **found))
+    return enriched
+
+
+def enrich_patents(es, hits, child_indices, batch_size=1000):
+    """
+    Regroup scanned patent hits into batches and yield enriched documents.
+
+    Args:
+        es (Elasticsearch): Client
+        hits (iterator): Hits from scanning the patent index
+        child_indices (dict): Existing child indices, see existing_children()
+        batch_size (int): Patents looked up per round of child queries
+
+    Yields:
+        dict: Enriched 'patentsview' documents
+    """
+    batch = []
+    for hit in hits:
+        batch.append(hit['_source'])
+        if len(batch) >= batch_size:
+            yield from enrich_batch(es, batch, child_indices)
+            batch = []
+    if batch:
+        yield from enrich_batch(es, batch, child_indices)
+
+
+def index_enriched(es, patent_index, child_indices, batch_size=1000, slice_id=None, max_slices=None,
+                   target=PATENTSVIEW_INDEX):
+    """
+    Scan the patent index (or one slice of it), enrich and bulk index into 'patentsview' (or target).
+
+    Args:
+        es (Elasticsearch): Client
+        patent_index (str): Index or alias holding the patent documents
+        child_indices (dict): Existing child indices, see existing_children()
+        batch_size (int): Patents per enrichment round and per bulk request
+        slice_id (int, optional): Slice handled by this call
+        max_slices (int, optional): Total number of slices; None scans everything
+        target (str): Index written to, e.g. a new generation of 'patentsview'
+
+    Returns:
+        dict: 'processed', 'indexed' and 'errors' counts
+    """
+    query = {"query": {"match_all": {}}}
+    label = "patentsview"
+    if max_slices and max_slices > 1:
+        query["slice"] = {"id": slice_id, "max": max_slices}
+        label = f"patentsview slice {slice_id + 1}/{max_slices}"
+
+    hits = elasticsearch.helpers.scan(es, index=patent_index, query=query)
+    counts = {'processed': 0, 'indexed': 0, 'errors': 0}
+    actions = []
+    sizer = BatchSizer()
+
+    def flush():
+        # Cut into bulk requests by payload size; patentsview documents vary widely in size
+        success, errors = write_actions(es, actions, thread_count=1, queue_size=0, sizer=sizer)
+        counts['indexed'] += success
+        if errors:
+            counts['errors'] += len(errors)
+            print(f"[{label}] Errors during bulk indexing (first 5): {errors[:5]}")
+
+    for patent in enrich_patents(es, hits, child_indices, batch_size):
+        actions.append({
+            "_op_type": "index",
+            "_index": target,
+            "_id": patent_doc_id(patent['patent_id']),
+            "_source": patent
+        })
+        counts['processed'] += 1
+        if len(actions) >= batch_size:
+            flush()
+            actions = []
+            if counts['processed'] % (batch_size * 10) == 0:
+                print(f"[{label}] Processed {counts['processed']} patents")
+    if actions:
+        flush()
+    return counts
+
+
+def _slice_worker(task):
+    # Each process owns its own client; connections cannot cross a fork
+    hosts, patent_index, child_indices, batch_size, slice_id, max_slices, target = task
+    es = elasticsearch.Elasticsearch(hosts=hosts)
+    return index_enriched(es, patent_index, child_indices, batch_size, slice_id, max_slices, target)
+
+
+def index_enriched_parallel(hosts, patent_index, child_indices, workers, batch_size=1000, target=PATENTSVIEW_INDEX):
+    """
+    Build 'patentsview' with one sliced scroll per worker process.
+
+    Args:
+        hosts (list): Elasticsearch hosts for the worker clients
+        patent_index (str): Index or alias holding the patent documents
+        child_indices (dict): Existing child indices, resolved once by the caller
+        workers (int): Number of slices and worker processes
+        batch_size (int): Patents per enrichment round and per bulk request
+        target (str): Index written to, e.g. a new generation of 'patentsview'
+
+    Returns:
+        dict: 'processed', 'indexed' and 'errors' counts summed over all slices
+    """
+    tasks = [(hosts, patent_index, child_indices, batch_size, slice_id, workers, target)
+             for slice_id in range(workers)]
+    totals = {'processed': 0, 'indexed': 0, 'errors': 0}
+    with multiprocessing.Pool(processes=workers) as pool:
+        for counts in pool.imap_unordered(_slice_worker, tasks):
+            for key in totals:
+                totals[key] += counts[key]
+    return totals
+
+
+def reenrich_patents(es, patent_index, child_indices, pids, batch_size=1000, target=PATENTSVIEW_INDEX):
+    """
+    Rebuild the 'patentsview' documents of some patents only, e.g. those a delta load touched.
+
+    Patents no longer in the patent index are deleted from 'patentsview'.
+
+    Args:
+        es (Elasticsearch): Client
+        patent_index (str): Index or alias holding the patent documents
+        child_indices (dict): Existing child indices, see existing_children()
+        pids (iterable): Patent IDs to enrich again
+        batch_size (int): Patents per mget, enrichment round and bulk request
+        target (str): Index or alias written to
+
+    Returns:
+        dict: 'processed', 'indexed', 'deleted' and 'errors' counts
+    """
+    pids = sorted(pids)
+    counts = {'processed': 0, 'indexed': 0, 'deleted': 0, 'errors': 0}
+    sizer = BatchSizer()
+    for i in range(0, len(pids), batch_size):
+        response = es.mget(index=patent_index, ids=[patent_doc_id(pid) for pid in pids[i:i + batch_size]])
+        patents = [doc['_source'] for doc in response['docs'] if doc.get('found')]
+        gone = [doc['_id'] for doc in response['docs'] if not doc.get('found')]
+        actions = [{"_op_type": "index", "_index": target, "_id": patent_doc_id(patent['patent_id']),
+                    "_source": patent} for patent in enrich_batch(es, patents, child_indices)]
+        actions += [{"_op_type": "delete", "_index": target, "_id": doc_id} for doc_id in gone]
+        success, errors = write_actions(es, actions, thread_count=1, queue_size=0, sizer=sizer)
+        # Deleting a patent that never made it into patentsview is not an error
+        errors = [error for error in errors if error.get('delete', {}).get('status') != 404]
+        counts['processed'] += len(actions)
+        counts['indexed'] += len(patents)
+        counts['deleted'] += len(gone)
+        counts['errors'] += len(errors)
+        if errors:
+            print(f"[patentsview] Errors during bulk indexing (first 5): {errors[:5]}")
+    return counts
@@ -1,9 +1,93 @@
 # -*- coding: utf-8 -*-
 
-import subprocess
+import os
 import json
+import time
+import random
 
-def create_index(index_name, mapping=None):
+import urllib3
+
+# Minimal Elasticsearch admin client over a pooled HTTP connection.
+#
+# All calls share one keep-alive connection pool per host, check the
+# response status and raise ElasticsearchHTTPError with the server's reply
+# instead of discarding it. The host defaults to $ES_HOST, or
+# http://localhost:9200.
+
+ES_HOST = os.environ.get('ES_HOST', 'http://localhost:9200')
+
+# Bulk bodies stay well below http.max_content_length (100mb by default)
+BULK_SLICE_BYTES = 10 * 1024 * 1024
+
+# Keep-alive connections kept per host, enough for a parallel uploader
+POOL_SIZE = 16
+
+# Item statuses of a cluster under pressure, retried by bulk()
+RETRY_STATUSES = (429, 502, 503, 504)
+
+_pools = {}
+
+
+class ElasticsearchHTTPError(RuntimeError):
+    """A request answered with an unexpected HTTP status."""
+
+    def __init__(self, method, url, status, body):
+        super().__init__(f"{method} {url} returned {status}: {body[:500]}")
+        self.status = status
+        self.body = body
+
+
+def _pool(host):
+    if host not in _pools:
+        _pools[host] = urllib3.PoolManager(
+            maxsize=POOL_SIZE,
+            retries=urllib3.Retry(total=3, backoff_factor=0.5, status_forcelist=RETRY_STATUSES,
+                                  allowed_methods=None, raise_on_status=False),
+            timeout=urllib3.Timeout(connect=10, read=300),
+        )
+    return _pools[host]
+
+
+def request(method, path, body=None, host=None, ok=(200, 201), content_type='application/json'):
+    """Send one request to Elasticsearch and return its decoded JSON reply.
+
+    Parameters
+    ----------
+    method : str
+        HTTP method.
+    path : str
+        Path below the host, e.g. '/my_index/_refresh'.
+    body : dict, bytes or None
+        Request body; dicts are JSON-encoded.
+    host : str, optional
+        Elasticsearch URL; defaults to ES_HOST.
+    ok : tuple of int
+        Statuses accepted as success.
+    content_type : str
+        Content type of a bytes body.
+
+    Returns
+    -------
+    dict or None
+        The decoded reply, or None when it is empty.
+
+    Raises
+    ------
+    ElasticsearchHTTPError
+        If the status is not in `ok`.
+    """
+    url = (host or ES_HOST).rstrip('/') + path
+    if isinstance(body, dict):
+        body = json.dumps(body).encode('utf-8')
+    headers = {'Content-Type': content_type} if body is not None else {}
+    response = _pool(host or ES_HOST).request(method, url, body=body, headers=headers)
+    data = response.data.decode('utf-8', 'replace')
+    if response.status not in ok:
+        raise ElasticsearchHTTPError(method, url, response.status, data)
+    return json.loads(data) if data.strip() else None
+
+
+def create_index(index_name, mapping=None, host=None):
     """Create an Elasticsearch index with optional custom mapping.
 
     Parameters
@@ -12,65 +96,147 @@ def create_index(index_name, mapping=None):
         Name of the Elasticsearch index to be created.
     mapping : dict, optional
         Custom mapping for the index properties. If None, use default mappings.
+    host : str, optional
+        Elasticsearch URL; defaults to ES_HOST.
     """
-    
+
     # Delete the index if it already exists to ensure a fresh start.
-    st = 'curl -o /dev/null -s -X DELETE "localhost:9200/{}"'.format(index_name)
-    subprocess.Popen(st, shell=True).communicate()
+    delete_index(index_name, host=host)
 
     # Base settings for all indexes
     settings = {"index": {"number_of_shards": 5}}
 
     # Define default mappings based on index name if no custom mapping is provided
+    # (typeless, as mapping types no longer exist since Elasticsearch 7, and without
+    # the '_field_names' parameter, which Elasticsearch 8 rejects)
     if mapping is None:
         if index_name == 'patent_tmp':
             mapping = {
-                "doc": {
-                    "_field_names": {"enabled": False},
-                    "properties": {
-                        "date": {"type": "date"},
-                        "id": {"type": "keyword"},
-                        "abstract": {"type": "text"}
-                    }
+                "properties": {
+                    "date": {"type": "date"},
+                    "id": {"type": "keyword"},
+                    "abstract": {"type": "text"}
                 }
             }
         else:
             mapping = {
-                "doc": {
-                    "_field_names": {"enabled": False},
-                    "properties": {
-                        "id": {"type": "keyword"},
-                        "text": {"type": "text"}
-                    }
+                "properties": {
+                    "id": {"type": "keyword"},
+                    "text": {"type": "text"}
                 }
             }
-    
+
     # Create the index with settings and mappings
-    payload = json.dumps({"settings": settings, "mappings": mapping})
-    st = f'curl -o /dev/null -s -X PUT "localhost:9200/{index_name}" -H ' + \
-         f'"Content-Type: application/json" -d \'{payload}\''
-    subprocess.Popen(st, shell=True).communicate()
+    request('PUT', f'/{index_name}', {"settings": settings, "mappings": mapping}, host=host)
 
     # Update index settings: set replicas to 0 and disable automatic refreshing
-    st = f'curl -o /dev/null -s -X PUT "localhost:9200/{index_name}/_settings" ' + \
-         '-H \'Content-Type: application/json\' -d \'{"index": {"number_of_replicas": 0, "refresh_interval": -1}}\''
-    subprocess.Popen(st, shell=True).communicate()
+    request('PUT', f'/{index_name}/_settings',
+            {"index": {"number_of_replicas": 0, "refresh_interval": -1}}, host=host)
 
-def delete_index(index_name):
-    """Delete an Elasticsearch index."""
-    st = f'curl -o /dev/null -s -X DELETE "localhost:9200/{index_name}"'
-    subprocess.Popen(st, shell=True).communicate()
 
-def refresh(index_name):
+def delete_index(index_name, host=None):
+    """Delete an Elasticsearch index; a missing index is not an error."""
+    request('DELETE', f'/{index_name}', host=host, ok=(200, 404))
+
+
+def refresh(index_name, host=None):
     """Refresh an Elasticsearch index."""
-    st = f'curl -o /dev/null -s -X PUT "localhost:9200/{index_name}/_settings" ' + \
-         '-H \'Content-Type: application/json\' -d \'{"index": {"refresh_interval": "1s"}}\''
-    subprocess.Popen(st, shell=True).communicate()
-    st = f'curl -o /dev/null -s -X POST "localhost:9200/{index_name}/_refresh"'
-    subprocess.Popen(st, shell=True).communicate()
-
-def bulk_insert(index_name, fp):
-    """Use Elasticsearch Bulk API to load data into an index."""
-    st = f'curl -o /dev/null -s -H "Content-Type: application/x-ndjson" ' + \
-         f'-XPOST "localhost:9200/{index_name}/doc/_bulk?pretty" --data-binary @{fp}'
-    subprocess.Popen(st, shell=True).communicate()
\ No newline at end of file
+    request('PUT', f'/{index_name}/_settings', {"index": {"refresh_interval": "1s"}}, host=host)
+    request('POST', f'/{index_name}/_refresh', host=host)
+
+
+def bulk_slices(f, slice_bytes=BULK_SLICE_BYTES):
+    """Read an NDJSON bulk stream in lists of actions of at most slice_bytes in total.
+
+    Each action is one bytes object holding the action line and, for all
+    but deletes, its source line, so a slice never separates the two.
+    """
+    actions, size = [], 0
+    for line in f:
+        if not line.strip():
+            continue
+        action = line if line.endswith(b'\n') else line + b'\n'
+        # Every action except delete is followed by its source line
+        if 'delete' not in json.loads(line):
+            source = next(f, b'')
+            action += source if source.endswith(b'\n') else source + b'\n'
+        if actions and size + len(action) > slice_bytes:
+            yield actions
+            actions, size = [], 0
+        actions.append(action)
+        size += len(action)
+    if actions:
+        yield actions
+
+
+def bulk(actions, index_name=None, host=None, max_retries=3, initial_backoff=2):
+    """Send encoded actions as one bulk request, retrying the items rejected under pressure.
+
+    Parameters
+    ----------
+    actions : list of bytes
+        Encoded actions, each with its source line (see bulk_slices).
+    index_name : str, optional
+        Default index of actions without '_index'.
+    host : str, optional
+        Elasticsearch URL; defaults to ES_HOST.
+    max_retries : int
+        Retries of items rejected with one of RETRY_STATUSES.
+    initial_backoff : float
+        Seconds before the first retry, doubled for every further one, with jitter.
+
+    Returns
+    -------
+    tuple
+        (number of actions that succeeded, list of failed items)
+    """
+    path = (f'/{index_name}' if index_name else '') + '/_bulk?filter_path=items.*.status,items.*.error'
+    success, errors = 0, []
+    for attempt in range(max_retries + 1):
+        if attempt:
+            time.sleep(initial_backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.0))
+        reply = request('POST', path, b''.join(actions), host=host, content_type='application/x-ndjson')
+        retry = []
+        for action, item in zip(actions, reply['items']):
+            status = next(iter(item.values()))['status']
+            if 200 <= status < 300:
+                success += 1
+            elif status in RETRY_STATUSES and attempt < max_retries:
+                retry.append(action)
+            else:
+                errors.append(item)
+        if not retry:
+            break
+        actions = retry
+    return success, errors
+
+
+def bulk_insert(index_name, fp, host=None, slice_bytes=BULK_SLICE_BYTES):
+    """Use Elasticsearch Bulk API to load data into an index.
+
+    The file is streamed in slices of at most `slice_bytes`, so files of any
+    size stay below the cluster's http.max_content_length.
+
+    Parameters
+    ----------
+    index_name : str
+        Default index of the actions.
+    fp : str
+        Path to an NDJSON bulk file.
+    host : str, optional
+        Elasticsearch URL; defaults to ES_HOST.
+    slice_bytes : int
+        Maximum size of one bulk request body.
+
+    Returns
+    -------
+    tuple
+        (number of actions that succeeded, list of failed items)
+    """
+    success, errors = 0, []
+    with open(fp, 'rb') as f:
+        for actions in bulk_slices(f, slice_bytes):
+            indexed, failed = bulk(actions, index_name, host=host)
+            success += indexed
+            errors.extend(failed)
+    return success, errors
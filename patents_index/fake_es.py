@@ -0,0 +1,302 @@
+import json
+import time
+import random
+import fnmatch
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# In-process Elasticsearch stand-in for benchmarks.
+#
+# Speaks just enough of the REST API for the ingestion engine: index
+# create/get/delete (with wildcards), settings, mappings, aliases and atomic _aliases
+# actions, refresh/forcemerge, cluster health, node stats, _bulk, _count, _mget, and
+# _search (with scroll) and _delete_by_query for match_all and terms queries. Bulk requests can be slowed down by a fixed latency and
+# have a fraction of their items rejected with 429, to exercise backpressure
+# and retries. With store=False only document IDs are kept, so the stand-in
+# does not distort memory measurements of large runs.
+
+
+class FakeElasticsearch:
+    """
+    A fake single node listening on 127.0.0.1.
+
+    Args:
+        port (int): Port to listen on; 0 picks a free one
+        latency (float): Seconds every bulk request takes
+        reject_rate (float): Fraction of bulk items answered with 429
+        store (bool): Keep document sources (needed for _search), not just IDs
+        seed (int): Seed of the rejection sampling
+    """
+
+    def __init__(self, port=0, latency=0.0, reject_rate=0.0, store=True, seed=0):
+        self.latency = latency
+        self.reject_rate = reject_rate
+        self.store = store
+        self.random = random.Random(seed)
+        self.indices = {}  # name -> {'docs': {id: source or None}, 'settings': {}, 'mappings': {}}
+        self.aliases = {}  # alias -> set of indices
+        self.lock = threading.Lock()
+        self.scrolls = {}  # scroll ID -> (hits not returned yet, page size)
+        self.stats = {'bulk_requests': 0, 'bulk_items': 0, 'rejected': 0}
+        self.inflight = 0
+        # Reported by _nodes/stats; set them to simulate a cluster under pressure
+        self.heap_used_percent = 40
+        self.search_queue = 0
+        self.merges = 0
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def resolve(self, name):
+        names = []
+        for part in name.split(','):
+            if part == '_all' or '*' in part:
+                names.extend(index for index in self.indices if fnmatch.fnmatchcase(index, part.replace('_all', '*')))
+            elif part in self.aliases:
+                names.extend(self.aliases[part])
+            elif part in self.indices:
+                names.append(part)
+        return names
+
+    def count(self, name):
+        return sum(len(self.indices[index]['docs']) for index in self.resolve(name))
+
+    def _settings(self, index):
+        settings = {'index.number_of_replicas': '1', 'index.refresh_interval': '1s'}
+        for key, value in self.indices[index]['settings'].items():
+            if value is None:
+                settings.pop(key, None)
+            else:
+                settings[key] = value
+        return settings
+
+    @staticmethod
+    def _matches(source, query):
+        if 'terms' in query:
+            (field, values), = query['terms'].items()
+            return source.get(field) in values
+        if 'bool' in query:
+            clauses = query['bool'].get('filter', [])
+            return all(FakeElasticsearch._matches(source, clause)
+                       for clause in (clauses if isinstance(clauses, list) else [clauses]))
+        return True
+
+    def _hits(self, targets, query):
+        return [{'_index': index, '_id': doc_id, '_source': source}
+                for index in targets for doc_id, source in self.indices[index]['docs'].items()
+                if not self.store or self._matches(source, query)]
+
+    def _page(self, hits, size, scroll_id=None):
+        reply = {'hits': {'total': {'value': len(hits), 'relation': 'eq'}, 'hits': hits[:size]},
+                 '_shards': {'total': 1, 'successful': 1, 'skipped': 0, 'failed': 0}}
+        if scroll_id:
+            self.scrolls[scroll_id] = hits[size:], size
+            reply['_scroll_id'] = scroll_id
+        return 200, reply
+
+    def _bulk(self, default_index, body):
+        with self.lock:
+            self.inflight += 1
+        try:
+            return self._bulk_items(default_index, body)
+        finally:
+            with self.lock:
+                self.inflight -= 1
+
+    def _node_stats(self):
+        with self.lock:
+            node = {
+                'name': 'fake',
+                'jvm': {'mem': {'heap_used_percent': self.heap_used_percent}},
+                'thread_pool': {'write': {'queue': self.inflight, 'rejected': self.stats['rejected']},
+                                'search': {'queue': self.search_queue, 'rejected': 0}},
+                'indexing_pressure': {'memory': {'current': {'all_in_bytes': 0}, 'limit_in_bytes': 2 ** 30}},
+                'indices': {'merges': {'current': self.merges}},
+            }
+        return 200, {'nodes': {'fake0': node}}
+
+    def _bulk_items(self, default_index, body):
+        if self.latency:
+            time.sleep(self.latency)
+        lines = iter(line for line in body.split(b'\n') if line.strip())
+        items = []
+        with self.lock:
+            self.stats['bulk_requests'] += 1
+            for line in lines:
+                (op, meta), = json.loads(line).items()
+                source = next(lines) if op != 'delete' else None
+                self.stats['bulk_items'] += 1
+                if self.reject_rate and self.random.random() < self.reject_rate:
+                    self.stats['rejected'] += 1
+                    items.append({op: {'status': 429, 'error': {'type': 'es_rejected_execution_exception'}}})
+                    continue
+                name = meta.get('_index', default_index)
+                index = (self.resolve(name) or [name])[0]
+                docs = self.indices.setdefault(index, {'docs': {}, 'settings': {}, 'mappings': {}})['docs']
+                doc_id = meta.get('_id') or f'auto{len(docs)}'
+                if op == 'delete':
+                    docs.pop(doc_id, None)
+                else:
+                    docs[doc_id] = json.loads(source) if self.store else None
+                items.append({op: {'_index': index, '_id': doc_id, 'status': 201}})
+        errors = any(next(iter(item.values()))['status'] >= 300 for item in items)
+        return 200, {'took': 1, 'errors': errors, 'items': items}
+
+    def route(self, method, path, query, body):
+        parts = [part for part in path.split('/') if part]
+        if not parts:
+            return 200, {'version': {'number': '8.17.0'}, 'tagline': 'You Know, for Search'}
+        if parts[-1] == '_bulk':
+            return self._bulk(parts[0] if len(parts) == 2 else None, body)
+        if parts[:2] == ['_search', 'scroll']:
+            scroll_id = json.loads(body or b'{}').get('scroll_id')
+            with self.lock:
+                if method == 'DELETE' or scroll_id not in self.scrolls:
+                    self.scrolls.pop(scroll_id, None)
+                    return 200, {'succeeded': True}
+                hits, size = self.scrolls[scroll_id]
+                return self._page(hits, size, scroll_id)
+        if parts[:2] == ['_nodes', 'stats']:
+            return self._node_stats()
+        if parts[0] == '_cluster':
+            return 200, {'cluster_name': 'fake', 'status': 'green', 'timed_out': False}
+        if parts[0] == '_aliases':
+            with self.lock:
+                for action in json.loads(body)['actions']:
+                    (kind, args), = action.items()
+                    if kind == 'remove_index':
+                        self.indices.pop(args['index'], None)
+                    elif kind == 'add':
+                        self.aliases.setdefault(args['alias'], set()).update(self.resolve(args['index']))
+                    else:
+                        self.aliases.get(args['alias'], set()).difference_update(self.resolve(args['index']))
+            return 200, {'acknowledged': True}
+        if parts[0] == '_alias':
+            members = self.aliases.get(parts[1])
+            return (200, {index: {'aliases': {parts[1]: {}}} for index in members}) if members else (404, {})
+        name, op = parts[0], parts[1] if len(parts) > 1 else None
+        with self.lock:
+            targets = self.resolve(name)
+            if op is None:
+                if method == 'PUT':
+                    if name in self.indices:
+                        return 400, {'error': {'type': 'resource_already_exists_exception'}, 'status': 400}
+                    request = json.loads(body or b'{}')
+                    self.indices[name] = {'docs': {}, 'settings': {}, 'mappings': request.get('mappings', {})}
+                    return 200, {'acknowledged': True, 'index': name}
+                if not targets:
+                    if '*' in name:
+                        return 200, {}
+                    return 404, {'error': {'type': 'index_not_found_exception'}, 'status': 404}
+                if method == 'DELETE':
+                    for index in targets:
+                        self.indices.pop(index, None)
+                        for members in self.aliases.values():
+                            members.discard(index)
+                    return 200, {'acknowledged': True}
+                return 200, {index: {'aliases': {alias: {} for alias, members in self.aliases.items()
+                                                 if index in members},
+                                     'mappings': self.indices[index]['mappings'],
+                                     'settings': {'index': {'provided_name': index}}} for index in targets}
+            if op in ('_alias', '_aliases'):
+                if method in ('PUT', 'POST'):
+                    self.aliases.setdefault(parts[2], set()).update(targets)
+                elif method == 'DELETE':
+                    self.aliases.get(parts[2], set()).difference_update(targets)
+                elif not any(index in self.aliases.get(parts[2], ()) for index in targets):
+                    return 404, {}
+                return 200, {'acknowledged': True}
+            if not targets:
+                return 404, {'error': {'type': 'index_not_found_exception', 'reason': name}, 'status': 404}
+            if op == '_settings':
+                if method == 'PUT':
+                    request = json.loads(body)
+                    for index in targets:
+                        for key, value in request.get('index', request).items():
+                            key = key if key.startswith('index.') else f'index.{key}'
+                            self.indices[index]['settings'][key] = None if value is None else str(value)
+                    return 200, {'acknowledged': True}
+                if query.get('flat_settings') == ['true']:
+                    return 200, {index: {'settings': self._settings(index)} for index in targets}
+                return 200, {index: {'settings': {'index': {key[len('index.'):]: value for key, value
+                                                            in self._settings(index).items()}}}
+                             for index in targets}
+            if op == '_mapping':
+                if method == 'PUT':
+                    request = json.loads(body)
+                    for index in targets:
+                        mappings = self.indices[index]['mappings']
+                        mappings.setdefault('properties', {}).update(request.pop('properties', {}))
+                        # Like _meta, every other mapping parameter is replaced as a whole
+                        mappings.update(request)
+                    return 200, {'acknowledged': True}
+                return 200, {index: {'mappings': self.indices[index]['mappings']} for index in targets}
+            if op in ('_refresh', '_forcemerge', '_flush'):
+                return 200, {'_shards': {'total': 1, 'successful': 1, 'failed': 0}}
+            if op == '_count':
+                return 200, {'count': sum(len(self.indices[index]['docs']) for index in targets)}
+            if op == '_search':
+                request = json.loads(body or b'{}')
+                size = int(query.get('size', [request.get('size', 10)])[0])
+                scroll_id = f'scroll{len(self.scrolls)}' if query.get('scroll') else None
+                return self._page(self._hits(targets, request.get('query', {})), size, scroll_id)
+            if op == '_mget':
+                request = json.loads(body)
+                docs = []
+                for doc_id in request.get('ids') or [doc['_id'] for doc in request.get('docs', [])]:
+                    index = next((index for index in targets if doc_id in self.indices[index]['docs']), None)
+                    docs.append({'_index': index, '_id': doc_id, 'found': True,
+                                 '_source': self.indices[index]['docs'][doc_id]} if index else
+                                {'_index': name, '_id': doc_id, 'found': False})
+                return 200, {'docs': docs}
+            if op == '_delete_by_query':
+                hits = self._hits(targets, json.loads(body).get('query', {}))
+                for hit in hits:
+                    del self.indices[hit['_index']]['docs'][hit['_id']]
+                return 200, {'deleted': len(hits), 'total': len(hits), 'failures': []}
+        return 400, {'error': f'{method} {path} is not supported by the fake'}
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def handle_request(self):
+                url = urlparse(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                status, reply = fake.route(self.command, url.path, parse_qs(url.query), body)
+                data = json.dumps(reply).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('X-Elastic-Product', 'Elasticsearch')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(data)
+
+            do_GET = do_PUT = do_POST = do_DELETE = do_HEAD = handle_request
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,179 @@
+import re
+import time
+
+from bulk_mode import bulk_load_mode
+
+# Versioned index generations behind a read alias.
+#
+# A rebuilt index never replaces the live one in place. Each build writes a
+# new generation '<alias>_<YYYYmmdd_HHMMSS>' that nothing searches yet (in
+# bulk-load mode, see bulk_mode.py), validates its document count against
+# what the build produced and against the live generation, waits for its
+# shards and warms it up with a few representative searches, and only then
+# moves the alias to it in one atomic _aliases request. Searches therefore
+# always hit a complete index and never compete with the load. The newest
+# generations are kept for rollback; older ones are deleted.
+
+# Generations kept per alias, the live one included
+GENERATIONS_KEPT = 2
+
+# Largest relative drop in documents against the live generation that still goes live
+MAX_SHRINK = 0.1
+
+# Searches run against a new generation before it goes live
+WARM_QUERIES = (
+    {"match_all": {}},
+    {"match": {"patent_title": "method system"}},
+    {"match": {"patent_abstract": "device"}},
+    {"nested": {"path": "claims", "query": {"match": {"claims.claim_text": "wherein"}}}},
+)
+
+
+class GenerationError(RuntimeError):
+    """A new generation failed validation and was not made live."""
+
+
+def generation_name(alias, timestamp=None):
+    """Name of a generation of the alias: '<alias>_<timestamp>', by default of now."""
+    return f"{alias}_{timestamp or time.strftime('%Y%m%d_%H%M%S')}"
+
+
+def list_generations(es, alias):
+    """All generations of the alias, oldest first."""
+    pattern = re.compile(re.escape(alias) + r'_\d{8}_\d{6}$')
+    indices = es.indices.get(index=f'{alias}_*', allow_no_indices=True, ignore_unavailable=True)
+    return sorted(name for name in indices if pattern.match(name))
+
+
+def live_generation(es, alias):
+    """
+    Index the alias currently reads from.
+
+    Returns:
+        str or None: The alias target (the newest one should it have several),
+        the concrete index if one still has the alias's name, or None
+    """
+    if es.indices.exists_alias(name=alias):
+        return sorted(es.indices.get_alias(name=alias))[-1]
+    if es.indices.exists(index=alias):
+        return alias
+    return None
+
+
+def swap_alias(es, alias, index_name):
+    """
+    Atomically point the alias at index_name and nothing else.
+
+    A concrete index that still has the alias's name (written in place by
+    earlier versions) is deleted in the same request, since an alias cannot
+    share its name with an index.
+    """
+    actions = [{"add": {"index": index_name, "alias": alias}}]
+    if es.indices.exists_alias(name=alias):
+        actions = [{"remove": {"index": index, "alias": alias}}
+                   for index in es.indices.get_alias(name=alias) if index != index_name] + actions
+    elif es.indices.exists(index=alias):
+        print(f"⚠️ Replacing the concrete index '{alias}' with an alias")
+        actions.append({"remove_index": {"index": alias}})
+    es.indices.update_aliases(actions=actions)
+    print(f"🔀 Alias '{alias}' now points to '{index_name}'")
+
+
+def collect_garbage(es, alias, keep=GENERATIONS_KEPT):
+    """Delete all but the newest `keep` generations of the alias, never the live one; returns the deleted names."""
+    live = set(es.indices.get_alias(name=alias)) if es.indices.exists_alias(name=alias) else set()
+    generations = list_generations(es, alias)
+    deleted = [name for name in generations[:max(0, len(generations) - keep)] if name not in live]
+    for name in deleted:
+        print(f"🗑️ Deleting old generation '{name}'")
+        es.indices.delete(index=name)
+    return deleted
+
+
+def rollback(es, alias):
+    """Point the alias back at the generation before the live one; returns its name."""
+    live = live_generation(es, alias)
+    older = [name for name in list_generations(es, alias) if live is None or name < live]
+    if not older:
+        raise GenerationError(f"No generation of '{alias}' older than '{live}' to roll back to")
+    swap_alias(es, alias, older[-1])
+    return older[-1]
+
+
+def validate_generation(es, index_name, expected=None, live=None, max_shrink=MAX_SHRINK):
+    """
+    Check a freshly built generation before it goes live.
+
+    Args:
+        es (Elasticsearch): Client
+        index_name (str): New generation
+        expected (int, optional): Documents the build produced; all of them must be searchable
+        live (str, optional): Generation currently behind the alias
+        max_shrink (float): Largest relative drop in documents against the live generation
+
+    Returns:
+        int: Documents in the new generation
+
+    Raises:
+        GenerationError: If the generation is empty, incomplete or shrank too much
+    """
+    es.indices.refresh(index=index_name)
+    count = es.count(index=index_name)['count']
+    if count == 0:
+        raise GenerationError(f"'{index_name}' is empty")
+    if expected is not None and count < expected:
+        raise GenerationError(f"'{index_name}' holds {count} documents, the build produced {expected}")
+    if live and live != index_name:
+        live_count = es.count(index=live)['count']
+        if count < live_count * (1 - max_shrink):
+            raise GenerationError(f"'{index_name}' holds {count} documents, {1 - count / live_count:.1%} fewer "
+                                  f"than the live '{live}' ({live_count}); allowed are {max_shrink:.0%}")
+    print(f"✅ '{index_name}' validated: {count} documents")
+    return count
+
+
+def warm_up(es, index_name, queries=WARM_QUERIES, timeout='10m'):
+    """Wait until all primaries of a generation are active and run the warm-up searches."""
+    es.cluster.health(index=index_name, wait_for_status='yellow', timeout=timeout)
+    start_time = time.time()
+    for query in queries:
+        es.search(index=index_name, query=query, size=10)
+    print(f"🔥 '{index_name}' warmed up with {len(queries)} searches in {time.time() - start_time:.2f} seconds")
+
+
+def build_generation(es, alias, mapping, build, keep=GENERATIONS_KEPT, force_merge=False, max_shrink=MAX_SHRINK):
+    """
+    Build a new generation of an alias and make it live once it is complete.
+
+    Args:
+        es (Elasticsearch): Client
+        alias (str): Read alias, e.g. 'patentsview'
+        mapping (dict): Index body with the mappings of the generation
+        build (callable): build(index_name) loads the new generation and returns
+            the number of documents it produced
+        keep (int): Generations kept after the swap, the live one included
+        force_merge (bool): Force-merge the generation before it is validated
+        max_shrink (float): Largest relative drop in documents against the live generation
+
+    Returns:
+        tuple: (name of the new live generation, its document count)
+
+    Raises:
+        GenerationError: If validation fails; the alias then keeps its current target
+    """
+    index_name = generation_name(alias)
+    live = live_generation(es, alias)
+    print(f"🧱 Building generation '{index_name}' of '{alias}' (live: {live})...")
+    es.indices.create(index=index_name, body=mapping)
+    try:
+        with bulk_load_mode(es, index_name, force_merge=force_merge):
+            expected = build(index_name)
+        count = validate_generation(es, index_name, expected, live, max_shrink)
+        warm_up(es, index_name)
+    except BaseException:
+        print(f"❌ Generation '{index_name}' was not completed and is deleted; '{alias}' keeps serving {live}")
+        es.indices.delete(index=index_name, ignore_unavailable=True)
+        raise
+    swap_alias(es, alias, index_name)
+    collect_garbage(es, alias, keep)
+    return index_name, count
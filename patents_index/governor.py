@@ -0,0 +1,187 @@
+import time
+import threading
+
+# Cluster-pressure governor for long loads.
+#
+# A load left alone sends bulk requests as fast as its sender threads allow,
+# which can fill the write thread pool of a cluster that also serves
+# 'patentsview' searches. While throttling is on, a background thread polls
+# the node stats every few seconds (write and search thread pool queues and
+# rejections, indexing pressure, heap, running merges) and scales the number
+# of bulk requests a load may have in flight: down by half as soon as any
+# node passes a soft limit, up by one per calm poll, and to zero (a pause)
+# while any node is past a hard limit. Senders take a slot before every bulk
+# request (bulk_writer.py), so the limit applies to the requests actually on
+# the wire. If the stats cannot be read, the governor stays out of the way.
+
+# Seconds between two polls of the node stats
+POLL_SECONDS = 5
+
+# (soft, hard) limits per node of each signal
+LIMITS = {
+    'write_queue': (50, 500),             # bulk requests waiting for a write thread
+    'search_queue': (10, 100),            # searches waiting for a search thread
+    'indexing_pressure': (0.5, 0.85),     # indexing memory in use, as a fraction of its limit
+    'heap_used_percent': (75, 90),        # JVM heap in use
+    'merges': (6, 12),                    # merges running at once
+}
+
+_STATS_FILTER = [
+    'nodes.*.name',
+    'nodes.*.jvm.mem.heap_used_percent',
+    'nodes.*.thread_pool.write.queue',
+    'nodes.*.thread_pool.write.rejected',
+    'nodes.*.thread_pool.search.queue',
+    'nodes.*.indexing_pressure.memory.current.all_in_bytes',
+    'nodes.*.indexing_pressure.memory.limit_in_bytes',
+    'nodes.*.indices.merges.current',
+]
+
+
+def node_pressure(stats):
+    """
+    The governor's signals of every node in a nodes stats response.
+
+    Returns:
+        dict: Node name -> {'write_queue', 'write_rejected', 'search_queue',
+        'indexing_pressure', 'heap_used_percent', 'merges'}
+    """
+    signals = {}
+    for node_id, node in stats.get('nodes', {}).items():
+        pools = node.get('thread_pool', {})
+        memory = node.get('indexing_pressure', {}).get('memory', {})
+        limit = memory.get('limit_in_bytes') or 0
+        signals[node.get('name', node_id)] = {
+            'write_queue': pools.get('write', {}).get('queue', 0),
+            'write_rejected': pools.get('write', {}).get('rejected', 0),
+            'search_queue': pools.get('search', {}).get('queue', 0),
+            'indexing_pressure': memory.get('current', {}).get('all_in_bytes', 0) / limit if limit else 0.0,
+            'heap_used_percent': node.get('jvm', {}).get('mem', {}).get('heap_used_percent', 0),
+            'merges': node.get('indices', {}).get('merges', {}).get('current', 0),
+        }
+    return signals
+
+
+class IngestGovernor:
+    """
+    Limits the bulk requests of a load in flight according to cluster pressure.
+
+    Args:
+        es (Elasticsearch): Client used for the node stats
+        max_inflight (int): Most bulk requests in flight, e.g. the sender threads
+        limits (dict, optional): (soft, hard) limits overriding those of LIMITS
+        poll_seconds (float): Seconds between polls
+        metrics (IngestMetrics, optional): Receives the 'bulk_inflight_limit' gauge and
+            the 'throttled_seconds' counter
+    """
+
+    def __init__(self, es, max_inflight, limits=None, poll_seconds=POLL_SECONDS, metrics=None):
+        self.es = es
+        self.max_inflight = max(1, max_inflight)
+        self.limits = dict(LIMITS, **(limits or {}))
+        self.poll_seconds = poll_seconds
+        self.metrics = metrics
+        self.limit = self.max_inflight
+        self.inflight = 0
+        self.reason = None
+        self.rejected = None
+        self.condition = threading.Condition()
+        self.stopped = threading.Event()
+        self.thread = None
+        self._set_gauge()
+
+    def _set_gauge(self):
+        if self.metrics is not None:
+            self.metrics.gauge(bulk_inflight_limit=self.limit)
+
+    def start(self):
+        """Poll the node stats from a daemon thread until stop()."""
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        with self.condition:
+            self.limit = self.max_inflight
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=self.poll_seconds + 1)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        polls = 0
+        while not self.stopped.is_set():
+            try:
+                stats = self.es.nodes.stats(metric=['jvm', 'thread_pool', 'indexing_pressure', 'indices'],
+                                            index_metric='merges', filter_path=_STATS_FILTER)
+            except Exception as e:
+                if not polls:
+                    # Without stats at all (e.g. no monitor privilege) the load runs unthrottled
+                    print(f"⚠️ Node stats unavailable, not throttling: {e}")
+                    return
+                # A busy cluster may answer late; the last limit holds until it answers again
+                print(f"⚠️ Node stats poll failed, keeping {self.limit} bulk requests in flight: {e}")
+            else:
+                polls += 1
+                self.adjust(node_pressure(stats))
+            self.stopped.wait(self.poll_seconds)
+
+    def adjust(self, signals):
+        """Set the in-flight limit from one poll's node signals; returns the new limit."""
+        rejected = sum(node['write_rejected'] for node in signals.values())
+        new_rejections = rejected - self.rejected if self.rejected is not None else 0
+        self.rejected = rejected
+
+        hard, soft = None, None
+        for name, node in signals.items():
+            for signal, (soft_limit, hard_limit) in self.limits.items():
+                value = node.get(signal, 0)
+                if value >= hard_limit and hard is None:
+                    hard = f"{signal} {value:.4g} on {name} (limit {hard_limit})"
+                elif value >= soft_limit and soft is None:
+                    soft = f"{signal} {value:.4g} on {name} (soft limit {soft_limit})"
+        if new_rejections > 0 and soft is None:
+            soft = f"{new_rejections} new write rejections"
+
+        with self.condition:
+            previous = self.limit
+            if hard:
+                self.limit = 0
+            elif soft:
+                self.limit = max(1, previous // 2)
+            else:
+                self.limit = min(self.max_inflight, previous + 1)
+            self.reason = hard or soft
+            self.condition.notify_all()
+            limit = self.limit
+
+        if limit == 0 and previous > 0:
+            print(f"⏸️ Pausing bulk requests: {hard}")
+        elif limit > 0 and previous == 0:
+            print(f"▶️ Resuming bulk requests with {limit} in flight")
+        elif limit < previous:
+            print(f"🐢 {limit} bulk requests in flight: {soft}")
+        self._set_gauge()
+        return limit
+
+    def acquire(self):
+        """Wait for a free slot, while paused or at the in-flight limit."""
+        start = None
+        with self.condition:
+            while self.inflight >= self.limit and not self.stopped.is_set():
+                start = start or time.perf_counter()
+                self.condition.wait(self.poll_seconds)
+            self.inflight += 1
+        if start is not None and self.metrics is not None:
+            self.metrics.count(throttled_seconds=time.perf_counter() - start)
+
+    def release(self):
+        with self.condition:
+            self.inflight -= 1
+            self.condition.notify()
@@ -1,4 +1,5 @@
 import os
+import sys
 import argparse
 import json
 import time
@@ -11,11 +12,21 @@ from es import create_index, refresh, bulk_insert
 
 from index_claim import index_claim 
 from index_class import index_classes
-from index_patent import index_patent
+from index_patent import index_patent, replay_patent
 from index_people import index_people
 from index_summary import index_summary
 from index_us_app_citation import index_us_app_citation
 from index_us_citation import index_us_citations
+from merge_join import build_patentsview_offline
+from patentsview import PATENTSVIEW_INDEX, PATENTSVIEW_MAPPING
+from enrich import existing_children, index_enriched, index_enriched_parallel, reenrich_patents
+from delta import ingest_delta
+from generations import GENERATIONS_KEPT, MAX_SHRINK, build_generation, live_generation, rollback
+from sources import SOURCES
+from staging import stage_source
+from metrics import serve as serve_metrics
+from bulk_writer import BULK_MAX_BYTES, BULK_MIN_BYTES
+from memory_budget import parse_size
 
 def index_patentsview_for_elasticsearch(args):
     print("Starting index_patentsview_for_elasticsearch process...")
@@ -45,236 +56,33 @@ def index_patentsview_for_elasticsearch(args):
     
     print("Verified that 'patent_tmp' index exists")
 
-    # Patentsview index mapping 
-    if not es.indices.exists(index='patentsview'):
-        mapping = {
-            "mappings": {
-                "properties": {
-                    "patent_id": {"type": "keyword"},
-                    "patent_title": {"type": "text"},
-                    "patent_date": {"type": "date"},
-                    "num_claims": {"type": "integer"},
-                    "patent_type": {"type": "keyword"},
-                    "patent_abstract": {"type": "text"},
-                    "summary": {"type": "text"},
-                    "claims_text": {"type": "text"},
-                    
-                    "claims": {
-                        "type": "nested",
-                        "properties": {
-                            "claim_sequence": {"type": "integer"},
-                            "claim_text": {"type": "text"},
-                            "dependent": {"type": "boolean"},
-                            "claim_number": {"type": "integer"},
-                            "exemplary": {"type": "boolean"}
-                        }
-                    },
-                    "people": {
-                        "type": "nested",
-                        "properties": {
-                            "applicant_authority": {"type": "keyword"},
-                            "applicant_organization": {"type": "text"},
-                            "applicant_full_name": {"type": "text"},
-                            "assignee_id": {"type": "keyword"},
-                            "assignee_organization": {"type": "text"},
-                            "assignee_full_name": {"type": "text"},
-                            "inventor_id": {"type": "keyword"},
-                            "gender_code": {"type": "keyword"},
-                            "inventor_full_name": {"type": "text"}
-                        }
-                    },
-                    "cpc_classes": {
-                        "type": "nested",
-                        "properties": {
-                            "cpc_section": {"type": "keyword"},
-                            "cpc_class": {"type": "keyword"},
-                            "cpc_subclass": {"type": "keyword"},
-                            "cpc_group": {"type": "keyword"},
-                            "cpc_type": {"type": "keyword"},
-                            "cpc_group_title": {"type": "text"},
-                            "cpc_class_title": {"type": "text"}
-                        }
-                    },
-                    "us_app_citations": {
-                        "type": "nested",
-                        "properties": {
-                            "citation_sequence": {"type": "integer"},
-                            "citation_document_number": {"type": "keyword"},
-                            "citation_date": {"type": "date"},
-                            "record_name": {"type": "text"},
-                            "wipo_kind": {"type": "keyword"},
-                            "citation_category": {"type": "keyword"}
-                        }
-                    },
-                    "us_citations": {
-                        "type": "nested",
-                        "properties": {
-                            "citation_sequence": {"type": "integer"},
-                            "citation_document_number": {"type": "keyword"},
-                            "citation_date": {"type": "date"},
-                            "record_name": {"type": "text"},
-                            "wipo_kind": {"type": "keyword"},
-                            "citation_category": {"type": "keyword"}
-                        }
-                    }
-                }
-            }
-        }
-        print("Creating 'patentsview' index...")
-        es.indices.create(index='patentsview', body=mapping)
-        print("Created 'patentsview' index successfully")
+    # Pin the generation of patent_tmp being read, whatever the alias does meanwhile
+    patent_index = live_generation(es, 'patent_tmp')
 
     try:
-        hits = elasticsearch.helpers.scan(es, index='patent_tmp', query={"query": {"match_all": {}}})
-        actions = []
-        processed_count = 0
-        
-        for hit in hits:
-            patent = hit['_source']
-            pid = patent['patent_id']
-
-            # Fetch US citations from us_citation_tmp if it exists
-            if es.indices.exists(index='us_citation_tmp'):
-                us_citation_response = es.search(
-                    index='us_citation_tmp',
-                    query={'match': {'patent_id': pid}},
-                    size=100
-                )
-                if us_citation_response['hits']['total']['value'] > 0:
-                    us_citation_hits = us_citation_response['hits']['hits']
-                    us_citation_objects = []
-                    for us_citation_hit in us_citation_hits:
-                        us_citation_source = us_citation_hit['_source']
-                        us_citation_objects.append({
-                            "citation_sequence": us_citation_source.get('citation_sequence', 0),
-                            "citation_document_number": us_citation_source.get('citation_document_number', ''),
-                            "citation_date": us_citation_source.get('citation_date', ''),
-                            "record_name": us_citation_source.get('record_name', ''),
-                            "wipo_kind": us_citation_source.get('wipo_kind', ''),
-                            "citation_category": us_citation_source.get('citation_category', '')
-                        })
-                    patent['us_citations'] = us_citation_objects
-
-            # Fetch US application citations from us_app_citation_tmp if it exists
-            if es.indices.exists(index='us_app_citation_tmp'):
-                citations_response = es.search(
-                    index='us_app_citation_tmp',
-                    query={'match': {'patent_id': pid}},
-                    size=100
-                )
-                if citations_response['hits']['total']['value'] > 0:
-                    citations_hits = citations_response['hits']['hits']
-                    citations_objects = []
-                    for citation_hit in citations_hits:
-                        citation_source = citation_hit['_source']
-                        citations_objects.append({
-                            "citation_sequence": citation_source.get('citation_sequence', 0),
-                            "citation_document_number": citation_source.get('citation_document_number', ''),
-                            "citation_date": citation_source.get('citation_date', ''),
-                            "record_name": citation_source.get('record_name', ''),
-                            "wipo_kind": citation_source.get('wipo_kind', ''),
-                            "citation_category": citation_source.get('citation_category', '')
-                        })
-                    patent['us_app_citations'] = citations_objects
+        child_indices = existing_children(es)
+        batch_size = getattr(args, 'enrich_batch', 1000)
+        workers = getattr(args, 'workers', 1) or 1
+        counts = {}
 
-            # Fetch summary from summary_tmp if it exists
-            if es.indices.exists(index='summary_tmp'):
-                summary_response = es.search(
-                    index='summary_tmp',
-                    query={'match': {'patent_id': pid}},
-                    size=1
-                )
-                if summary_response['hits']['total']['value'] > 0:
-                    patent['summary'] = summary_response['hits']['hits'][0]['_source']['summary']
-            
-            # Fetch claims from claim_tmp if it exists
-            if es.indices.exists(index='claim_tmp'):
-                claims_response = es.search(
-                    index='claim_tmp',
-                    query={'match': {'patent_id': pid}},
-                    size=200
-                )
-                if claims_response['hits']['total']['value'] > 0:
-                    claims_hits = claims_response['hits']['hits']
-                    claims_objects = []
-                    claims_texts = []
-                    for claim_hit in claims_hits:
-                        claim_source = claim_hit['_source']
-                        claims_objects.append({
-                            "claim_sequence": claim_source.get('claim_sequence', 0),
-                            "claim_text": claim_source.get('claim_text', ''),
-                            "dependent": claim_source.get('dependent', False),
-                            "claim_number": claim_source.get('claim_number', 0),
-                            "exemplary": claim_source.get('exemplary', False)
-                        })
-                        claims_texts.append(claim_source.get('claim_text', ''))
-                    patent['claims'] = claims_objects
-                    patent['claims_text'] = " ".join(claims_texts)
-            
-            # Fetch people data from patent_people_tmp if it exists
-            if es.indices.exists(index='patent_people_tmp'):
-                people_response = es.search(
-                    index='patent_people_tmp',
-                    query={'match': {'patent_id': pid}},
-                    size=100
-                )
-                if people_response['hits']['total']['value'] > 0:
-                    people_hits = people_response['hits']['hits']
-                    people_objects = []
-                    for people_hit in people_hits:
-                        people_source = people_hit['_source']
-                        people_objects.append(people_source)
-                    patent['people'] = people_objects
-            
-            # Fetch CPC classifications from cpc_classes_tmp if it exists
-            if es.indices.exists(index='cpc_classes_tmp'):
-                cpc_response = es.search(
-                    index='cpc_classes_tmp',
-                    query={'match': {'patent_id': pid}},
-                    size=50
-                )
-                if cpc_response['hits']['total']['value'] > 0:
-                    cpc_hits = cpc_response['hits']['hits']
-                    cpc_objects = []
-                    for cpc_hit in cpc_hits:
-                        cpc_source = cpc_hit['_source']
-                        cpc_objects.append({
-                            "cpc_section": cpc_source.get('cpc_section', ''),
-                            "cpc_class": cpc_source.get('cpc_class', ''),
-                            "cpc_subclass": cpc_source.get('cpc_subclass', ''),
-                            "cpc_group": cpc_source.get('cpc_group', ''),
-                            "cpc_type": cpc_source.get('cpc_type', ''),
-                            "cpc_group_title": cpc_source.get('cpc_group_title', ''),
-                            "cpc_class_title": cpc_source.get('cpc_class_title', '')
-                        })
-                    patent['cpc_classes'] = cpc_objects
+        def build(target):
+            if workers > 1:
+                # One sliced scroll per process, each enriching and bulk indexing on its own
+                print(f"Building patentsview with {workers} sliced-scroll workers...")
+                counts.update(index_enriched_parallel(["http://localhost:9200"], patent_index, child_indices,
+                                                      workers, batch_size, target=target))
+            else:
+                counts.update(index_enriched(es, patent_index, child_indices, batch_size, target=target))
+            print(f"Successfully processed {counts['processed']} patents from '{patent_index}' into '{target}' "
+                  f"({counts['indexed']} indexed, {counts['errors']} errors)")
+            return counts['processed']
 
-            action = {
-                "_index": "patentsview",
-                "_source": patent
-            }
-            actions.append(action)
-            
-            processed_count += 1
-            if processed_count % 1000 == 0:
-                print(f"Processed {processed_count} patents")
-                if actions:
-                    success, errors = elasticsearch.helpers.bulk(es, actions, refresh=False)
-                    if errors:
-                        print(f"Errors during bulk indexing: {errors}")
-                    actions = []
-        
-        if actions:
-            print(f"Processing final batch of {len(actions)} patents...")
-            success, errors = elasticsearch.helpers.bulk(es, actions, refresh=True)
-            if errors:
-                print(f"Errors during final bulk indexing: {errors}")
-        
-        print(f"Successfully processed {processed_count} patents to 'patentsview' index")
-        es.indices.refresh(index='patentsview')
-        
-        count_result = es.count(index='patentsview')
-        print(f"Final count in 'patentsview' index: {count_result['count']} documents")
+        # The new generation only replaces the live patentsview once it is complete
+        target, count = build_generation(es, PATENTSVIEW_INDEX, PATENTSVIEW_MAPPING, build,
+                                         keep=getattr(args, 'keep_generations', GENERATIONS_KEPT),
+                                         force_merge=getattr(args, 'force_merge', False),
+                                         max_shrink=getattr(args, 'max_shrink', MAX_SHRINK))
+        print(f"Final count in 'patentsview' index: {count} documents (generation '{target}')")
         
     except elasticsearch.NotFoundError as e:
         print(f"ElasticSearch error: {e}")
@@ -284,31 +92,140 @@ def index_patentsview_for_elasticsearch(args):
 if __name__ == "__main__":
     pparser = argparse.ArgumentParser()
     pparser.add_argument('--patent', type=str, help='Path to patent_data.csv')
+    pparser.add_argument('--patent-snapshot', type=str,
+                         help='Rebuild patent_tmp from a patent_index_<timestamp>.ndjson.zst/.gz snapshot instead of --patent')
     pparser.add_argument('--UScitation', type=str, help='Path to us_citation.csv')
     pparser.add_argument('--USappcitation', type=str, help='Path to g_us_application_citation.csv')
     pparser.add_argument('--classes', type=str, help='Path to patent_classes.csv')
     pparser.add_argument('--people', type=str, help='Path to patent_people.csv')
     pparser.add_argument('--summary', type=str, help='Path to patent_brief_sum.csv')
     pparser.add_argument('--claim', type=str, help='Path to patent_claims.csv')
+    pparser.add_argument('--resume', action='store_true',
+                         help='Continue each source from its last checkpoint instead of rebuilding its index')
+    pparser.add_argument('--bulk-threads', type=int, default=4,
+                         help='Concurrent bulk requests per source while its CSV is being parsed')
+    pparser.add_argument('--bulk-queue', type=int, default=4,
+                         help='Bulk requests allowed to queue behind the running ones before parsing pauses')
+    pparser.add_argument('--bulk-min-mb', type=float, default=BULK_MIN_BYTES / 2 ** 20,
+                         help='Smallest bulk request payload in MB; the size is tuned from bulk latency and rejections')
+    pparser.add_argument('--bulk-max-mb', type=float, default=BULK_MAX_BYTES / 2 ** 20,
+                         help='Largest bulk request payload in MB (keep below http.max_content_length)')
+    pparser.add_argument('--throttle', action='store_true',
+                         help='Poll the node stats while loading and send fewer bulk requests at once, or pause, while the cluster is under pressure (e.g. serving searches)')
+    pparser.add_argument('--max-rss', type=parse_size, default=None,
+                         help='Memory budget of each source load, e.g. 4G; CSV chunks are then sized from the bytes per row seen so far to stay within it')
+    pparser.add_argument('--ingest-workers', type=int, default=1,
+                         help='Processes per source CSV, each loading one record-aligned byte range of the file')
+    pparser.add_argument('--force-merge', action='store_true',
+                         help='Force-merge each index to one segment per shard once it is fully loaded')
+    pparser.add_argument('--stage', action='store_true',
+                         help='Convert each given CSV into a typed Parquet stage first (needs pyarrow); staged sources skip CSV parsing on every later load')
+    pparser.add_argument('--stage-dir', type=str, default=None,
+                         help="Directory for the Parquet stages (defaults to 'staged' next to each CSV)")
+    pparser.add_argument('--metrics-log', type=str, default=None,
+                         help='Append JSON lines with throughput, stage timings, bulk latency percentiles and ETA after every chunk')
+    pparser.add_argument('--metrics-port', type=int, default=None,
+                         help='Serve the metrics of the running loads in the Prometheus text format on this local port')
+    pparser.add_argument('--delta', action='store_true',
+                         help="Diff each given source against the manifest of its last load and only index, update or delete the patents that changed, then enrich only those in patentsview")
+    pparser.add_argument('--manifest-dir', type=str, default=None,
+                         help='Directory of the per-patent hash manifests of --delta (defaults to $PATENTS_MANIFEST_DIR or ~/.patents_index/manifests)')
+    pparser.add_argument('--keep-generations', type=int, default=GENERATIONS_KEPT,
+                         help='Timestamped generations of patentsview and patent_tmp kept for rollback, the live one included')
+    pparser.add_argument('--max-shrink', type=float, default=MAX_SHRINK,
+                         help='Largest relative drop in documents against the live patentsview (or patent_tmp) that a new generation may have and still go live')
+    pparser.add_argument('--rollback', action='store_true',
+                         help='Point the patentsview alias back at its previous generation and exit')
+    pparser.add_argument('--enrich-batch', type=int, default=1000,
+                         help='Patents enriched per round of child index queries')
+    pparser.add_argument('--workers', type=int, default=1,
+                         help='Worker processes for the patentsview build, each scanning one slice of patent_tmp')
+    pparser.add_argument('--offline', action='store_true',
+                         help='Build patentsview by sort-merge joining the source CSVs instead of querying the *_tmp indices')
+    pparser.add_argument('--sort-dir', type=str, default=None,
+                         help='Directory for the temporary sorted runs of --offline (defaults to the system temp dir)')
+    pparser.add_argument('--run-rows', type=int, default=500000,
+                         help='Rows held in memory per sorted run in --offline mode')
     args = pparser.parse_args()
     
     try:
         records_indexed = 0
 
+        # Engine options shared by all source indexers
+        options = dict(resume=args.resume, bulk_threads=args.bulk_threads, bulk_queue=args.bulk_queue,
+                       force_merge=args.force_merge, workers=args.ingest_workers, stage_dir=args.stage_dir,
+                       metrics_log=args.metrics_log, keep_generations=args.keep_generations,
+                       max_shrink=args.max_shrink,
+                       bulk_bytes=(int(args.bulk_min_mb * 2 ** 20), int(args.bulk_max_mb * 2 ** 20)),
+                       throttle=args.throttle, max_rss=args.max_rss, manifest_dir=args.manifest_dir)
+        if args.metrics_port:
+            serve_metrics(args.metrics_port)
+
+        # Parse each CSV once into its Parquet stage, which the loads below then read
+        if args.stage:
+            for name, spec in SOURCES.items():
+                if getattr(args, name):
+                    stage_source(spec, getattr(args, name), stage_dir=args.stage_dir)
+
+        if args.rollback:
+            es = elasticsearch.Elasticsearch(hosts=["http://localhost:9200"])
+            print(f"Rolled '{PATENTSVIEW_INDEX}' back to '{rollback(es, PATENTSVIEW_INDEX)}'")
+            sys.exit(0)
+
+        # Offline mode joins the CSVs directly and skips the *_tmp indices
+        if args.offline:
+            build_patentsview_offline(args)
+            sys.exit(0)
+
+        # Delta mode only touches the patents whose rows changed since the last load
+        if args.delta:
+            touched, full = set(), False
+            for name, spec in SOURCES.items():
+                if getattr(args, name):
+                    print(f"Processing {name} delta: {getattr(args, name)}")
+                    changed = ingest_delta(spec, getattr(args, name), **options)
+                    if changed is None:
+                        full = True
+                    else:
+                        touched |= changed
+            es = elasticsearch.Elasticsearch(hosts=["http://localhost:9200"])
+            if full or not es.indices.exists(index=PATENTSVIEW_INDEX):
+                index_patentsview_for_elasticsearch(args)
+            elif touched:
+                print(f"Enriching {len(touched)} changed patents in '{PATENTSVIEW_INDEX}'...")
+                counts = reenrich_patents(es, 'patent_tmp', existing_children(es), touched, args.enrich_batch)
+                es.indices.refresh(index=PATENTSVIEW_INDEX)
+                print(f"Updated {counts['indexed']} and deleted {counts['deleted']} patentsview documents "
+                      f"({counts['errors']} errors)")
+            else:
+                print("No patent changed, patentsview is up to date")
+            sys.exit(0)
+
         # Process patent file first
         if args.patent:
             print(f"Processing patent file: {args.patent}")
             try:
-                records_indexed = index_patent(args.patent)
+                records_indexed = index_patent(args.patent, **options)
             except Exception as e:
                 print(f"ERROR in patent indexing: {e}")
                 # Continue with other processing
+        elif args.patent_snapshot:
+            print(f"Replaying patent snapshot: {args.patent_snapshot}")
+            try:
+                records_indexed = replay_patent(args.patent_snapshot, bulk_threads=args.bulk_threads,
+                                                bulk_queue=args.bulk_queue, force_merge=args.force_merge,
+                                                keep_generations=args.keep_generations, max_shrink=args.max_shrink,
+                                                bulk_bytes=options['bulk_bytes'], throttle=args.throttle,
+                                                manifest_dir=args.manifest_dir)
+            except Exception as e:
+                print(f"ERROR in patent replay: {e}")
+                # Continue with other processing
         
         # Process US citations file
         if args.UScitation:
             print(f"Processing US citations file: {args.UScitation}")
             try:
-                us_citation_records = index_us_citations(args.UScitation)
+                us_citation_records = index_us_citations(args.UScitation, **options)
             except Exception as e:
                 print(f"ERROR in US citations indexing: {e}")
         
@@ -316,7 +233,7 @@ if __name__ == "__main__":
         if args.USappcitation:
             print(f"Processing US application citations file: {args.USappcitation}")
             try:
-                citation_records = index_us_app_citation(args.USappcitation)
+                citation_records = index_us_app_citation(args.USappcitation, **options)
             except Exception as e:
                 print(f"ERROR in US application citations indexing: {e}")
         
@@ -324,7 +241,7 @@ if __name__ == "__main__":
         if args.classes:
             print(f"Processing patent classes file: {args.classes}")
             try:
-                classes_records = index_classes(args.classes)
+                classes_records = index_classes(args.classes, **options)
             except Exception as e:
                 print(f"ERROR in patent classes indexing: {e}")
 
@@ -332,7 +249,7 @@ if __name__ == "__main__":
         if args.people:
             print(f"Processing people file: {args.people}")
             try:
-                people_records = index_people(args.people)
+                people_records = index_people(args.people, **options)
             except Exception as e:
                 print(f"ERROR in people indexing: {e}")
 
@@ -340,7 +257,7 @@ if __name__ == "__main__":
         if args.summary:
             print(f"Processing summary file: {args.summary}")
             try:
-                summary_records = index_summary(args.summary)
+                summary_records = index_summary(args.summary, **options)
             except Exception as e:
                 print(f"ERROR in summary indexing: {e}")
 
@@ -348,7 +265,7 @@ if __name__ == "__main__":
         if args.claim:
             print(f"Processing claims file: {args.claim}")
             try:
-                claim_records = index_claim(args.claim)
+                claim_records = index_claim(args.claim, **options)
             except Exception as e:
                 print(f"ERROR in claims indexing: {e}")
 
@@ -374,5 +291,4 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"CRITICAL ERROR: {e}")
         # Exit with error code
-        import sys
         sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,577 @@
+import io
+import os
+import time
+import multiprocessing
+from contextlib import nullcontext
+
+import pandas as pd
+import elasticsearch
+
+import deadletter
+from doc_ids import content_doc_id
+from deadletter import DeadLetterWriter, dead_letter_path, quarantine_path
+from checkpoint import Checkpoint, iter_csv_chunks, read_header, resume_state, split_ranges
+from transform import COERCIONS, column, join_ids
+from bulk_encoder import encode_lines, source_line
+from bulk_writer import BULK_MAX_BYTES, BULK_MIN_BYTES, BULK_QUEUE, BULK_THREADS, BatchSizer, pipelined_bulk
+from bulk_mode import bulk_load_mode
+from metrics import ACTIVE, IngestMetrics
+from snapshot import SnapshotWriter, iter_snapshot_chunks, snapshot_path
+from governor import IngestGovernor
+from memory_budget import ChunkBudget
+from generations import (GENERATIONS_KEPT, MAX_SHRINK, GenerationError, collect_garbage, generation_name,
+                         live_generation, swap_alias, validate_generation)
+from staging import copy_quarantine, find_stage, iter_staged_chunks, split_rows, staged_rows
+
+# Ingestion engine shared by all CSV sources.
+#
+# A source is a spec from sources.py; the engine reads it with the
+# checkpointed chunk reader, parsing only the columns the spec uses
+# (enumerated fields as categoricals), coerces each field
+# column by column, derives stable document IDs, encodes the chunk straight to NDJSON (bulk_encoder.py)
+# and bulk writes it before committing its byte offset. Bulk requests are
+# pipelined (bulk_writer.py), so the next chunk is parsed while the previous one is being indexed, with the index in bulk-load
+# mode (no refreshes or replicas) until the load ends. With workers > 1 the
+# file is split into record-aligned byte ranges, each loaded by its own
+# process. A source staged as Parquet (staging.py) is read from its stage
+# instead of being parsed again. Sources with a snapshot stream their
+# documents to compressed NDJSON (snapshot.py) as chunks are acknowledged,
+# and replay() rebuilds an index from it. The per-source index_*.py modules
+# are thin wrappers around ingest().
+
+ES_HOST = "http://localhost:9200"
+CHUNK_ROWS = 50000
+
+
+def read_options(spec, ipath):
+    """
+    pd.read_csv arguments that parse only the columns of a source file its spec uses.
+
+    The spec's categorical columns are parsed as categoricals, all others
+    (integers included, see transform.py) as str.
+
+    Args:
+        spec (dict): Source spec from sources.SOURCES
+        ipath (str): Source CSV, whose header names the columns
+
+    Returns:
+        dict: The spec's 'read' arguments with usecols and a dtype per column
+    """
+    header = read_header(ipath)[0]
+    if not header.strip():
+        return dict(spec['read'], dtype=str)
+    names = pd.read_csv(io.BytesIO(header), nrows=0, **spec['read']).columns
+    used = {name for name, _ in spec['fields'].values()} | set(spec.get('dedupe', ())) | set(spec.get('required', ()))
+    categorical = set(spec.get('categorical', ()))
+    # Headers may pad their names; chunks strip them once read
+    usecols = [name for name in names if name.strip() in used]
+    dtype = {name: 'category' if name.strip() in categorical else str for name in usecols}
+    return dict(spec['read'], usecols=usecols, dtype=dtype)
+
+
+def source_columns(spec, chunk):
+    """
+    Coerce one CSV chunk into document field columns as described by a source spec.
+
+    Args:
+        spec (dict): Source spec from sources.SOURCES
+        chunk (DataFrame): Chunk read with read_options()
+
+    Returns:
+        dict: Field name -> converted column, after deduplication and dropping empty rows
+    """
+    if spec.get('dedupe'):
+        chunk = chunk.drop_duplicates(subset=[name for name in spec['dedupe'] if name in chunk.columns])
+
+    columns = {field: COERCIONS[coercion](column(chunk, name))
+               for field, (name, coercion) in spec['fields'].items()}
+
+    for field in spec.get('drop_empty', ()):
+        keep = (columns[field] != '').to_numpy()
+        columns = {name: values[keep] for name, values in columns.items()}
+    return columns
+
+
+def document_ids(spec, columns):
+    """
+    Deterministic '_id's of document field columns, as described by a source spec.
+
+    Args:
+        spec (dict): Source spec from sources.SOURCES
+        columns (dict): Field name -> Series, from source_columns() or a stage
+
+    Returns:
+        list: One str ID per document
+    """
+    if spec['id'] == 'content':
+        # No natural key, so the ID is derived from the row content
+        names = list(columns)
+        rows = zip(*(values.tolist() for values in columns.values()))
+        return [content_doc_id(source["patent_id"], source) for source in (dict(zip(names, row)) for row in rows)]
+    return join_ids(*(columns[field] for field in spec['id'])).tolist()
+
+
+def document_actions(spec, columns, index_name):
+    """
+    Encode document field columns into bulk index lines with deterministic '_id's.
+
+    Args:
+        spec (dict): Source spec from sources.SOURCES
+        columns (dict): Field name -> Series, from source_columns() or a stage
+        index_name (str): Physical index the actions target
+
+    Returns:
+        list: Encoded NDJSON action and source lines, one bytes per document
+    """
+    return encode_lines(index_name, columns, ids=document_ids(spec, columns))
+
+
+def source_actions(spec, chunk, index_name):
+    """Turn one CSV chunk into encoded bulk index lines as described by a source spec."""
+    return document_actions(spec, source_columns(spec, chunk), index_name)
+
+
+def iter_source_columns(spec, ipath, chunk_rows=CHUNK_ROWS, stage_dir=None, max_rss=None):
+    """
+    Stream a source as chunks of document field columns, from its Parquet stage if it has one.
+
+    With max_rss, CSV chunks are sized to that memory budget, chunk_rows being their upper bound.
+    """
+    stage = find_stage(spec, ipath, stage_dir)
+    if stage:
+        for columns, _ in iter_staged_chunks(stage, chunk_rows=chunk_rows):
+            yield columns
+        return
+    budget = ChunkBudget(max_rss, chunk_rows, chunks_alive=2) if max_rss else None
+    for chunk, _ in iter_csv_chunks(ipath, chunk_rows=chunk_rows, budget=budget, **read_options(spec, ipath)):
+        chunk.columns = chunk.columns.str.strip()
+        yield source_columns(spec, chunk)
+
+
+def snapshot_columns(spec, docs):
+    """Columns of the spec's fields from snapshot documents, typed as after coercion."""
+    columns = {}
+    for field in spec['fields']:
+        values = [doc.get(field) for doc in docs]
+        series = pd.Series(values)
+        # Integers with nulls must stay integers (and None), not become floats
+        columns[field] = series if series.dtype.kind != 'f' else pd.Series(values, dtype=object)
+    return columns
+
+
+def _point_alias(es, alias, index_name, keep=GENERATIONS_KEPT, max_shrink=MAX_SHRINK):
+    """
+    Validate the freshly built timestamped index, atomically move the alias to it and drop the oldest generations.
+
+    A generation that fails validation is deleted, as build_generation() does, so it
+    is never kept as a fallback for --rollback.
+
+    Returns:
+        bool: Whether the alias now points at the index; False if it was rejected
+    """
+    try:
+        validate_generation(es, index_name, live=live_generation(es, alias), max_shrink=max_shrink)
+    except GenerationError as e:
+        print(f"❌ {e}; '{alias}' was left unchanged and '{index_name}' is deleted")
+        es.indices.delete(index=index_name, ignore_unavailable=True)
+        return False
+    swap_alias(es, alias, index_name)
+    collect_garbage(es, alias, keep)
+    return True
+
+
+def _forget_manifest(spec, manifest_dir=None):
+    """A full load leaves the delta manifest of the source's previous load stale (see delta.py)."""
+    from delta import forget_manifest
+    forget_manifest(spec, manifest_dir)
+
+
+def _timed(iterable, metrics, stage):
+    """Iterate while recording the time every item took to produce as one observation of a stage."""
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        metrics.observe(stage, time.perf_counter() - start)
+        yield item
+
+
+def _write_chunks(es, spec, ipath, target, checkpoint, state, chunk_rows, bulk_threads, bulk_queue,
+                  end_offset=None, snapshot=None, label='', stage=None, metrics=None,
+                  bulk_bytes=(BULK_MIN_BYTES, BULK_MAX_BYTES), throttle=False, max_rss=None):
+    """
+    Parse, transform and bulk index a source from its checkpointed offset up to end_offset.
+
+    With a stage the source is read from its Parquet parts instead of the
+    CSV, and offsets are document positions in the stage instead of bytes.
+
+    Args:
+        snapshot (SnapshotWriter, optional): Receives the documents of every acknowledged chunk
+        metrics (IngestMetrics): Receives stage timings and progress
+        bulk_bytes (tuple): (smallest, largest) bulk request payload, tuned in between
+        throttle (bool): Scale the bulk requests in flight with the cluster's pressure (governor.py)
+        max_rss (int, optional): Resident bytes the process may use; CSV chunks are then sized
+            to it (memory_budget.py) instead of having chunk_rows records
+
+    Returns:
+        tuple: (total records, total errors, whether the range was read to its end)
+    """
+    total_records = state['total_records'] if state else 0
+    total_errors = state.get('total_errors', 0) if state else 0
+    missing = []
+
+    # Refused documents and unparsable CSV records are kept next to the source, never just dropped
+    dead_letters = DeadLetterWriter(dead_letter_path(ipath, spec['index']), index=spec['index'])
+    # Quarantined records are committed with the chunk they were read in, so a resume does not repeat them
+    quarantine = DeadLetterWriter(quarantine_path(ipath, spec['index']), deferred=True)
+    if state and not stage:
+        quarantine.resume(ipath, state['offset'])
+    chunk_start = state['offset'] if state else (0 if stage else read_header(ipath)[1])
+
+    # Every chunk waiting for its bulk requests, plus the one being parsed, is alive at once;
+    # each sender may also hold a request body of the largest bulk size
+    budget = None
+    if max_rss:
+        budget = ChunkBudget(max_rss, chunk_rows, chunks_alive=bulk_threads + bulk_queue + 2,
+                             reserved=bulk_threads * bulk_bytes[1], metrics=metrics)
+
+    def chunk_actions():
+        if stage:
+            chunks = _timed(iter_staged_chunks(stage, chunk_rows=chunk_rows, end_row=end_offset,
+                                               start_row=state['offset'] if state else None), metrics, 'read')
+            for chunk_idx, (columns, offset) in enumerate(chunks, state['chunk_idx'] + 1 if state else 1):
+                with metrics.stage('encode'):
+                    actions = document_actions(spec, columns, target)
+                yield actions, (chunk_idx, offset, actions)
+            return
+        chunks = iter_csv_chunks(ipath, chunk_rows=chunk_rows, start_offset=state['offset'] if state else None,
+                                 end_offset=end_offset, metrics=metrics, quarantine=quarantine, budget=budget,
+                                 **read_options(spec, ipath))
+        for chunk_idx, (chunk, offset) in enumerate(chunks, state['chunk_idx'] + 1 if state else 1):
+            chunk.columns = chunk.columns.str.strip()
+            missing.extend(name for name in spec.get('required', ()) if name not in chunk.columns)
+            if missing:
+                print(f"❌ Missing required columns: {missing}")
+                return
+            with metrics.stage('transform'):
+                columns = source_columns(spec, chunk)
+            with metrics.stage('encode'):
+                actions = document_actions(spec, columns, target)
+            # Only the encoded lines stay alive until the chunk is acknowledged
+            del chunk, columns
+            yield actions, (chunk_idx, offset, actions)
+
+    sizer = BatchSizer(min_bytes=bulk_bytes[0], max_bytes=bulk_bytes[1], metrics=metrics)
+    throttling = IngestGovernor(es, bulk_threads, metrics=metrics) if throttle else nullcontext()
+    with throttling as governor:
+        acknowledged = pipelined_bulk(es, chunk_actions(), thread_count=bulk_threads, queue_size=bulk_queue,
+                                      metrics=metrics, sizer=sizer, governor=governor)
+        for (chunk_idx, offset, actions), success, errors in acknowledged:
+            total_records += success
+            total_errors += len(errors)
+            if errors:
+                print(f"⚠️ {label}{len(errors)} documents failed in chunk {chunk_idx}, first: {errors[:1]}")
+                dead_letters.documents(errors, actions, stage or ipath, chunk_start, offset)
+            chunk_start = offset
+            metrics.chunk_done(success, len(errors), offset)
+            report = metrics.report()
+            eta = f", ETA {report['eta_seconds']:.0f}s" if report['eta_seconds'] is not None else ''
+            print(f"🔄 {label}Chunk {chunk_idx}: {len(actions)} documents, {total_records} indexed so far "
+                  f"({report['docs_per_sec']:.0f} docs/s{eta})")
+            metrics.log(chunk=chunk_idx)
+
+            # The snapshot grows in step with the checkpoint, so a resume can cut it back to match
+            progress = {}
+            if snapshot is not None:
+                progress = dict(snapshot=snapshot.path,
+                                snapshot_offset=snapshot.append_lines(source_line(line) for line in actions))
+
+            # Commit progress only once every bulk request of the chunk was acknowledged
+            quarantine.commit(offset)
+            checkpoint.save(index=target, offset=offset, chunk_idx=chunk_idx, staged=bool(stage),
+                            total_records=total_records, total_errors=total_errors, **progress)
+
+    return total_records, total_errors, not missing
+
+
+def _range_key(spec, start, end, stage):
+    # Row ranges of a stage must never pick up byte range checkpoints, and vice versa
+    return f"{spec['index']}.{'r' if stage else ''}{start}-{end}"
+
+
+def _range_worker(task):
+    """Load one byte (or staged row) range in its own process, with its own client and checkpoint."""
+    (spec, ipath, es_host, target, start, end, resume, chunk_rows, bulk_threads, bulk_queue, stage, metrics_log,
+     bulk_bytes, throttle, max_rss) = task
+    label = f"[{start}-{end}] "
+    checkpoint, state = resume_state(_range_key(spec, start, end, stage), ipath, resume)
+    if state and state.get('complete'):
+        return start, end, state['total_records'], state.get('total_errors', 0), True, None
+    if state is None:
+        state = {'offset': start, 'chunk_idx': 0, 'total_records': 0, 'total_errors': 0}
+    metrics = IngestMetrics(target, total_bytes=end, start_offset=state['offset'], log_path=metrics_log,
+                            label=label.strip())
+    es = elasticsearch.Elasticsearch(hosts=[es_host])
+    records, errors, complete = _write_chunks(es, spec, ipath, target, checkpoint, state, chunk_rows,
+                                              bulk_threads, bulk_queue, end_offset=end, label=label, stage=stage,
+                                              metrics=metrics, bulk_bytes=bulk_bytes, throttle=throttle,
+                                              max_rss=max_rss)
+    if complete:
+        checkpoint.save(index=target, offset=end, complete=True, staged=bool(stage),
+                        total_records=records, total_errors=errors)
+    return start, end, records, errors, complete, metrics.report()
+
+
+def _write_ranges(spec, ipath, es_host, target, checkpoint, state, workers, resume, chunk_rows,
+                  bulk_threads, bulk_queue, stage=None, metrics=None, bulk_bytes=(BULK_MIN_BYTES, BULK_MAX_BYTES),
+                  throttle=False, max_rss=None):
+    """
+    Load the source with one process per record-aligned byte range (or row range of its stage).
+
+    The main checkpoint keeps the offset the split starts from, so a resumed
+    run splits the same way and every range continues from its own checkpoint.
+
+    A memory budget is shared evenly by the worker processes.
+
+    Returns:
+        tuple: (total records, total errors, whether every range was read to its end)
+    """
+    start = state['offset'] if state else None
+    base_records = state['total_records'] if state else 0
+    base_errors = state.get('total_errors', 0) if state else 0
+    if stage:
+        ranges = split_rows(stage, workers, start_row=start)
+        end = staged_rows(stage)
+    else:
+        ranges = split_ranges(ipath, workers, start_offset=start)
+        end = os.path.getsize(ipath)
+    checkpoint.save(index=target, offset=ranges[0][0] if ranges else end, chunk_idx=0, staged=bool(stage),
+                    total_records=base_records, total_errors=base_errors, workers=workers)
+    print(f"🧵 Splitting '{ipath}' into {len(ranges)} {'row' if stage else 'byte'} ranges "
+          f"for {workers} worker processes")
+
+    tasks = [(spec, ipath, es_host, target, a, b, resume, chunk_rows, bulk_threads, bulk_queue, stage,
+              metrics.log_path, bulk_bytes, throttle, max_rss and max_rss // workers) for a, b in ranges]
+    results = []
+    with multiprocessing.Pool(processes=min(workers, len(tasks)) or 1) as pool:
+        for result in pool.imap_unordered(_range_worker, tasks):
+            results.append(result)
+            a, b, records, errors, complete, report = result
+            if report:
+                metrics.merge(report)
+            print(f"✅ Range {a}-{b}: {records} records, {errors} errors"
+                  f"{'' if complete else ' (incomplete)'} [{len(results)}/{len(tasks)}]")
+
+    # Aggregated summary of all ranges
+    total_records = base_records + sum(result[2] for result in results)
+    total_errors = base_errors + sum(result[3] for result in results)
+    complete = all(result[4] for result in results)
+    print(f"📊 {len(results)} ranges: {total_records} records, {total_errors} errors")
+    if complete:
+        for a, b in ranges:
+            Checkpoint(_range_key(spec, a, b, stage), ipath).clear()
+    return total_records, total_errors, complete
+
+
+def ingest(spec, ipath, es_host=ES_HOST, resume=False, chunk_rows=CHUNK_ROWS,
+           bulk_threads=BULK_THREADS, bulk_queue=BULK_QUEUE, force_merge=False, workers=1, stage_dir=None,
+           metrics_log=None, keep_generations=GENERATIONS_KEPT, max_shrink=MAX_SHRINK,
+           bulk_bytes=(BULK_MIN_BYTES, BULK_MAX_BYTES), throttle=False, max_rss=None, manifest_dir=None):
+    """
+    Index one CSV source into Elasticsearch as described by its spec.
+
+    Args:
+        spec (dict): Source spec from sources.SOURCES
+        ipath (str): Path to the input CSV file
+        es_host (str): Elasticsearch host URL
+        resume (bool): Continue from the last checkpoint instead of rebuilding the index
+        chunk_rows (int): Records per chunk
+        bulk_threads (int): Concurrent bulk requests (per worker process)
+        bulk_queue (int): Bulk requests allowed to wait for a sender before parsing blocks
+        force_merge (bool): Force-merge the index to one segment per shard after the load
+        workers (int): Processes loading record-aligned byte ranges of the file in parallel
+        stage_dir (str, optional): Root of the Parquet stages (staging.py); a complete stage
+            of the file is read instead of the CSV
+        metrics_log (str, optional): JSON lines file receiving the metrics after every chunk
+        keep_generations (int): Timestamped indices of an aliased source kept, the live one included
+        max_shrink (float): Largest relative drop in documents against the aliased index that still
+            moves the alias
+        bulk_bytes (tuple): (smallest, largest) bulk request payload in bytes; the size is tuned
+            in between from the latency and rejections of the requests
+        throttle (bool): Watch the cluster's node stats and send fewer bulk requests at once,
+            or none, while it is under pressure (governor.py)
+        max_rss (int, optional): Resident memory budget in bytes (of all worker processes together);
+            CSV chunks are sized from the bytes per row seen so far to stay within it, with
+            chunk_rows as their upper bound
+        manifest_dir (str, optional): Directory of the delta manifests; the source's one is
+            deleted once the load is live (see delta.py)
+
+    Returns:
+        int: Total number of successfully indexed records
+    """
+    index_name = spec['index']
+    print(f"🚀 Indexing '{ipath}' into '{index_name}'...")
+    es = elasticsearch.Elasticsearch(hosts=[es_host])
+
+    # A resumed load continues in the index it was writing to, after the last committed chunk
+    checkpoint, state = resume_state(index_name, ipath, resume)
+    if state and state.get('complete'):
+        return state['total_records']
+
+    # Offsets are rows when reading a stage, so a checkpoint only resumes the same kind of read
+    stage = find_stage(spec, ipath, stage_dir)
+    if stage:
+        print(f"📦 Reading the Parquet stage {stage}")
+    if state and bool(state.get('staged')) != bool(stage):
+        print(f"⚠️ The checkpoint of '{index_name}' was {'' if state.get('staged') else 'not '}"
+              f"written from a stage, starting over")
+        checkpoint.clear()
+        state = None
+
+    timestamp = None
+    target = index_name
+    if spec.get('alias'):
+        timestamp = state['index'][len(index_name) + 1:] if state else time.strftime("%Y%m%d_%H%M%S")
+        target = generation_name(index_name, timestamp)
+
+    # A fresh load starts from an empty index with the spec's mapping
+    if state is None:
+        print(f"🧹 Recreating index '{target}'...")
+        es.indices.delete(index=target, ignore=[400, 404])
+        es.indices.create(index=target, body=spec['mapping'])
+        deadletter.clear(ipath, index_name)
+        if stage:
+            # The stage kept the records its CSV parse quarantined; they belong to this load now
+            copy_quarantine(stage, quarantine_path(ipath, index_name))
+
+    # The intermediate snapshot needs every document in one process
+    if workers > 1 and spec.get('snapshot'):
+        print(f"⚠️ '{index_name}' writes a snapshot, loading it with a single process")
+        workers = 1
+
+    # The intermediate snapshot is streamed to disk chunk by chunk, continuing a resumed one
+    snapshot = None
+    if spec.get('snapshot'):
+        if state and state.get('snapshot'):
+            snapshot = SnapshotWriter(state['snapshot'], offset=state.get('snapshot_offset', 0))
+        else:
+            snapshot = SnapshotWriter(snapshot_path(os.path.dirname(os.path.abspath(ipath)), spec['snapshot'], timestamp))
+    start_time = time.time()
+
+    # Throughput, stage timings and ETA of this load, also served by metrics.serve()
+    metrics = IngestMetrics(target, total_bytes=staged_rows(stage) if stage else os.path.getsize(ipath),
+                            start_offset=state['offset'] if state else (0 if stage else read_header(ipath)[1]),
+                            log_path=metrics_log)
+    ACTIVE.append(metrics)
+
+    try:
+        with bulk_load_mode(es, target, force_merge=force_merge):
+            if workers > 1:
+                total_records, total_errors, complete = _write_ranges(
+                    spec, ipath, es_host, target, checkpoint, state, workers, resume,
+                    chunk_rows, bulk_threads, bulk_queue, stage=stage, metrics=metrics, bulk_bytes=bulk_bytes,
+                    throttle=throttle, max_rss=max_rss)
+            else:
+                total_records, total_errors, complete = _write_chunks(
+                    es, spec, ipath, target, checkpoint, state, chunk_rows, bulk_threads, bulk_queue,
+                    snapshot=snapshot, stage=stage, metrics=metrics, bulk_bytes=bulk_bytes, throttle=throttle,
+                    max_rss=max_rss)
+    finally:
+        ACTIVE.remove(metrics)
+        if snapshot is not None:
+            snapshot.close()
+        metrics.log('end')
+        print(f"⏱️ '{target}': {metrics.summary()}")
+        deadletter.report(ipath, index_name)
+
+    if not complete:
+        return total_records
+
+    if snapshot is not None:
+        print(f"💾 Intermediate NDJSON output saved to: {snapshot.path}")
+
+    # Only a generation that went live completes the load; until then --resume retries the swap
+    if spec.get('alias') and not _point_alias(es, index_name, target, keep_generations, max_shrink):
+        # The rejected generation is gone, so there is nothing left to resume
+        checkpoint.clear()
+        return total_records
+    checkpoint.finish(index=target, staged=bool(stage), total_records=total_records, total_errors=total_errors)
+    _forget_manifest(spec, manifest_dir)
+
+    count = es.count(index=target)['count']
+    print(f"📈 '{target}': {total_records} records indexed, {total_errors} errors, "
+          f"{count} documents, {time.time() - start_time:.2f} seconds")
+    return total_records
+
+
+def replay(spec, spath, es_host=ES_HOST, chunk_rows=CHUNK_ROWS, bulk_threads=BULK_THREADS,
+           bulk_queue=BULK_QUEUE, force_merge=False, keep_generations=GENERATIONS_KEPT, max_shrink=MAX_SHRINK,
+           bulk_bytes=(BULK_MIN_BYTES, BULK_MAX_BYTES), throttle=False, manifest_dir=None):
+    """
+    Rebuild a source's index from an intermediate NDJSON snapshot instead of its CSV.
+
+    The snapshot is streamed chunk by chunk into the pipelined bulk writer,
+    with the same document IDs, index, alias handling and bulk-load mode as
+    a load from the CSV.
+
+    Args:
+        spec (dict): Source spec from sources.SOURCES the snapshot was written for
+        spath (str): Snapshot file ('.ndjson.zst' or '.ndjson.gz')
+        es_host (str): Elasticsearch host URL
+        chunk_rows (int): Documents per chunk
+        bulk_threads (int): Concurrent bulk requests
+        bulk_queue (int): Bulk requests allowed to wait for a sender before reading blocks
+        force_merge (bool): Force-merge the index to one segment per shard after the load
+        keep_generations (int): Timestamped indices of an aliased source kept, the live one included
+        max_shrink (float): Largest relative drop in documents against the aliased index that still
+            moves the alias
+        bulk_bytes (tuple): (smallest, largest) bulk request payload in bytes; the size is tuned
+            in between from the latency and rejections of the requests
+        throttle (bool): Watch the cluster's node stats and send fewer bulk requests at once,
+            or none, while it is under pressure (governor.py)
+        manifest_dir (str, optional): Directory of the delta manifests; the source's one is
+            deleted once the replay is live
+
+    Returns:
+        int: Total number of successfully indexed records
+    """
+    index_name = spec['index']
+    print(f"🚀 Replaying '{spath}' into '{index_name}'...")
+    es = elasticsearch.Elasticsearch(hosts=[es_host])
+    target = generation_name(index_name) if spec.get('alias') else index_name
+
+    print(f"🧹 Recreating index '{target}'...")
+    es.indices.delete(index=target, ignore=[400, 404])
+    es.indices.create(index=target, body=spec['mapping'])
+
+    total_records, total_errors = 0, 0
+    start_time = time.time()
+    dead_letters = DeadLetterWriter(dead_letter_path(spath, index_name), index=index_name)
+    chunks = ((actions, (chunk_idx, actions)) for chunk_idx, actions in
+              enumerate((document_actions(spec, snapshot_columns(spec, docs), target)
+                         for docs in iter_snapshot_chunks(spath, chunk_rows)), 1))
+    sizer = BatchSizer(min_bytes=bulk_bytes[0], max_bytes=bulk_bytes[1])
+    throttling = IngestGovernor(es, bulk_threads) if throttle else nullcontext()
+    with bulk_load_mode(es, target, force_merge=force_merge), throttling as governor:
+        acknowledged = pipelined_bulk(es, chunks, thread_count=bulk_threads, queue_size=bulk_queue, sizer=sizer,
+                                      governor=governor)
+        for (chunk_idx, actions), success, errors in acknowledged:
+            total_records += success
+            total_errors += len(errors)
+            if errors:
+                print(f"⚠️ {len(errors)} documents failed in chunk {chunk_idx}, first: {errors[:1]}")
+                dead_letters.documents(errors, actions, spath)
+            print(f"🔄 Chunk {chunk_idx}: {total_records} indexed so far")
+
+    if spec.get('alias') and not _point_alias(es, index_name, target, keep_generations, max_shrink):
+        return total_records
+    _forget_manifest(spec, manifest_dir)
+
+    count = es.count(index=target)['count']
+    print(f"📈 '{target}': {total_records} records replayed, {total_errors} errors, "
+          f"{count} documents, {time.time() - start_time:.2f} seconds")
+    deadletter.report(spath, index_name)
+    return total_records
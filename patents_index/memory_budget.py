@@ -0,0 +1,109 @@
+import os
+import re
+import ctypes
+import ctypes.util
+
+# Memory-budgeted chunk sizing.
+#
+# A fixed number of rows per chunk is either far too much or far too little:
+# 50000 claim or summary rows are hundreds of MB of text, and several times
+# that once parsed into Python strings and encoded for bulk, while 50000 CPC
+# rows are a few MB. With a budget (--max-rss 4G), the CSV reader asks a
+# ChunkBudget how many rows the next chunk may have. The budget measures the
+# raw bytes per row of the chunks read so far and sizes chunks so that all
+# of them that can be alive at once (the one being parsed and the ones
+# waiting for their bulk requests) fit into what the process may still use.
+# It also watches the resident set size: past 90% of the budget, chunks are
+# halved and freed heap is handed back to the OS.
+
+# Resident bytes per raw CSV byte of a chunk: parsed object columns, coerced
+# columns and the encoded bulk lines, which are alive at the same time
+AMPLIFICATION = 4
+
+# Fewest rows per chunk, so a chunk never degenerates into a few records
+MIN_CHUNK_ROWS = 500
+
+_UNITS = {'': 1, 'K': 2 ** 10, 'M': 2 ** 20, 'G': 2 ** 30, 'T': 2 ** 40}
+
+_libc = None
+
+
+def parse_size(text):
+    """Bytes of a size like '4G', '512M', '1.5g' or '1048576'."""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*', str(text), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid size: '{text}'")
+    return int(float(match.group(1)) * _UNITS[match.group(2).upper()])
+
+
+def rss_bytes():
+    """Current resident set size of this process, or None where /proc is not available."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def release_memory():
+    """Hand freed heap pages back to the OS (glibc only); returns whether it could."""
+    global _libc
+    if _libc is None:
+        path = ctypes.util.find_library('c')
+        _libc = ctypes.CDLL(path) if path else False
+    if not _libc or not hasattr(_libc, 'malloc_trim'):
+        return False
+    return bool(_libc.malloc_trim(0))
+
+
+class ChunkBudget:
+    """
+    Rows per chunk that keep a load within a resident memory budget.
+
+    Args:
+        max_rss (int): Resident bytes the process may use
+        max_rows (int): Most rows per chunk, whatever the budget allows
+        chunks_alive (int): Chunks alive at once, e.g. the bulk requests in flight
+            and queued plus the chunk being parsed
+        reserved (int): Bytes kept out of the chunks' share, e.g. for bulk request bodies
+        min_rows (int): Fewest rows per chunk
+        metrics (IngestMetrics, optional): Receives the 'chunk_rows' gauge
+    """
+
+    def __init__(self, max_rss, max_rows, chunks_alive=1, reserved=0, min_rows=MIN_CHUNK_ROWS, metrics=None):
+        self.max_rss = max_rss
+        self.reserved = reserved
+        self.max_rows = max_rows
+        self.min_rows = min(min_rows, max_rows)
+        self.chunks_alive = max(1, chunks_alive)
+        self.metrics = metrics
+        self.baseline = rss_bytes() or 0
+        self.bytes_per_row = None
+        self.current = self.min_rows
+        self.pressure = False
+
+    def rows(self):
+        """Rows the next chunk may have."""
+        return self.current
+
+    def observe(self, rows, raw_bytes):
+        """Update the estimate with a chunk just read and size the next one; returns its rows."""
+        if rows:
+            per_row = raw_bytes / rows
+            # Wider chunks count at once, narrower ones only halfway, so one chunk of long rows is not forgotten
+            if self.bytes_per_row is None:
+                self.bytes_per_row = per_row
+            else:
+                self.bytes_per_row = max(per_row, 0.5 * (self.bytes_per_row + per_row))
+        available = max(self.max_rss - self.baseline - self.reserved, 0) / self.chunks_alive
+        target = int(available / (AMPLIFICATION * (self.bytes_per_row or 1)))
+
+        rss = rss_bytes()
+        self.pressure = rss is not None and rss > 0.9 * self.max_rss
+        if self.pressure:
+            release_memory()
+            target = min(target, self.current // 2)
+        self.current = max(self.min_rows, min(self.max_rows, target))
+        if self.metrics is not None:
+            self.metrics.gauge(chunk_rows=self.current)
+        return self.current
@@ -0,0 +1,256 @@
+import os
+import json
+import time
+import heapq
+import shutil
+import tempfile
+from itertools import groupby
+from operator import itemgetter
+
+import elasticsearch
+
+from bulk_writer import write_actions
+from doc_ids import patent_doc_id
+from generations import GENERATIONS_KEPT, MAX_SHRINK, build_generation
+from ingest import document_ids, iter_source_columns
+from patent_keys import UNKEYED, patent_keys
+from sources import SOURCES
+from patentsview import PATENTSVIEW_INDEX, PATENTSVIEW_MAPPING, attach_children
+
+# Offline 'patentsview' builder.
+#
+# Instead of scanning 'patent_tmp' and searching every child index once per
+# patent, each source CSV is streamed once, cut into sorted on-disk runs keyed
+# by the patent's integer key (patent_keys.py), k-way merged back into key
+# order and merge-joined with the (equally sorted) patent stream. Integer keys
+# compare and serialize far cheaper than the patent_id strings they encode. Every patentsview document is therefore
+# assembled in a single sequential pass and the build is bounded by disk and
+# bulk throughput instead of per-patent query latency.
+
+
+# The attach_children() keyword each source feeds, keyed by its index_global.py
+# argument; the patent rows themselves are the documents children attach to.
+CHILDREN = {
+    'patent': None,
+    'UScitation': 'us_citations',
+    'USappcitation': 'us_app_citations',
+    'classes': 'cpc_classes',
+    'people': 'people',
+    'summary': 'summary',
+    'claim': 'claims'
+}
+
+
+def source_rows(spec, columns):
+    """
+    (patent key, document ID, document) of every row of a chunk of document field columns.
+
+    The columns come from ingest.source_columns(), so the documents carry the
+    same coercions, dedupe, dropped rows and '_id's as the ones the online
+    build indexes.
+    """
+    keys = patent_keys(columns['patent_id']).tolist()
+    ids = document_ids(spec, columns)
+    names = list(columns)
+    rows = zip(*(values.tolist() for values in columns.values()))
+    for key, doc_id, row in zip(keys, ids, rows):
+        yield key, doc_id, dict(zip(names, row))
+
+
+def _write_run(rows, run_path):
+    # list.sort is stable, so rows of one patent keep their file order
+    rows.sort(key=itemgetter(0))
+    with open(run_path, 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False, separators=(',', ':')))
+            f.write('\n')
+
+
+def _read_run(run_path):
+    with open(run_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            yield tuple(json.loads(line))
+
+
+def write_sorted_runs(name, ipath, run_dir, run_rows=500000, stage_dir=None, max_rss=None):
+    """
+    Stream a source CSV into sorted on-disk runs keyed by patent key.
+
+    Rows without a patent_id, or with one that has no key, are left out.
+
+    Args:
+        name (str): Source name, a key of SOURCES
+        ipath (str): Path to the source CSV
+        run_dir (str): Directory that receives the run files
+        run_rows (int): Maximum number of rows held in memory per run
+        stage_dir (str): Where the source's Parquet stage lives, if it has one
+        max_rss (int): Memory budget CSV chunks are sized to, as for the online load
+
+    Returns:
+        list: Paths of the run files, in creation order
+    """
+    runs = []
+    buffer = []
+    unkeyed = 0
+    spec = SOURCES[name]
+    for columns in iter_source_columns(spec, ipath, stage_dir=stage_dir, max_rss=max_rss):
+        for row in source_rows(spec, columns):
+            # Key 0 is the empty patent_id
+            if row[0] > 0:
+                buffer.append(row)
+            elif row[0] == UNKEYED:
+                unkeyed += 1
+        if len(buffer) >= run_rows:
+            runs.append(os.path.join(run_dir, f'{name}.{len(runs):05d}.run'))
+            _write_run(buffer, runs[-1])
+            buffer = []
+    if buffer:
+        runs.append(os.path.join(run_dir, f'{name}.{len(runs):05d}.run'))
+        _write_run(buffer, runs[-1])
+    if unkeyed:
+        print(f"WARNING: {unkeyed} rows of '{name}' have a patent_id of no known form and were skipped")
+    print(f"Sorted '{name}' into {len(runs)} run(s)")
+    return runs
+
+
+def reduce_runs(runs, run_dir, fan_in=64):
+    """
+    Merge runs in passes until at most ``fan_in`` remain.
+
+    Keeps the number of simultaneously open run files bounded when several
+    very large sources are joined at once.
+    """
+    generation = 0
+    while len(runs) > fan_in:
+        merged_runs = []
+        for start in range(0, len(runs), fan_in):
+            batch = runs[start:start + fan_in]
+            run_path = os.path.join(run_dir, f'merge{generation}.{start // fan_in:05d}.{os.path.basename(batch[0])}')
+            with open(run_path, 'w', encoding='utf-8') as f:
+                for row in heapq.merge(*[_read_run(run) for run in batch], key=itemgetter(0)):
+                    f.write(json.dumps(row, ensure_ascii=False, separators=(',', ':')))
+                    f.write('\n')
+            for run in batch:
+                os.remove(run)
+            merged_runs.append(run_path)
+        runs = merged_runs
+        generation += 1
+    return runs
+
+
+def iter_grouped(runs):
+    """
+    K-way merge sorted runs and yield (patent key, [records]) in key order.
+
+    Records sharing a document ID are one document online, where the later
+    row overwrites the earlier one, so they collapse the same way here.
+    """
+    merged = heapq.merge(*[_read_run(run) for run in runs], key=itemgetter(0))
+    for pid, group in groupby(merged, key=itemgetter(0)):
+        records = {}
+        for _, doc_id, record in group:
+            records[doc_id] = record
+        yield pid, list(records.values())
+
+
+def merge_join(patents, children):
+    """
+    Merge-join a grouped patent stream with grouped child streams.
+
+    All inputs must be ordered by patent key. Child groups whose patent has
+    no patent row are skipped, just as the enrichment loop never sees them.
+
+    Args:
+        patents (iterator): (patent key, [patent_doc, ...]) groups
+        children (dict): attach_children() keyword -> (patent key, [record, ...]) groups
+
+    Yields:
+        dict: Complete 'patentsview' documents
+    """
+    heads = {child: next(groups, None) for child, groups in children.items()}
+    for pid, patent_rows in patents:
+        found = {}
+        for child, groups in children.items():
+            head = heads[child]
+            while head is not None and head[0] < pid:
+                head = next(groups, None)
+            if head is not None and head[0] == pid:
+                found[child] = head[1]
+                head = next(groups, None)
+            heads[child] = head
+        if 'summary' in found:
+            found['summary'] = found['summary'][0]['summary']
+        yield attach_children(patent_rows[0], **found)
+
+
+def build_patentsview_offline(args):
+    """
+    Build the 'patentsview' index straight from the source CSVs.
+
+    Args:
+        args (argparse.Namespace): index_global.py arguments; every source
+            path that is set takes part in the join, 'patent' is required
+            sort_dir (str): Parent directory for the temporary run files
+            run_rows (int): Rows per sorted run
+
+    Returns:
+        int: Number of patentsview documents indexed
+    """
+    print("Starting offline patentsview build...")
+    if not args.patent:
+        print("ERROR: --patent is required for the offline build.")
+        return 0
+
+    start_time = time.time()
+    run_dir = tempfile.mkdtemp(prefix='patentsview_runs_', dir=args.sort_dir)
+    try:
+        grouped = {}
+        for name in CHILDREN:
+            ipath = getattr(args, name, None)
+            if ipath:
+                print(f"Sorting {name} file: {ipath}")
+                runs = write_sorted_runs(name, ipath, run_dir, args.run_rows,
+                                         stage_dir=getattr(args, 'stage_dir', None),
+                                         max_rss=getattr(args, 'max_rss', None))
+                grouped[name] = iter_grouped(reduce_runs(runs, run_dir))
+
+        patents = grouped.pop('patent')
+        children = {CHILDREN[name]: groups for name, groups in grouped.items()}
+
+        es = elasticsearch.Elasticsearch(hosts=["http://localhost:9200"])
+        processed_count = 0
+        success = 0
+
+        def build(target):
+            nonlocal success
+
+            def actions():
+                nonlocal processed_count
+                for patent in merge_join(patents, children):
+                    processed_count += 1
+                    if processed_count % 100000 == 0:
+                        print(f"Joined {processed_count} patents")
+                    yield {
+                        "_op_type": "index",
+                        "_index": target,
+                        "_id": patent_doc_id(patent['patent_id']),
+                        "_source": patent
+                    }
+
+            print("Merge-joining sources into patentsview documents...")
+            success, errors = write_actions(es, actions())
+            if errors:
+                print(f"Errors during bulk indexing (first 5): {errors[:5]}")
+            return processed_count
+
+        # The joined documents go into a new generation that replaces the live patentsview once complete
+        build_generation(es, PATENTSVIEW_INDEX, PATENTSVIEW_MAPPING, build,
+                         keep=getattr(args, 'keep_generations', GENERATIONS_KEPT),
+                         force_merge=getattr(args, 'force_merge', False),
+                         max_shrink=getattr(args, 'max_shrink', MAX_SHRINK))
+
+        print(f"Successfully indexed {success} of {processed_count} patents "
+              f"in {time.time() - start_time:.2f} seconds")
+        return success
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
@@ -0,0 +1,225 @@
+import json
+import time
+import threading
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Ingestion metrics.
+#
+# Every load records how long each stage takes (read: splitting CSV records
+# off the file, parse: pd.read_csv, transform: coercions, encode: NDJSON
+# serialization, bulk: one bulk request round trip), how many documents and
+# bytes went through, and how many bulk items were rejected with 429 and
+# retried. A chunk whose bulk time dominates is cluster-bound, one whose
+# read/parse time dominates is CSV-bound, and so on.
+#
+# Progress is appended as one JSON object per chunk to an optional log file,
+# and every active load is exposed in the Prometheus text format by
+# serve(port), without a dependency on prometheus_client.
+
+STAGES = ('read', 'parse', 'transform', 'encode', 'bulk')
+
+# Histogram buckets in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float('inf'))
+
+# Bulk latencies kept for the percentiles
+LATENCY_SAMPLES = 10000
+
+# Loads exposed by the endpoint
+ACTIVE = []
+
+
+class IngestMetrics:
+    """
+    Thread-safe counters and stage timings of one load.
+
+    Args:
+        index_name (str): Index being loaded, the 'index' label of every metric
+        total_bytes (int, optional): Bytes (or staged rows) to load, for the ETA
+        start_offset (int): Offset the load starts at
+        log_path (str, optional): JSON lines log appended by log()
+        label (str): Extra tag of log lines, e.g. a worker's byte range
+    """
+
+    def __init__(self, index_name, total_bytes=None, start_offset=0, log_path=None, label=''):
+        self.index_name = index_name
+        self.total_bytes = total_bytes
+        self.start_offset = start_offset
+        self.offset = start_offset
+        self.log_path = log_path
+        self.label = label
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.counters = {'docs': 0, 'errors': 0, 'bytes': 0, 'chunks': 0, 'bulk_requests': 0,
+                         'rejections': 0, 'retries': 0, 'throttled_seconds': 0.0}
+        self.gauges = {}
+        self.seconds = {stage: 0.0 for stage in STAGES}
+        self.histograms = {stage: [0] * len(BUCKETS) for stage in STAGES}
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def observe(self, stage, seconds):
+        """Record one timing of a stage."""
+        with self.lock:
+            self.seconds[stage] += seconds
+            self.histograms[stage][bisect_left(BUCKETS, seconds)] += 1
+            if stage == 'bulk':
+                self.latencies.append(seconds)
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as one observation of a stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def count(self, **amounts):
+        """Add to counters, e.g. count(bulk_requests=1, rejections=3)."""
+        with self.lock:
+            for name, amount in amounts.items():
+                self.counters[name] += amount
+
+    def gauge(self, **values):
+        """Set current values, e.g. gauge(bulk_target_bytes=5242880)."""
+        with self.lock:
+            self.gauges.update(values)
+
+    def chunk_done(self, docs, errors, offset):
+        """Record an acknowledged chunk that ends at offset."""
+        with self.lock:
+            self.counters['docs'] += docs
+            self.counters['errors'] += errors
+            self.counters['chunks'] += 1
+            self.counters['bytes'] += max(0, offset - self.offset)
+            self.offset = offset
+
+    def merge(self, snapshot):
+        """Add the counters and timings of another process's report()."""
+        with self.lock:
+            for name, value in snapshot['counters'].items():
+                self.counters[name] += value
+            self.gauges.update(snapshot.get('gauges', {}))
+            for stage in STAGES:
+                self.seconds[stage] += snapshot['stage_seconds'][stage]
+                self.histograms[stage] = [a + b for a, b in zip(self.histograms[stage], snapshot['histograms'][stage])]
+            self.latencies.extend(snapshot['latencies'])
+
+    def percentile(self, q):
+        with self.lock:
+            latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else None
+
+    def report(self):
+        """Current totals, rates, ETA and stage timings as a JSON-serializable dict."""
+        elapsed = max(time.time() - self.started, 1e-9)
+        with self.lock:
+            counters = dict(self.counters)
+            done = self.offset - self.start_offset
+            report = {
+                'index': self.index_name,
+                'label': self.label,
+                'elapsed': round(elapsed, 3),
+                'offset': self.offset,
+                'counters': counters,
+                'gauges': dict(self.gauges),
+                'docs_per_sec': round(counters['docs'] / elapsed, 1),
+                'mb_per_sec': round(counters['bytes'] / elapsed / 2 ** 20, 3),
+                'stage_seconds': {stage: round(seconds, 6) for stage, seconds in self.seconds.items()},
+                'histograms': {stage: list(counts) for stage, counts in self.histograms.items()},
+                'latencies': list(self.latencies),
+            }
+        remaining = self.total_bytes - self.offset if self.total_bytes is not None else None
+        report['eta_seconds'] = round(elapsed * remaining / done, 1) if remaining is not None and done > 0 else None
+        report['bulk_latency'] = {f'p{int(q * 100)}': self.percentile(q) for q in (0.5, 0.9, 0.99)}
+        return report
+
+    def log(self, event='chunk', **fields):
+        """Append the current report (without raw samples) as one JSON line to the log."""
+        if not self.log_path:
+            return
+        report = self.report()
+        del report['histograms'], report['latencies']
+        line = json.dumps(dict(report, event=event, time=time.strftime('%Y-%m-%dT%H:%M:%S'), **fields))
+        with open(self.log_path, 'a') as f:
+            f.write(line + '\n')
+
+    def summary(self):
+        """One human-readable line: rates, rejections and where the time went."""
+        report = self.report()
+        stages = ', '.join(f"{stage} {seconds:.2f}s" for stage, seconds in report['stage_seconds'].items())
+        latency = ', '.join(f"{name} {value * 1000:.0f}ms" for name, value in report['bulk_latency'].items()
+                            if value is not None)
+        target = report['gauges'].get('bulk_target_bytes')
+        target = f", {target / 2 ** 20:.1f} MB requests" if target else ''
+        throttled = report['counters']['throttled_seconds']
+        throttled = f", throttled {throttled:.0f}s" if throttled else ''
+        return (f"{report['docs_per_sec']:.0f} docs/s, {report['mb_per_sec']:.2f} MB/s, "
+                f"{report['counters']['rejections']} rejections | {stages} | bulk {latency}{target}{throttled}")
+
+
+def render_prometheus(loads=None):
+    """All active loads in the Prometheus text exposition format."""
+    loads = ACTIVE if loads is None else loads
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f'# HELP patents_ingest_{name} {help_text}')
+        lines.append(f'# TYPE patents_ingest_{name} {kind}')
+        for labels, value in samples:
+            label_text = ','.join(f'{key}="{val}"' for key, val in labels.items())
+            lines.append(f'patents_ingest_{name}{{{label_text}}} {value}')
+
+    reports = [load.report() for load in loads]
+    for counter, help_text in (('docs', 'Documents indexed'), ('errors', 'Documents failed'),
+                               ('bytes', 'Source bytes processed'), ('bulk_requests', 'Bulk requests sent'),
+                               ('rejections', 'Bulk items rejected with 429'),
+                               ('retries', 'Bulk requests retried'),
+                               ('throttled_seconds', 'Seconds bulk senders waited for the cluster governor')):
+        metric(f'{counter}_total', 'counter', help_text,
+               [({'index': r['index']}, r['counters'][counter]) for r in reports])
+    metric('docs_per_second', 'gauge', 'Documents indexed per second',
+           [({'index': r['index']}, r['docs_per_sec']) for r in reports])
+    metric('eta_seconds', 'gauge', 'Estimated seconds to the end of the source',
+           [({'index': r['index']}, r['eta_seconds']) for r in reports if r['eta_seconds'] is not None])
+    for gauge, help_text in (('bulk_target_bytes', 'Current payload target of bulk requests'),
+                             ('bulk_inflight_limit', 'Bulk requests the cluster governor allows in flight')):
+        metric(gauge, 'gauge', help_text,
+               [({'index': r['index']}, r['gauges'][gauge]) for r in reports if gauge in r['gauges']])
+
+    lines.append('# HELP patents_ingest_stage_seconds Time spent per ingestion stage')
+    lines.append('# TYPE patents_ingest_stage_seconds histogram')
+    for r in reports:
+        for stage in STAGES:
+            labels = f'index="{r["index"]}",stage="{stage}"'
+            cumulative = 0
+            for bound, count in zip(BUCKETS, r['histograms'][stage]):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else bound
+                lines.append(f'patents_ingest_stage_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f'patents_ingest_stage_seconds_sum{{{labels}}} {r["stage_seconds"][stage]}')
+            lines.append(f'patents_ingest_stage_seconds_count{{{labels}}} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port, host='127.0.0.1'):
+    """Expose the active loads at http://host:port/metrics from a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"📊 Metrics at http://{host}:{port}/metrics")
+    return server
@@ -1,11 +1,15 @@
 import pandas as pd
 import elasticsearch
-from elasticsearch import Elasticsearch, helpers
+from elasticsearch import Elasticsearch
 import logging
 from typing import Iterator, Dict
 import sys
 from datetime import datetime
 
+from doc_ids import content_doc_id, patent_doc_id
+from bulk_writer import BULK_QUEUE, BULK_THREADS, write_actions
+from bulk_mode import bulk_load_mode
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -19,12 +23,18 @@ class PatentIndexer:
         hosts: list = ['http://localhost:9200'],
         index_name: str = 'patents',
         chunk_size: int = 10000,
-        mapping: dict = None
+        mapping: dict = None,
+        id_field: str = 'patent_number',
+        bulk_threads: int = BULK_THREADS,
+        bulk_queue: int = BULK_QUEUE
     ):
         self.hosts = hosts
         self.index_name = index_name
         self.chunk_size = chunk_size
         self.mapping = mapping or self._default_mapping()
+        self.id_field = id_field
+        self.bulk_threads = bulk_threads
+        self.bulk_queue = bulk_queue
         self.es = None
 
     def _default_mapping(self) -> dict:
@@ -72,6 +82,13 @@ class PatentIndexer:
             logger.error(f"Error creating index: {e}")
             raise
 
+    def _doc_id(self, record: dict) -> str:
+        """Stable document ID: the id_field value, or a content hash when it is empty"""
+        key = str(record.get(self.id_field, '')).strip()
+        if key:
+            return patent_doc_id(key)
+        return content_doc_id('', record)
+
     def process_csv_in_chunks(self, file_path: str) -> Iterator[Dict]:
         """Process large CSV file in chunks"""
         try:
@@ -83,7 +100,9 @@ class PatentIndexer:
             ):
                 for record in chunk.to_dict('records'):
                     yield {
+                        "_op_type": "index",
                         "_index": self.index_name,
+                        "_id": self._doc_id(record),
                         "_source": record
                     }
         except Exception as e:
@@ -96,13 +115,14 @@ class PatentIndexer:
             total_indexed = 0
             start_time = datetime.now()
 
-            # Process and index in chunks
-            success, failed = helpers.bulk(
+            # Process and index in chunks, parsing while earlier chunks are in flight
+            success, failed = write_actions(
                 self.es,
                 self.process_csv_in_chunks(file_path),
+                thread_count=self.bulk_threads,
+                queue_size=self.bulk_queue,
                 chunk_size=self.chunk_size,
-                max_retries=3,
-                raise_on_exception=False
+                max_retries=3
             )
 
             end_time = datetime.now()
@@ -122,7 +142,8 @@ class PatentIndexer:
         try:
             self.connect_elasticsearch()
             self.create_index()
-            self.index_documents(file_path)
+            with bulk_load_mode(self.es, self.index_name):
+                self.index_documents(file_path)
         except Exception as e:
             logger.error(f"Application error: {e}")
             sys.exit(1)
@@ -135,13 +156,19 @@ if __name__ == "__main__":
     parser.add_argument("--host", default="http://localhost:9200", help="Elasticsearch host URL")
     parser.add_argument("--index", default="patents", help="Name of the Elasticsearch index")
     parser.add_argument("--chunk-size", type=int, default=10000, help="Size of chunks for processing")
+    parser.add_argument("--id-field", default="patent_number", help="Column used as the document ID")
+    parser.add_argument("--bulk-threads", type=int, default=BULK_THREADS, help="Concurrent bulk requests")
+    parser.add_argument("--bulk-queue", type=int, default=BULK_QUEUE, help="Bulk requests queued before parsing pauses")
 
     args = parser.parse_args()
 
     indexer = PatentIndexer(
         hosts=[args.host],
         index_name=args.index,
-        chunk_size=args.chunk_size
+        chunk_size=args.chunk_size,
+        id_field=args.id_field,
+        bulk_threads=args.bulk_threads,
+        bulk_queue=args.bulk_queue
     )
 
     indexer.run(args.file_path)
\ No newline at end of file
@@ -0,0 +1,99 @@
+import re
+
+import numpy as np
+
+# Compact integer keys of patent IDs.
+#
+# A patent_id is a document-type prefix and a number: '10000000' (utility),
+# 'D987654' (design), 'PP34567' (plant), 'RE49999' (reissue), and the rare
+# 'T', 'H', 'X' and 'AI' series. Anything that joins, diffs or looks up
+# sources by patent works on a reversible 64-bit key instead of the string:
+#
+#     bits 56-62  prefix, an index into PREFIXES
+#     bits 50-55  number of digits, so leading zeros survive the round trip
+#     bits  0-49  the number itself (up to 15 digits)
+#
+# Keys sort by prefix code, then by number of digits, then by number, so
+# '999' < '0001' < '1000' and 'D5' < 'PP1': numeric only among IDs of one
+# prefix and width, which is all a merge-join or a binary search needs. They
+# fit sorted int64 NumPy arrays, which are searched with np.searchsorted() and
+# stored in a fraction of the space of a dict or a text file of strings. The
+# empty ID has key 0. IDs of any other shape have no key (UNKEYED); callers
+# count and skip them.
+
+# Document-type prefixes; a prefix's position is its code, so new ones are only ever appended
+PREFIXES = ('', 'D', 'PP', 'RE', 'T', 'H', 'X', 'AI')
+
+# Key of an ID that cannot be encoded
+UNKEYED = -1
+
+MAX_DIGITS = 15
+
+_CODES = {prefix: code for code, prefix in enumerate(PREFIXES)}
+_PATTERN = re.compile(r'([A-Z]*)(\d*)')
+_NUMBER_BITS = 50
+_WIDTH_BITS = 6
+_PREFIX_SHIFT = _NUMBER_BITS + _WIDTH_BITS
+
+
+def patent_key(patent_id):
+    """Key of one patent ID (stripped), or UNKEYED."""
+    match = _PATTERN.fullmatch(patent_id) if isinstance(patent_id, str) else None
+    if match is None or match.group(1) not in _CODES or len(match.group(2)) > MAX_DIGITS:
+        return UNKEYED
+    digits = match.group(2)
+    return (_CODES[match.group(1)] << _PREFIX_SHIFT) | (len(digits) << _NUMBER_BITS) | int(digits or 0)
+
+
+def patent_id(key):
+    """The patent ID a key was made from."""
+    key = int(key)
+    width = (key >> _NUMBER_BITS) & ((1 << _WIDTH_BITS) - 1)
+    number = key & ((1 << _NUMBER_BITS) - 1)
+    return PREFIXES[key >> _PREFIX_SHIFT] + (f'{number:0{width}d}' if width else '')
+
+
+def patent_keys(ids):
+    """
+    Keys of a column of patent IDs, vectorized.
+
+    Args:
+        ids (Series, array or list): Stripped patent IDs
+
+    Returns:
+        ndarray: int64 keys aligned with ids, UNKEYED where an ID has none
+    """
+    ids = ids.tolist() if hasattr(ids, 'tolist') else list(ids)
+    try:
+        # Plain numbers (utility patents) make up nearly all IDs and need no regex
+        widths = np.fromiter(map(len, ids), dtype=np.int64, count=len(ids))
+        plain = (np.fromiter(map(str.isdigit, ids), dtype=bool, count=len(ids))
+                 & np.fromiter(map(str.isascii, ids), dtype=bool, count=len(ids)) & (widths <= MAX_DIGITS))
+    except TypeError:
+        # Not all str (e.g. NaN)
+        return np.array([patent_key(pid) for pid in ids], dtype=np.int64)
+    keys = np.full(len(ids), UNKEYED, dtype=np.int64)
+    numbers = [int(pid) for pid, is_plain in zip(ids, plain.tolist()) if is_plain]
+    keys[plain] = (widths[plain] << _NUMBER_BITS) | np.array(numbers, dtype=np.int64)
+    rest = np.flatnonzero(~plain)
+    keys[rest] = [patent_key(ids[i]) for i in rest.tolist()]
+    return keys
+
+
+def patent_ids(keys):
+    """The patent IDs of an array of keys, as a list of str."""
+    return [patent_id(key) for key in np.asarray(keys).tolist()]
+
+
+def contains(sorted_keys, keys):
+    """
+    Which keys are in a sorted key array, by binary search.
+
+    Returns:
+        ndarray: bool, aligned with keys
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    if not len(sorted_keys):
+        return np.zeros(len(keys), dtype=bool)
+    positions = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+    return sorted_keys[positions] == keys
@@ -0,0 +1,148 @@
+# Name of the denormalized index served to the search backend
+PATENTSVIEW_INDEX = 'patentsview'
+
+# Patentsview index mapping
+PATENTSVIEW_MAPPING = {
+    "mappings": {
+        "properties": {
+            "patent_id": {"type": "keyword"},
+            "patent_title": {"type": "text"},
+            "patent_date": {"type": "date"},
+            "num_claims": {"type": "integer"},
+            "patent_type": {"type": "keyword"},
+            "patent_abstract": {"type": "text"},
+            "summary": {"type": "text"},
+            "claims_text": {"type": "text"},
+
+            "claims": {
+                "type": "nested",
+                "properties": {
+                    "claim_sequence": {"type": "integer"},
+                    "claim_text": {"type": "text"},
+                    "dependent": {"type": "boolean"},
+                    "claim_number": {"type": "integer"},
+                    "exemplary": {"type": "boolean"}
+                }
+            },
+            "people": {
+                "type": "nested",
+                "properties": {
+                    "applicant_authority": {"type": "keyword"},
+                    "applicant_organization": {"type": "text"},
+                    "applicant_full_name": {"type": "text"},
+                    "assignee_id": {"type": "keyword"},
+                    "assignee_organization": {"type": "text"},
+                    "assignee_full_name": {"type": "text"},
+                    "inventor_id": {"type": "keyword"},
+                    "gender_code": {"type": "keyword"},
+                    "inventor_full_name": {"type": "text"}
+                }
+            },
+            "cpc_classes": {
+                "type": "nested",
+                "properties": {
+                    "cpc_section": {"type": "keyword"},
+                    "cpc_class": {"type": "keyword"},
+                    "cpc_subclass": {"type": "keyword"},
+                    "cpc_group": {"type": "keyword"},
+                    "cpc_type": {"type": "keyword"},
+                    "cpc_group_title": {"type": "text"},
+                    "cpc_class_title": {"type": "text"}
+                }
+            },
+            "us_app_citations": {
+                "type": "nested",
+                "properties": {
+                    "citation_sequence": {"type": "integer"},
+                    "citation_document_number": {"type": "keyword"},
+                    "citation_date": {"type": "date"},
+                    "record_name": {"type": "text"},
+                    "wipo_kind": {"type": "keyword"},
+                    "citation_category": {"type": "keyword"}
+                }
+            },
+            "us_citations": {
+                "type": "nested",
+                "properties": {
+                    "citation_sequence": {"type": "integer"},
+                    "citation_document_number": {"type": "keyword"},
+                    "citation_date": {"type": "date"},
+                    "record_name": {"type": "text"},
+                    "wipo_kind": {"type": "keyword"},
+                    "citation_category": {"type": "keyword"}
+                }
+            }
+        }
+    }
+}
+
+def citation_object(source):
+    """Shape a citation document into a nested 'us_citations'/'us_app_citations' entry."""
+    return {
+        "citation_sequence": source.get('citation_sequence', 0),
+        "citation_document_number": source.get('citation_document_number', ''),
+        "citation_date": source.get('citation_date', ''),
+        "record_name": source.get('record_name', ''),
+        "wipo_kind": source.get('wipo_kind', ''),
+        "citation_category": source.get('citation_category', '')
+    }
+
+
+def claim_object(source):
+    """Shape a claim document into a nested 'claims' entry."""
+    return {
+        "claim_sequence": source.get('claim_sequence', 0),
+        "claim_text": source.get('claim_text', ''),
+        "dependent": source.get('dependent', False),
+        "claim_number": source.get('claim_number', 0),
+        "exemplary": source.get('exemplary', False)
+    }
+
+
+def cpc_object(source):
+    """Shape a CPC classification document into a nested 'cpc_classes' entry."""
+    return {
+        "cpc_section": source.get('cpc_section', ''),
+        "cpc_class": source.get('cpc_class', ''),
+        "cpc_subclass": source.get('cpc_subclass', ''),
+        "cpc_group": source.get('cpc_group', ''),
+        "cpc_type": source.get('cpc_type', ''),
+        "cpc_group_title": source.get('cpc_group_title', ''),
+        "cpc_class_title": source.get('cpc_class_title', '')
+    }
+
+
+def attach_children(patent, us_citations=None, us_app_citations=None, summary=None,
+                    claims=None, people=None, cpc_classes=None):
+    """
+    Attach child records to a patent document in the 'patentsview' layout.
+
+    Children are the raw ``_source`` dicts of the per-source indices (or rows
+    shaped the same way). Empty or missing children leave the field unset,
+    which matches what the per-patent enrichment loop has always produced.
+    Claims are ordered by claim_sequence.
+
+    Args:
+        patent (dict): Patent document from 'patent_tmp'; modified in place
+        us_citations, us_app_citations, claims, people, cpc_classes (list, optional):
+            Child documents belonging to the patent
+        summary (str, optional): Cleaned brief summary text
+
+    Returns:
+        dict: The enriched patent document
+    """
+    if us_citations:
+        patent['us_citations'] = [citation_object(c) for c in us_citations]
+    if us_app_citations:
+        patent['us_app_citations'] = [citation_object(c) for c in us_app_citations]
+    if summary:
+        patent['summary'] = summary
+    if claims:
+        claims = sorted(claims, key=lambda c: c.get('claim_sequence') or 0)
+        patent['claims'] = [claim_object(c) for c in claims]
+        patent['claims_text'] = " ".join(c.get('claim_text', '') for c in claims)
+    if people:
+        patent['people'] = list(people)
+    if cpc_classes:
+        patent['cpc_classes'] = [cpc_object(c) for c in cpc_classes]
+    return patent
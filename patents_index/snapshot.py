@@ -0,0 +1,98 @@
+import io
+import os
+import gzip
+import json
+
+from bulk_encoder import dumps
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; snapshots fall back to gzip
+    zstandard = None
+
+# Streaming intermediate output of a load.
+#
+# A snapshot is compressed NDJSON with one document per line, written while
+# the load runs. Every chunk is appended as its own gzip member or zstd
+# frame, which concatenate into one valid stream, so the file size after a
+# chunk is a clean cut point: a resumed load truncates the snapshot back to
+# the size recorded in its checkpoint and keeps appending. Only the current
+# chunk is ever held in memory, and a snapshot can be replayed straight into
+# bulk requests (ingest.replay()).
+
+
+def snapshot_path(directory, name, timestamp):
+    """Path of a new snapshot: '<directory>/<name>_<timestamp>.ndjson.zst' (or .gz without zstandard)."""
+    extension = '.ndjson.zst' if zstandard is not None else '.ndjson.gz'
+    return os.path.join(directory, f'{name}_{timestamp}{extension}')
+
+
+def _compress(path, data):
+    if path.endswith('.zst'):
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+class SnapshotWriter:
+    """
+    Append-only writer of a compressed NDJSON snapshot.
+
+    Args:
+        path (str): Snapshot file
+        offset (int, optional): Size recorded by a checkpoint; the file is
+            truncated back to it, dropping chunks written after that checkpoint.
+            Without it the file is started empty.
+    """
+
+    def __init__(self, path, offset=None):
+        self.path = path
+        self.f = open(path, 'r+b' if offset is not None and os.path.exists(path) else 'wb')
+        self.f.truncate(offset or 0)
+        self.f.seek(0, os.SEEK_END)
+
+    @property
+    def offset(self):
+        return self.f.tell()
+
+    def append(self, docs):
+        """Write one chunk of documents as a member of its own; returns the new file size."""
+        return self.append_lines(dumps(doc) + b'\n' for doc in docs)
+
+    def append_lines(self, lines):
+        """Like append(), for documents already encoded as JSON lines."""
+        data = b''.join(lines)
+        if data:
+            self.f.write(_compress(self.path, data))
+            self.f.flush()
+        return self.offset
+
+    def close(self):
+        self.f.close()
+
+
+def iter_snapshot(path):
+    """Stream the documents of a snapshot, decompressing as it goes."""
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise ImportError(f"Reading '{path}' needs zstandard (pip install zstandard)")
+        raw = open(path, 'rb')
+        lines = io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True),
+                                 encoding='utf-8')
+    else:
+        lines = gzip.open(path, 'rt', encoding='utf-8')
+    with lines:
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_snapshot_chunks(path, chunk_rows):
+    """Stream a snapshot in lists of at most chunk_rows documents."""
+    chunk = []
+    for doc in iter_snapshot(path):
+        chunk.append(doc)
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,228 @@
+# Declarative source specs for the ingestion engine (ingest.py).
+#
+# Every CSV source is described here once, keyed by its index_global.py
+# argument: the CSV dialect, the target index and mapping, how each field is
+# read from a column and coerced (a name from transform.COERCIONS), and how
+# the document ID is formed. The engine does the rest, so any improvement to
+# reading, transforming or writing applies to all sources at once.
+#
+# Spec keys:
+#   index      target index (with 'alias', the alias over a timestamped index)
+#   read       pd.read_csv keyword arguments (the CSV dialect)
+#   fields     document field -> (CSV column, coercion name), in source order
+#   id         document ID: a tuple of fields joined like child_doc_id(),
+#              or 'content' for content_doc_id() when there is no natural key
+#   mapping    index mapping, created when the load starts fresh
+#   dedupe     CSV columns whose duplicates are dropped within a chunk (optional)
+#   categorical CSV columns of a few distinct values, read as categoricals so
+#              each value is stored, coerced and encoded once per chunk (optional)
+#   drop_empty fields whose empty values drop the row (optional)
+#   required   CSV columns without which the load is aborted (optional)
+#   alias      index into '<index>_<timestamp>' and point the alias at it (optional)
+#   snapshot   stream all sources to '<input dir>/<snapshot>_<timestamp>.ndjson.zst'
+#              (.gz without zstandard) while loading, see snapshot.py (optional)
+
+PATENT_MAPPING = {
+    "mappings": {
+        "properties": {
+            # Keyword fields for exact matching
+            "patent_id": {"type": "keyword"},
+            "patent_type": {"type": "keyword"},
+
+            # Text fields for full-text search capabilities
+            "patent_title": {
+                "type": "text",
+                "fields": {
+                    "keyword": {"type": "keyword", "ignore_above": 256}
+                }
+            },
+            "patent_abstract": {
+                "type": "text",
+                "fields": {
+                    "keyword": {"type": "keyword", "ignore_above": 256}
+                }
+            },
+
+            # Date and numeric fields for precise filtering
+            "patent_date": {"type": "date"},
+            "num_claims": {"type": "integer"}
+        }
+    }
+}
+
+CITATION_MAPPING = {
+    "mappings": {
+        "properties": {
+            "patent_id": {"type": "keyword"},
+            "citation_sequence": {"type": "integer"},
+            "citation_document_number": {"type": "keyword"},
+            "citation_date": {"type": "date"},
+            "record_name": {"type": "text"},
+            "wipo_kind": {"type": "keyword"},
+            "citation_category": {"type": "keyword"}
+        }
+    }
+}
+
+CPC_MAPPING = {
+    "mappings": {
+        "properties": {
+            "patent_id": {"type": "keyword"},
+            "cpc_section": {"type": "keyword"},
+            "cpc_class": {"type": "keyword"},
+            "cpc_subclass": {"type": "keyword"},
+            "cpc_group": {"type": "keyword"},
+            "cpc_type": {"type": "keyword"},
+            "cpc_group_title": {"type": "text"},
+            "cpc_class_title": {"type": "text"}
+        }
+    }
+}
+
+PEOPLE_MAPPING = {
+    "mappings": {
+        "properties": {
+            # Identifier fields - optimized for exact matching
+            "patent_id": {"type": "keyword"},
+            "applicant_authority": {"type": "keyword"},
+            "assignee_id": {"type": "keyword"},
+            "inventor_id": {"type": "keyword"},
+            "gender_code": {"type": "keyword"},
+
+            # Text fields with full-text search capabilities
+            "applicant_organization": {"type": "text"},
+            "applicant_full_name": {"type": "text"},
+            "assignee_organization": {"type": "text"},
+            "assignee_full_name": {"type": "text"},
+            "inventor_full_name": {"type": "text"}
+        }
+    }
+}
+
+SUMMARY_MAPPING = {
+    "mappings": {
+        "properties": {
+            "patent_id": {"type": "keyword"},
+            "summary": {
+                "type": "text",
+                "analyzer": "standard",
+                "fields": {
+                    "keyword": {"type": "keyword", "ignore_above": 256}
+                }
+            }
+        }
+    }
+}
+
+CLAIM_MAPPING = {
+    "mappings": {
+        "properties": {
+            "patent_id": {"type": "keyword"},
+            "claim_sequence": {"type": "integer"},
+            "claim_text": {"type": "text"},
+            "dependent": {"type": "boolean"},
+            "claim_number": {"type": "integer"},
+            "exemplary": {"type": "boolean"}
+        }
+    }
+}
+
+# The PatentsView CSV dialect most sources share
+CSV = dict(sep=',', quoting=0, lineterminator='\n', on_bad_lines='skip')
+
+
+def _citation_fields(prefix):
+    return {
+        "patent_id": ("patent_id", 'str'),
+        "citation_sequence": (f"{prefix}_citation_sequence", 'digits'),
+        "citation_document_number": (f"{prefix}_citation_document_number", 'str'),
+        "citation_date": (f"{prefix}_citation_date", 'date'),
+        "record_name": (f"{prefix}_record_name", 'str'),
+        "wipo_kind": (f"{prefix}_wipo_kind", 'str'),
+        "citation_category": (f"{prefix}_citation_category", 'str')
+    }
+
+
+SOURCES = {
+    'patent': {
+        'index': 'patent_tmp',
+        'read': CSV,
+        'fields': {
+            "patent_id": ("patent_id", 'str'),
+            "patent_title": ("patent_title", 'str'),
+            "patent_date": ("patent_date", 'date'),
+            "num_claims": ("num_claims", 'int'),
+            "patent_type": ("patent_type", 'str'),
+            "patent_abstract": ("patent_abstract", 'str')
+        },
+        'id': ('patent_id',),
+        'mapping': PATENT_MAPPING,
+        'categorical': ['patent_type'],
+        'alias': True,
+        'snapshot': 'patent_index'
+    },
+    'UScitation': {
+        'index': 'us_citations',
+        'read': dict(sep=','),
+        'fields': dict(_citation_fields('US_citation'),
+                       citation_sequence=("US_citation_citation_sequence", 'digits_or_none')),
+        'id': ('patent_id', 'citation_document_number'),
+        'mapping': CITATION_MAPPING,
+        'dedupe': ['patent_id', 'US_citation_citation_document_number'],
+        'categorical': ['US_citation_wipo_kind', 'US_citation_citation_category']
+    },
+    'USappcitation': {
+        'index': 'us_app_citation_tmp',
+        'read': dict(sep=',', on_bad_lines='skip'),
+        'fields': _citation_fields('US_app_citation'),
+        'id': ('patent_id', 'citation_document_number'),
+        'mapping': CITATION_MAPPING,
+        'dedupe': ['patent_id', 'US_app_citation_citation_document_number'],
+        'categorical': ['US_app_citation_wipo_kind', 'US_app_citation_citation_category'],
+        'required': [name for name, _ in _citation_fields('US_app_citation').values()]
+    },
+    'classes': {
+        'index': 'cpc_classes_tmp',
+        'read': dict(sep=',', on_bad_lines='skip'),
+        'fields': {field: (field, 'text') for field in CPC_MAPPING['mappings']['properties']},
+        'id': 'content',
+        'mapping': CPC_MAPPING,
+        'categorical': ['cpc_section', 'cpc_class', 'cpc_subclass', 'cpc_type']
+    },
+    'people': {
+        'index': 'patent_people_tmp',
+        'read': CSV,
+        'fields': {field: (field, 'str') for field in (
+            'patent_id', 'applicant_authority', 'applicant_organization', 'applicant_full_name',
+            'assignee_id', 'assignee_organization', 'assignee_full_name',
+            'inventor_id', 'gender_code', 'inventor_full_name')},
+        'id': 'content',
+        'mapping': PEOPLE_MAPPING,
+        'categorical': ['applicant_authority', 'gender_code']
+    },
+    'summary': {
+        'index': 'patent_summary_tmp',
+        'read': dict(CSV, sep='\t', on_bad_lines='warn'),
+        'fields': {
+            "patent_id": ("patent_id", 'str'),
+            "summary": ("summary_text", 'clean_text')
+        },
+        'id': ('patent_id',),
+        'mapping': SUMMARY_MAPPING,
+        'drop_empty': ['summary']
+    },
+    'claim': {
+        'index': 'claim_tmp',
+        'read': CSV,
+        'fields': {
+            "patent_id": ("patent_id", 'str'),
+            "claim_sequence": ("claim_sequence", 'int'),
+            "claim_text": ("claim_text", 'text'),
+            "dependent": ("dependent", 'bool'),
+            "claim_number": ("claim_number", 'int'),
+            "exemplary": ("exemplary", 'bool')
+        },
+        'id': ('patent_id', 'claim_sequence'),
+        'mapping': CLAIM_MAPPING
+    }
+}
@@ -0,0 +1,250 @@
+import os
+import json
+import shutil
+import hashlib
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # staging is optional; without pyarrow every load parses the CSV
+    pa = pq = None
+
+from checkpoint import iter_csv_chunks
+from deadletter import DeadLetterWriter
+
+# Columnar staging cache for the PatentsView CSVs.
+#
+# stage_source() parses a source CSV once with its spec (sources.py) and
+# stores the coerced, deduplicated document fields as zstd-compressed Parquet
+# parts under '<input dir>/staged/<file>.<fingerprint>/'. The fingerprint
+# covers the file's path, size and mtime and the spec's reading rules, so a
+# changed file or spec simply gets a new stage. CSV records the parser cannot
+# split are quarantined into the stage, and a load from the stage copies them
+# next to the source, as a load of the CSV would have. The ingestion engine
+# uses a complete stage automatically whenever one exists, skipping CSV
+# parsing; the notebooks can load a source with read_source().
+
+STAGE_VERSION = 2
+MANIFEST = '_SUCCESS'
+QUARANTINE = 'quarantine.ndjson'
+ROWS_PER_PART = 5000000
+
+# Arrow type of each coercion's output
+COERCION_TYPES = {
+    'str': 'string',
+    'text': 'string',
+    'clean_text': 'string',
+    'int': 'int64',
+    'digits': 'int64',
+    'digits_or_none': 'int64',
+    'bool': 'bool_',
+    'date': 'date32',
+}
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Parquet staging needs pyarrow (pip install pyarrow)")
+
+
+def _schema(spec):
+    return pa.schema([(field, getattr(pa, COERCION_TYPES[coercion])())
+                      for field, (_, coercion) in spec['fields'].items()])
+
+
+def stage_path(spec, ipath, stage_dir=None):
+    """Directory the stage of this exact file and spec lives in."""
+    ipath = os.path.abspath(ipath)
+    stat = os.stat(ipath)
+    rules = {key: spec.get(key) for key in ('fields', 'read', 'dedupe', 'drop_empty', 'required')}
+    key = json.dumps([STAGE_VERSION, ipath, stat.st_size, int(stat.st_mtime), rules], sort_keys=True, default=str)
+    fingerprint = hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+    stage_dir = stage_dir or os.path.join(os.path.dirname(ipath), 'staged')
+    return os.path.join(stage_dir, f'{os.path.basename(ipath)}.{fingerprint}')
+
+
+def find_stage(spec, ipath, stage_dir=None):
+    """Return the complete stage of the file, or None if there is none (or no pyarrow)."""
+    if pa is None:
+        return None
+    path = stage_path(spec, ipath, stage_dir)
+    return path if os.path.exists(os.path.join(path, MANIFEST)) else None
+
+
+def staged_rows(path):
+    """Number of documents in a stage."""
+    with open(os.path.join(path, MANIFEST)) as f:
+        return json.load(f)['rows']
+
+
+def copy_quarantine(path, dest):
+    """Copy the records quarantined while staging to dest (a load's quarantine file), if there are any."""
+    source = os.path.join(path, QUARANTINE)
+    if os.path.exists(source):
+        shutil.copyfile(source, dest)
+
+
+def _to_array(values, arrow_type):
+    # Dates are coerced to 'YYYY-MM-DD' strings, which Arrow parses into date32
+    if pa.types.is_date32(arrow_type):
+        return pa.array(values.tolist(), type=pa.string()).cast(arrow_type)
+    return pa.array(values.tolist(), type=arrow_type)
+
+
+def stage_source(spec, ipath, stage_dir=None, chunk_rows=50000, rows_per_part=ROWS_PER_PART):
+    """
+    Convert a source CSV into typed, compressed Parquet parts, once.
+
+    Every CSV chunk becomes one row group, so readers can fetch row groups
+    independently and decompress their columns in parallel.
+
+    Args:
+        spec (dict): Source spec from sources.SOURCES
+        ipath (str): Path to the source CSV
+        stage_dir (str, optional): Root of the stages; defaults to '<input dir>/staged'
+        chunk_rows (int): CSV records per chunk (and at most rows per row group)
+        rows_per_part (int): Documents per Parquet part file
+
+    Returns:
+        str: The stage directory
+    """
+    _require_pyarrow()
+    from ingest import read_options, source_columns
+
+    path = stage_path(spec, ipath, stage_dir)
+    if find_stage(spec, ipath, stage_dir):
+        print(f"📦 '{ipath}' is already staged in {path}")
+        return path
+
+    # Stages of older versions of the file are stale now
+    prefix = os.path.basename(ipath) + '.'
+    parent = os.path.dirname(path)
+    if os.path.isdir(parent):
+        for name in os.listdir(parent):
+            if name.startswith(prefix):
+                shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+
+    tmp_path = path + '.tmp'
+    os.makedirs(tmp_path)
+    schema = _schema(spec)
+    quarantine = DeadLetterWriter(os.path.join(tmp_path, QUARANTINE))
+    writer, part, part_rows, rows = None, 0, 0, 0
+    print(f"📦 Staging '{ipath}' into {path}...")
+    try:
+        for chunk, _ in iter_csv_chunks(ipath, chunk_rows=chunk_rows, quarantine=quarantine,
+                                        **read_options(spec, ipath)):
+            chunk.columns = chunk.columns.str.strip()
+            missing = [name for name in spec.get('required', ()) if name not in chunk.columns]
+            if missing:
+                raise ValueError(f"Missing required columns: {missing}")
+            columns = source_columns(spec, chunk)
+            table = pa.Table.from_arrays([_to_array(columns[field.name], field.type) for field in schema],
+                                         schema=schema)
+            if writer is None or part_rows >= rows_per_part:
+                if writer is not None:
+                    writer.close()
+                    part += 1
+                writer = pq.ParquetWriter(os.path.join(tmp_path, f'part-{part:05d}.parquet'), schema,
+                                          compression='zstd')
+                part_rows = 0
+            writer.write_table(table, row_group_size=chunk_rows)
+            part_rows += table.num_rows
+            rows += table.num_rows
+        if writer is not None:
+            writer.close()
+        with open(os.path.join(tmp_path, MANIFEST), 'w') as f:
+            json.dump({'source': os.path.abspath(ipath), 'rows': rows, 'parts': part + 1 if writer else 0}, f)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    os.replace(tmp_path, path)
+    print(f"📦 Staged {rows} documents from '{ipath}'"
+          + (f", {quarantine.written} unparsable records quarantined" if quarantine.written else ''))
+    return path
+
+
+def _parts(path):
+    return sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.parquet'))
+
+
+def _to_series(array):
+    # Dates go back to the 'YYYY-MM-DD' strings the CSV path produces
+    if pa.types.is_date32(array.type):
+        array = array.cast(pa.string())
+    # Numbers and booleans keep a numpy dtype unless they hold nulls, as after coercion
+    if array.null_count == 0 and (pa.types.is_integer(array.type) or pa.types.is_boolean(array.type)):
+        return pd.Series(array.to_numpy(zero_copy_only=False))
+    return pd.Series(array.to_pylist(), dtype=object)
+
+
+def iter_staged_chunks(path, chunk_rows=50000, start_row=None, end_row=None, columns=None):
+    """
+    Read a stage in chunks, row group by row group, from a row position.
+
+    Args:
+        path (str): Stage directory
+        chunk_rows (int): Maximum documents per chunk
+        start_row (int, optional): First document to read
+        end_row (int, optional): Stop before this document
+        columns (list, optional): Fields to read (column projection)
+
+    Yields:
+        tuple: (dict of field -> Series, row position just past the chunk)
+    """
+    start_row = start_row or 0
+    position = 0
+    for part in _parts(path):
+        parquet = pq.ParquetFile(part)
+        for group in range(parquet.num_row_groups):
+            group_rows = parquet.metadata.row_group(group).num_rows
+            first, position = position, position + group_rows
+            if position <= start_row:
+                continue
+            if end_row is not None and first >= end_row:
+                return
+            table = parquet.read_row_group(group, columns=columns, use_threads=True)
+            table = table.slice(max(start_row - first, 0),
+                                (min(end_row, position) if end_row is not None else position) - max(start_row, first))
+            offset = max(start_row, first)
+            for batch_start in range(0, table.num_rows, chunk_rows):
+                batch = table.slice(batch_start, chunk_rows)
+                yield ({name: _to_series(batch.column(name)) for name in batch.column_names},
+                       offset + batch_start + batch.num_rows)
+
+
+def read_source(spec, ipath, columns=None, stage_dir=None):
+    """
+    Load a source's document fields as a DataFrame, from its stage when present.
+
+    Args:
+        spec (dict): Source spec from sources.SOURCES
+        ipath (str): Path to the source CSV
+        columns (list, optional): Fields to load
+        stage_dir (str, optional): Root of the stages
+
+    Returns:
+        DataFrame: One row per document, typed like the index documents
+    """
+    path = find_stage(spec, ipath, stage_dir)
+    if path:
+        return pq.read_table(path, columns=columns, use_threads=True).to_pandas()
+    from ingest import read_options, source_columns
+
+    frames = []
+    for chunk, _ in iter_csv_chunks(ipath, **read_options(spec, ipath)):
+        chunk.columns = chunk.columns.str.strip()
+        fields = source_columns(spec, chunk)
+        frames.append(pd.DataFrame({name: values.to_numpy() for name, values in fields.items()
+                                    if columns is None or name in columns}))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+
+def split_rows(path, parts, start_row=None):
+    """Split the documents of a stage from start_row into about equal (start, end) row ranges."""
+    start_row = start_row or 0
+    total = staged_rows(path)
+    parts = max(1, min(parts, total - start_row))
+    bounds = [start_row + (total - start_row) * i // parts for i in range(parts + 1)]
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
@@ -0,0 +1,245 @@
+import os
+import csv
+import random
+import argparse
+
+from sources import SOURCES
+
+# Synthetic PatentsView CSVs for benchmarks.
+#
+# Every source in sources.py gets a generator that writes its columns in its
+# CSV dialect, with values shaped like the real bulk downloads (patent IDs
+# shared across sources, ISO dates, claim sequences, CPC codes, ...). A
+# fraction of rows is pathological the way real dumps are: quoted fields
+# with embedded newlines and delimiters, empty cells, unparsable dates and
+# numbers, non-Latin text, very long texts, duplicate keys and, for the
+# dialects that skip them, lines with extra columns. The output is
+# deterministic for a given seed, so runs are comparable.
+
+# Rows per patent of each source
+FANOUT = {
+    'patent': 1,
+    'summary': 1,
+    'claim': 18,
+    'UScitation': 12,
+    'USappcitation': 6,
+    'classes': 5,
+    'people': 3,
+}
+
+# Fraction of pathological rows
+PATHOLOGICAL = 0.01
+
+# Characters in a "very long" text cell
+LONG_TEXT = 64 * 1024
+
+WORDS = ('method', 'apparatus', 'system', 'device', 'signal', 'wireless', 'semiconductor', 'layer',
+         'substrate', 'controller', 'memory', 'circuit', 'optical', 'sensor', 'vehicle', 'battery',
+         'network', 'composition', 'polymer', 'catalyst', 'antenna', 'protein', 'assembly', 'valve',
+         'wherein', 'comprising', 'configured', 'plurality', 'first', 'second', 'data', 'unit')
+UNICODE = ('Müller', 'Señal óptica', '半導体装置', 'Процессор', 'Ångström', 'électrode', '😀 emoji')
+NAMES = ('Smith', 'Tanaka', 'Garcia', 'Kim', 'Nguyen', 'Schmidt', 'Rossi', 'Dubois', 'Li', 'Patel')
+ORGANIZATIONS = ('International Business Machines Corporation', 'Samsung Electronics Co., Ltd.',
+                 'Canon Kabushiki Kaisha', 'Intel Corporation', 'Siemens AG', 'Apple Inc.')
+
+
+def _words(rng, count):
+    return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+
+def _date(rng):
+    return f'{rng.randint(1976, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}'
+
+
+def _patent_id(number):
+    return str(10000000 + number)
+
+
+def _citation_row(prefix, rng, patent_id, sequence):
+    return {
+        'patent_id': patent_id,
+        f'{prefix}_citation_sequence': str(sequence),
+        f'{prefix}_citation_document_number': str(rng.randint(3000000, 11999999)),
+        f'{prefix}_citation_date': _date(rng),
+        f'{prefix}_record_name': rng.choice(NAMES),
+        f'{prefix}_wipo_kind': rng.choice(('A', 'B1', 'B2', 'A1')),
+        f'{prefix}_citation_category': rng.choice(('cited by examiner', 'cited by applicant', 'cited by other')),
+    }
+
+
+def _patent(rng, patent_id, sequence):
+    return {
+        'patent_id': patent_id,
+        'patent_title': _words(rng, rng.randint(4, 12)).capitalize(),
+        'patent_date': _date(rng),
+        'num_claims': str(rng.randint(1, 40)),
+        'patent_type': rng.choice(('utility', 'design', 'plant', 'reissue')),
+        'patent_abstract': _words(rng, rng.randint(60, 180)).capitalize() + '.',
+    }
+
+
+def _summary(rng, patent_id, sequence):
+    paragraphs = (_words(rng, rng.randint(80, 200)) + '.' for _ in range(rng.randint(2, 6)))
+    return {'patent_id': patent_id, 'summary_text': ' '.join(paragraphs)}
+
+
+def _claim(rng, patent_id, sequence):
+    dependent = sequence > 0 and rng.random() < 0.7
+    return {
+        'patent_id': patent_id,
+        'claim_sequence': str(sequence),
+        'claim_text': f'{sequence + 1}. The {_words(rng, 1)} of claim 1, {_words(rng, rng.randint(15, 60))}.'
+        if dependent else f'{sequence + 1}. A {_words(rng, rng.randint(20, 80))}.',
+        'dependent': f'claim {rng.randint(1, sequence)}' if dependent else '',
+        'claim_number': str(sequence + 1),
+        'exemplary': rng.choice(('1', '0', '0', '0')),
+    }
+
+
+def _classes(rng, patent_id, sequence):
+    section = rng.choice('ABCDEFGHY')
+    cls = f'{section}{rng.randint(1, 99):02d}'
+    subclass = f'{cls}{rng.choice("ABCDEFGHJKLMN")}'
+    return {
+        'patent_id': patent_id,
+        'cpc_section': section,
+        'cpc_class': cls,
+        'cpc_subclass': subclass,
+        'cpc_group': f'{subclass}{rng.randint(1, 99)}/{rng.randint(0, 999):02d}',
+        'cpc_type': rng.choice(('inventional', 'additional')),
+        'cpc_group_title': _words(rng, rng.randint(5, 20)),
+        'cpc_class_title': _words(rng, rng.randint(2, 6)).upper(),
+    }
+
+
+def _people(rng, patent_id, sequence):
+    organization = rng.choice(ORGANIZATIONS)
+    return {
+        'patent_id': patent_id,
+        'applicant_authority': rng.choice(('assignee', 'legal-representative', '')),
+        'applicant_organization': organization if sequence == 0 else '',
+        'applicant_full_name': '',
+        'assignee_id': f'{rng.getrandbits(64):016x}',
+        'assignee_organization': organization,
+        'assignee_full_name': '',
+        'inventor_id': f'fl:{rng.choice("abcdefgh")}_ln:{rng.choice(NAMES).lower()}-{rng.randint(1, 99)}',
+        'gender_code': rng.choice(('M', 'F', '')),
+        'inventor_full_name': f'{rng.choice(NAMES)} {rng.choice(NAMES)}',
+    }
+
+
+ROWS = {
+    'patent': _patent,
+    'summary': _summary,
+    'claim': _claim,
+    'UScitation': lambda rng, patent_id, sequence: _citation_row('US_citation', rng, patent_id, sequence),
+    'USappcitation': lambda rng, patent_id, sequence: _citation_row('US_app_citation', rng, patent_id, sequence),
+    'classes': _classes,
+    'people': _people,
+}
+
+
+def _pathological(rng, spec, row, previous):
+    """Damage one row the way real dumps do; returns the rows to write in its place."""
+    kinds = ['quotes', 'empty', 'bad_value', 'unicode', 'long']
+    if previous is not None:
+        kinds.append('duplicate')
+    if spec['read'].get('on_bad_lines') in ('skip', 'warn'):
+        kinds.append('extra_columns')
+    kind = rng.choice(kinds)
+    columns = list(row)
+    text_columns = [name for name, coercion in spec['fields'].values()
+                    if coercion in ('str', 'text', 'clean_text') and name != 'patent_id'] or columns[1:]
+    if kind == 'quotes':
+        name = rng.choice(text_columns)
+        row[name] = f'{row[name]}, "quoted"{spec["read"]["sep"]}then\na second line'
+    elif kind == 'empty':
+        for name in rng.sample(columns[1:], k=max(1, len(columns) // 2)):
+            row[name] = ''
+    elif kind == 'bad_value':
+        for name, coercion in spec['fields'].values():
+            if coercion == 'date':
+                row[name] = rng.choice(('0000-00-00', '2019/13/45', 'unknown', '1999-02-30'))
+            elif coercion in ('int', 'digits', 'digits_or_none'):
+                row[name] = rng.choice(('n/a', '-3', '1.5', ' 7 ', '99999999999999999999'))
+            elif coercion == 'bool':
+                row[name] = rng.choice(('TRUE', 'yes', 'maybe', ''))
+    elif kind == 'unicode':
+        name = rng.choice(text_columns)
+        row[name] = f'{rng.choice(UNICODE)} {row[name]} {rng.choice(UNICODE)}'
+    elif kind == 'long':
+        name = rng.choice(text_columns)
+        row[name] = (_words(rng, 32) + ' ') * (LONG_TEXT // 200)
+    elif kind == 'duplicate':
+        return [row, dict(previous)]
+    elif kind == 'extra_columns':
+        return [row, list(row.values()) + ['extra', 'columns']]
+    return [row]
+
+
+def write_source(source, path, patents, seed=0, pathological=PATHOLOGICAL):
+    """
+    Write a synthetic CSV of one source.
+
+    Args:
+        source (str): Source key in sources.SOURCES
+        path (str): Output CSV
+        patents (int): Patents the rows belong to; sources with several rows
+            per patent (FANOUT) get proportionally more
+        seed (int): Random seed; the same seed writes the same file
+        pathological (float): Fraction of damaged rows
+
+    Returns:
+        int: Rows written, pathological ones included
+    """
+    spec = SOURCES[source]
+    rng = random.Random(f'{seed}:{source}')
+    make_row = ROWS[source]
+    header = list(make_row(random.Random(0), _patent_id(0), 1))
+    sep = spec['read'].get('sep', ',')
+    rows = 0
+    previous = None
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, delimiter=sep, quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
+        writer.writerow(header)
+        for number in range(patents):
+            patent_id = _patent_id(number)
+            fanout = FANOUT[source] if FANOUT[source] == 1 else rng.randint(1, 2 * FANOUT[source] - 1)
+            for sequence in range(fanout):
+                row = make_row(rng, patent_id, sequence)
+                out = _pathological(rng, spec, row, previous) if rng.random() < pathological else [row]
+                for line in out:
+                    writer.writerow(line.values() if isinstance(line, dict) else line)
+                    rows += 1
+                previous = row
+    return rows
+
+
+def write_dataset(directory, patents, sources=None, seed=0, pathological=PATHOLOGICAL):
+    """
+    Write synthetic CSVs of several sources sharing the same patents.
+
+    Returns:
+        dict: Source key -> (CSV path, rows written)
+    """
+    os.makedirs(directory, exist_ok=True)
+    written = {}
+    for source in sources or SOURCES:
+        path = os.path.join(directory, f'{source}.csv')
+        written[source] = path, write_source(source, path, patents, seed, pathological)
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Write synthetic PatentsView CSVs')
+    parser.add_argument('out', help='Output directory')
+    parser.add_argument('--patents', type=int, default=10000, help='Patents to generate')
+    parser.add_argument('--sources', nargs='+', choices=sorted(SOURCES), help='Sources to write (default: all)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--pathological', type=float, default=PATHOLOGICAL,
+                        help='Fraction of damaged rows')
+    args = parser.parse_args()
+
+    for source, (path, rows) in write_dataset(args.out, args.patents, args.sources, args.seed,
+                                              args.pathological).items():
+        print(f"📝 {path}: {rows} rows, {os.path.getsize(path) / 2 ** 20:.1f} MB")
@@ -0,0 +1,120 @@
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+# Vectorized column coercions for the CSV indexers.
+#
+# Each helper takes a whole column of a chunk and applies the conversion the
+# indexers used to do cell by cell inside chunk.iterrows(). Bulk actions are
+# then zipped straight from the converted column arrays, so no per-row Series
+# is ever built. Columns arrive as strings, except the enumerated fields the
+# reader parses as categoricals, which are converted once per category.
+# Integers are read as strings too: pandas' own parser accepts ' 7 ', '7.0'
+# and '1e3', so a natively parsed chunk would coerce them unlike to_int().
+
+TRUTHY = ('true', 't', 'yes', 'y', '1')
+
+_INT_PATTERN = r'[+-]?\d+'
+_DIGITS_PATTERN = r'\d+'
+_INT64 = np.iinfo('int64')
+
+
+def column(chunk, name):
+    """Return a column of the chunk, or an all-NaN column if the CSV lacks it."""
+    if name in chunk.columns:
+        return chunk[name]
+    return pd.Series(np.nan, index=chunk.index, dtype=object)
+
+
+def to_str(series, strip=True):
+    """Strings with NaN mapped to '' and optional whitespace stripping; categoricals stay categorical."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        labels = series.cat.categories.astype(str)
+        labels = labels.str.strip() if strip else labels
+        # Stripping may merge categories; NaN cells (code -1) take the trailing ''
+        codes, uniques = pd.factorize(np.array(labels.tolist() + [''], dtype=object))
+        return pd.Series(pd.Categorical.from_codes(codes[series.cat.codes.to_numpy()], categories=uniques),
+                         index=series.index)
+    series = series.fillna('').astype(str)
+    return series.str.strip() if strip else series
+
+
+def to_int(series, default=0, digits_only=False):
+    """
+    Integers parsed like ``int(value)``, falling back to ``default``.
+
+    Args:
+        series (Series): String column
+        default (int or None): Value for NaN and unparsable cells; None keeps them null
+        digits_only (bool): Accept only plain digits, like ``str.isdigit()``
+
+    Returns:
+        Series: int64 column, or object column with None when default is None
+    """
+    stripped = series.astype(object).where(series.notna(), None)
+    stripped = stripped.str.strip() if not digits_only else stripped
+    valid = stripped.str.fullmatch(_DIGITS_PATTERN if digits_only else _INT_PATTERN, na=False).to_numpy()
+    # Numbers beyond int64 are unparsable too; only long strings can be, so only those are checked exactly
+    long = valid & (stripped.str.len() > 18).fillna(False).to_numpy(dtype=bool)
+    if long.any():
+        valid[long] = [_INT64.min <= int(value) <= _INT64.max for value in stripped[long].tolist()]
+    numbers = pd.to_numeric(stripped[valid]).to_numpy(dtype='int64')
+    if default is None:
+        values = np.full(len(series), None, dtype=object)
+        values[valid] = numbers.tolist()
+        return pd.Series(values, index=series.index, dtype=object)
+    values = np.full(len(series), default, dtype='int64')
+    values[valid] = numbers
+    return pd.Series(values, index=series.index)
+
+
+def to_bool(series):
+    """Booleans from the truthy strings 'true', 't', 'yes', 'y' and '1'; NaN is False."""
+    return series.str.lower().isin(TRUTHY)
+
+
+def to_date(series):
+    """
+    Dates normalized to 'YYYY-MM-DD', with None for empty or unparsable cells.
+
+    ISO dates, which are nearly all PatentsView dates, are parsed in one fast
+    pass; only the remaining cells go through the slower mixed-format parser.
+    """
+    dates = pd.to_datetime(series, format='%Y-%m-%d', errors='coerce')
+    retry = dates.isna() & series.notna() & (series.astype(str).str.strip() != '')
+    if retry.any():
+        try:
+            dates[retry] = pd.to_datetime(series[retry], format='mixed', errors='coerce')
+        except (TypeError, ValueError):
+            # pandas < 2.0 has no format='mixed'
+            dates[retry] = series[retry].map(lambda v: pd.to_datetime(v, errors='coerce'))
+    formatted = dates.dt.strftime('%Y-%m-%d')
+    return formatted.astype(object).where(formatted.notna(), None)
+
+
+def clean_text(series):
+    """Text with punctuation removed and whitespace runs collapsed, as for summaries."""
+    cleaned = to_str(series).str.replace(r'[^\w\s]', '', regex=True)
+    return cleaned.str.replace(r'\s+', ' ', regex=True).str.strip()
+
+
+def join_ids(*parts):
+    """Vectorized child_doc_id(): strip each column and join them with ':'."""
+    joined = to_str(parts[0])
+    for part in parts[1:]:
+        joined = joined + ':' + to_str(part)
+    return joined
+
+
+# Coercions a source spec can name for a field (see sources.py)
+COERCIONS = {
+    'str': to_str,
+    'text': partial(to_str, strip=False),
+    'int': to_int,
+    'digits': partial(to_int, digits_only=True),
+    'digits_or_none': partial(to_int, digits_only=True, default=None),
+    'bool': to_bool,
+    'date': to_date,
+    'clean_text': clean_text,
+}